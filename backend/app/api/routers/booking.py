@@ -1,12 +1,16 @@
+import datetime as dt
 import uuid
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db.bulk_writer import flush_writes
 from app.db.session import get_db_session
 from app.schemas.common import BookingOut
+from app.services.availability import SlotGenerateIn, SlotGenerateOut, generate_slots, get_availability_index
 from app.services.booking import select_and_reserve_slot
+from app.services.customers import get_customer_profile, preference
 
 
 router = APIRouter(prefix="/booking", tags=["booking"])
@@ -18,6 +22,40 @@ class BookingSelectIn(BaseModel):
     preferred_center_id: str | None = None
 
 
+class AvailableSlotOut(BaseModel):
+    slot_id: uuid.UUID
+    center_id: str
+    starts_at: dt.datetime
+    ends_at: dt.datetime
+    free: int
+
+
+@router.get("/availability", response_model=list[AvailableSlotOut])
+async def availability(
+    customer_id: uuid.UUID,
+    center_id: str | None = None,
+    n: int = Query(default=5, ge=1, le=100),
+    session: AsyncSession = Depends(get_db_session),
+):
+    # Best N open slots for this customer (their time window, preferred center first)
+    index = get_availability_index()
+    await index.ensure_fresh(session)
+    profile = await get_customer_profile(customer_id, session=session)
+    time_window = preference(profile, "time_window")
+    return [
+        AvailableSlotOut(slot_id=e.id, center_id=e.center_id, starts_at=e.starts_at, ends_at=e.ends_at, free=e.free)
+        for e in index.best(center_id, time_window, n)
+    ]
+
+
+@router.post("/slots/generate", response_model=SlotGenerateOut)
+async def slots_generate(payload: SlotGenerateIn, session: AsyncSession = Depends(get_db_session)):
+    # Bulk, idempotent slot creation: every center x day x opening-hours step
+    return await generate_slots(session, payload)
+
+
 @router.post("/select", response_model=BookingOut)
 async def select(payload: BookingSelectIn, session: AsyncSession = Depends(get_db_session)):
+    # The referenced alert may still be in the write-behind buffer
+    await flush_writes()
     return await select_and_reserve_slot(payload=payload, session=session)
@@ -1,12 +1,15 @@
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from sqlalchemy import select
+from pydantic import BaseModel, Field
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import cache_stats
 from app.db.models import CustomerPreference
 from app.db.session import get_db_session
+from app.services.customers import get_customer_profile, invalidate_customer
 
 
 router = APIRouter(prefix="/customer", tags=["customer"])
@@ -19,16 +22,40 @@ class PreferencesOut(BaseModel):
     time_window: str
 
 
+class PreferencesIn(BaseModel):
+    language: str = Field(default="en", max_length=20)
+    channel: str = Field(default="sms", max_length=20)
+    time_window: str = Field(default="9-18", max_length=50)
+
+
+@router.get("/cache/stats")
+async def customer_cache_stats():
+    return cache_stats()
+
+
 @router.get("/{customer_id}/preferences", response_model=PreferencesOut)
 async def get_preferences(customer_id: uuid.UUID, session: AsyncSession = Depends(get_db_session)):
-    res = await session.execute(select(CustomerPreference).where(CustomerPreference.customer_id == customer_id))
-    pref = res.scalar_one_or_none()
-    if pref is None:
+    profile = await get_customer_profile(customer_id, session=session)
+    if profile is None or profile["preferences"] is None:
         raise HTTPException(status_code=404, detail="preferences not found")
 
-    return PreferencesOut(
-        customer_id=pref.customer_id,
-        language=pref.language,
-        channel=pref.channel,
-        time_window=pref.time_window,
-    )
+    return PreferencesOut(customer_id=customer_id, **profile["preferences"])
+
+
+@router.put("/{customer_id}/preferences", response_model=PreferencesOut)
+async def put_preferences(customer_id: uuid.UUID, payload: PreferencesIn, session: AsyncSession = Depends(get_db_session)):
+    values = payload.model_dump()
+    try:
+        await session.execute(
+            insert(CustomerPreference)
+            .values(id=uuid.uuid4(), customer_id=customer_id, **values)
+            .on_conflict_do_update(index_elements=[CustomerPreference.customer_id], set_=values)
+        )
+        await session.commit()
+    except IntegrityError:
+        raise HTTPException(status_code=404, detail="customer not found")
+    finally:
+        # Also after a failed write: a cached "unknown customer" answer may be what's wrong
+        await invalidate_customer(customer_id)
+
+    return PreferencesOut(customer_id=customer_id, **values)
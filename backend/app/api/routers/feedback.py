@@ -15,6 +15,9 @@ class FeedbackIn(BaseModel):
     booking_id: uuid.UUID
     csat: int = Field(ge=1, le=5)
     technician_notes: str | None = None
+    # Service outcome: whether the predicted fault was found, and the part actually at fault
+    fault_confirmed: bool | None = None
+    confirmed_component: str | None = Field(default=None, max_length=64)
 
 
 class FeedbackOut(BaseModel):
@@ -0,0 +1,113 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.cache import cache_stats
+from app.core.config import settings
+from app.core.metrics import Family, register_collector, render, stats_families
+from app.db.bulk_writer import get_bulk_writer
+from app.db.session import engine
+from app.ml.executor import get_executor
+from app.ml.registry import get_registry
+from app.ml.scheduler import get_scheduler
+from app.services.audit import get_audit_writer
+from app.services.availability import get_availability_index
+from app.services.feature_store import get_feature_store
+from app.services.similar_cases import get_case_index
+from app.services.ueba import get_ueba
+
+
+router = APIRouter(prefix="", tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _pool() -> list[Family]:
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return []
+    return [
+        (
+            "db_pool_connections",
+            "gauge",
+            "Pooled database connections by state",
+            [
+                ("", {"state": "in_use"}, pool.checkedout()),
+                ("", {"state": "idle"}, pool.checkedin()),
+                ("", {"state": "overflow"}, max(pool.overflow(), 0)),
+            ],
+        ),
+        ("db_pool_size", "gauge", "Configured pool size", [("", {}, pool.size())]),
+    ]
+
+
+def _histogram(counts: dict[str, int], total: int) -> list:
+    # Per-bucket counts from the scheduler as cumulative Prometheus buckets
+    buckets = []
+    cumulative = 0
+    for bound, count in counts.items():
+        cumulative += count
+        buckets.append(("_bucket", {"le": bound}, cumulative))
+    buckets.append(("_bucket", {"le": "+Inf"}, total))
+    return buckets
+
+
+def _inference() -> list[Family]:
+    executor = get_executor().stats()
+    families = [
+        ("inference_executor_pending", "gauge", "Inference calls queued or running in the pool", [("", {}, executor["pending"])]),
+        ("inference_executor_max_pending", "gauge", "Limit on queued or running inference calls before new ones are rejected", [("", {}, executor["max_pending"])]),
+        ("inference_executor_rejected_total", "counter", "Inference calls rejected as overloaded", [("", {}, executor["rejected"])]),
+    ]
+    scheduler = get_scheduler()
+    if scheduler is None:
+        return families
+    stats = scheduler.stats()
+    families += [
+        ("inference_scheduler_queue_depth", "gauge", "Rows waiting to be batched", [("", {}, stats["queue_depth"])]),
+        (
+            "inference_batch_size",
+            "histogram",
+            "Rows per micro-batch",
+            [
+                *_histogram(stats["batch_size_histogram"], stats["batches"]),
+                ("_sum", {}, stats["requests"]),
+                ("_count", {}, stats["batches"]),
+            ],
+        ),
+        (
+            "inference_scheduler_queue_depth_at_batch",
+            "histogram",
+            "Rows left waiting as each micro-batch is taken",
+            [
+                *_histogram(stats["queue_depth_histogram"], stats["batches"]),
+                ("_sum", {}, stats["queue_depth_sum"]),
+                ("_count", {}, stats["batches"]),
+            ],
+        ),
+    ]
+    return families
+
+
+def _components() -> list[Family]:
+    families: list[Family] = []
+    for name, writer in (("telemetry", get_bulk_writer()), ("audit", get_audit_writer())):
+        if writer is not None:
+            families += stats_families("bulk_writer", writer.stats(), {"writer": name})
+    for namespace, stats in cache_stats().items():
+        families += stats_families("cache", stats, {"namespace": namespace})
+    if settings.ueba_enabled:
+        families += stats_families("ueba", get_ueba().stats())
+    if settings.rolling_features_enabled:
+        families += stats_families("feature_store", get_feature_store().stats())
+    families += stats_families("availability", get_availability_index().stats())
+    families += stats_families("rca_index", get_case_index().stats())
+    families += stats_families("model_registry", get_registry().stats())
+    return families
+
+
+register_collector(_pool)
+register_collector(_inference)
+register_collector(_components)
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db_session
 from app.schemas.common import OrchestrationOut, TelemetryIn
 from app.services.orchestration import run_full_workflow
+from app.services.stages import stage_stats
 
 
 router = APIRouter(prefix="", tags=["orchestrator"])
@@ -12,3 +13,9 @@ router = APIRouter(prefix="", tags=["orchestrator"])
 @router.post("/orchestrate", response_model=OrchestrationOut)
 async def orchestrate(payload: TelemetryIn, session: AsyncSession = Depends(get_db_session)):
     return await run_full_workflow(payload=payload, session=session)
+
+
+@router.get("/orchestrate/stages")
+async def orchestrate_stage_stats():
+    # Per-stage latency (count / avg / max ms) since process start
+    return stage_stats()
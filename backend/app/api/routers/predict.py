@@ -2,7 +2,10 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_db_session
-from app.schemas.common import PredictionOut, TelemetryIn
+from app.ml.executor import get_executor
+from app.ml.scheduler import get_scheduler
+from app.schemas.common import BatchPredictionOut, PredictionOut, TelemetryBatchIn, TelemetryIn
+from app.services.ingestion import ingest_batch
 from app.services.prediction import predict_from_telemetry
 
 
@@ -12,3 +15,17 @@ router = APIRouter(prefix="", tags=["prediction"])
 @router.post("/predict", response_model=PredictionOut)
 async def predict(payload: TelemetryIn, session: AsyncSession = Depends(get_db_session)):
     return await predict_from_telemetry(payload=payload, session=session)
+
+
+@router.post("/predict/batch", response_model=BatchPredictionOut)
+async def predict_batch(payload: TelemetryBatchIn, session: AsyncSession = Depends(get_db_session)):
+    return await ingest_batch(records=payload.records, session=session, create_alerts=False)
+
+
+@router.get("/predict/scheduler")
+async def scheduler_stats():
+    scheduler = get_scheduler()
+    executor = get_executor().stats()
+    if scheduler is None:
+        return {"enabled": False, "executor": executor}
+    return {"enabled": True, **scheduler.stats(), "executor": executor}
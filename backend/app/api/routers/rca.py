@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db_session
 from app.schemas.common import RCAOut
 from app.services.rca import analyze_rca
+from app.services.similar_cases import get_case_index
 
 
 router = APIRouter(prefix="/rca", tags=["rca"])
@@ -21,3 +22,8 @@ class RCAIn(BaseModel):
 @router.post("/analyze", response_model=RCAOut)
 async def analyze(payload: RCAIn, session: AsyncSession = Depends(get_db_session)):
     return await analyze_rca(payload=payload, session=session)
+
+
+@router.get("/index/stats")
+async def index_stats():
+    return get_case_index().stats()
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_db_session
 from app.services.security import security_check
+from app.services.ueba import get_ueba
 
 
 router = APIRouter(prefix="/security", tags=["security"])
@@ -19,8 +20,14 @@ class SecurityCheckIn(BaseModel):
 class SecurityCheckOut(BaseModel):
     allowed: bool
     reason: str | None = None
+    anomaly_score: float | None = None
 
 
 @router.post("/check", response_model=SecurityCheckOut)
 async def check(payload: SecurityCheckIn, session: AsyncSession = Depends(get_db_session)):
     return await security_check(payload=payload, session=session)
+
+
+@router.get("/ueba/stats")
+async def ueba_stats():
+    return get_ueba().stats()
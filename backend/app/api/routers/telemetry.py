@@ -1,15 +1,93 @@
-from fastapi import APIRouter, Depends
+import json
+import uuid
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.schemas.common import OrchestrationOut, TelemetryIn
+from app.schemas.common import BatchPredictionOut, OrchestrationOut, TelemetryBatchIn, TelemetryIn
 from app.db.session import get_db_session
+from app.services.ingestion import ingest_batch
 from app.services.orchestration import run_full_workflow
+from app.services.streaming import ingest_stream, ndjson_lines
+from app.services.workflow_jobs import (
+    WorkflowAcceptedOut,
+    WorkflowJobOut,
+    get_job,
+    start_async_workflow,
+    stream_job,
+)
 
 
 router = APIRouter(prefix="", tags=["telemetry"])
 
 
-@router.post("/telemetry", response_model=OrchestrationOut)
-async def ingest_telemetry(payload: TelemetryIn, session: AsyncSession = Depends(get_db_session)):
-    # Strict workflow entrypoint
+class DuplexStreamingResponse(StreamingResponse):
+    # StreamingResponse watches for disconnects by calling receive(), which would swallow the
+    # request body the endpoint is still reading. Here the body reader sees the disconnect itself.
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+
+@router.post("/telemetry", response_model=OrchestrationOut | WorkflowAcceptedOut)
+async def ingest_telemetry(
+    payload: TelemetryIn,
+    response: Response,
+    mode: Literal["sync", "async"] = "sync",
+    session: AsyncSession = Depends(get_db_session),
+):
+    # Strict workflow entrypoint. mode=async answers 202 once the alert is persisted and
+    # finishes booking/RCA/voice/feedback in the background; poll status_url for the result.
+    if mode == "async":
+        response.status_code = 202
+        return await start_async_workflow(payload=payload, session=session)
     return await run_full_workflow(payload=payload, session=session)
+
+
+@router.get("/telemetry/jobs/{job_id}", response_model=WorkflowJobOut)
+async def telemetry_job(job_id: uuid.UUID, session: AsyncSession = Depends(get_db_session)):
+    return await get_job(session, job_id)
+
+
+@router.get("/telemetry/jobs/{job_id}/events")
+async def telemetry_job_events(job_id: uuid.UUID, session: AsyncSession = Depends(get_db_session)):
+    # Server-sent events until the job reaches a terminal status
+    await get_job(session, job_id)
+    return StreamingResponse(stream_job(job_id), media_type="text/event-stream")
+
+
+@router.post("/telemetry/batch", response_model=BatchPredictionOut)
+async def ingest_telemetry_batch(payload: TelemetryBatchIn, session: AsyncSession = Depends(get_db_session)):
+    # Bulk ingest: persist + score + raise alerts; booking/RCA are left to the per-reading workflow
+    return await ingest_batch(records=payload.records, session=session, create_alerts=True)
+
+
+@router.post("/telemetry/stream")
+async def ingest_telemetry_ndjson(customer_id: uuid.UUID, request: Request):
+    # Chunked NDJSON upload: one TelemetryPayload per line, one NDJSON ack per line streamed back
+    async def acks():
+        async for ack in ingest_stream(customer_id, ndjson_lines(request.stream())):
+            yield json.dumps(ack, default=str) + "\n"
+
+    return DuplexStreamingResponse(acks(), media_type="application/x-ndjson")
+
+
+@router.websocket("/telemetry/stream")
+async def ingest_telemetry_ws(websocket: WebSocket, customer_id: uuid.UUID):
+    await websocket.accept()
+
+    async def frames():
+        try:
+            async for text in websocket.iter_text():
+                yield text
+        except WebSocketDisconnect:
+            return
+
+    try:
+        async for ack in ingest_stream(customer_id, frames()):
+            await websocket.send_json(ack)
+    except (WebSocketDisconnect, RuntimeError):
+        # Client went away while acks were still in flight
+        return
+    await websocket.close()
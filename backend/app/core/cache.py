@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.core.config import settings
+from app.core.redis import get_async_redis
+
+
+logger = logging.getLogger(__name__)
+
+# Marks a cached "does not exist" answer (negative caching)
+_ABSENT = object()
+
+# Stores a loaded value only if no invalidation bumped the key's generation since the load
+# began, so a loader that read the database before a write can't put the old value back.
+# KEYS: value, generation; ARGV: generation seen before loading, value, ttl
+_SET_IF_GENERATION = """
+if (redis.call('get', KEYS[2]) or '0') ~= ARGV[1] then return 0 end
+redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# KEYS: value, generation; ARGV: generation ttl
+_INVALIDATE = """
+redis.call('del', KEYS[1])
+redis.call('incr', KEYS[2])
+redis.call('expire', KEYS[2], ARGV[1])
+return 1
+"""
+
+# Generations outlive any load by far; one that expires reads as '0' and fails the compare
+_GENERATION_TTL_S = 24 * 3600
+
+# Short circuit breaker shared by every cache (they use the same Redis): monotonic time
+# before which reads go straight to the loader
+_redis_retry_at = 0.0
+
+
+class TwoTierCache:
+    # Read-through cache for slowly changing reference data: a per-process LRU (short TTL,
+    # bounds staleness after writes made by other processes) in front of Redis (shared, longer
+    # TTL) in front of the loader. Values are JSON-serialisable; a loader returning None is
+    # cached as absent for negative_ttl_s. Redis failures degrade to the loader, never to errors.
+    def __init__(
+        self,
+        namespace: str,
+        ttl_s: float,
+        negative_ttl_s: float | None = None,
+        local_ttl_s: float | None = None,
+        local_max_entries: int | None = None,
+    ) -> None:
+        self.namespace = namespace
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = settings.cache_negative_ttl_s if negative_ttl_s is None else negative_ttl_s
+        self.local_ttl_s = settings.cache_local_ttl_s if local_ttl_s is None else local_ttl_s
+        self.local_max_entries = settings.cache_local_max_entries if local_max_entries is None else local_max_entries
+
+        self._local: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._loading: dict[str, asyncio.Task] = {}
+        self._counters = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "invalidations": 0,
+            "redis_errors": 0,
+            "redis_skipped": 0,
+            "stale_loads": 0,
+        }
+        _caches[namespace] = self
+
+    def _redis_key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    def _generation_key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}:gen"
+
+    def _redis_available(self) -> bool:
+        if time.monotonic() < _redis_retry_at:
+            self._counters["redis_skipped"] += 1
+            return False
+        return True
+
+    def _redis_failed(self) -> None:
+        global _redis_retry_at
+        self._counters["redis_errors"] += 1
+        _redis_retry_at = time.monotonic() + settings.cache_redis_retry_s
+
+    def _local_get(self, key: str) -> Any:
+        item = self._local.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return item
+
+    def _local_put(self, key: str, value: Any, ttl_s: float) -> None:
+        self._local[key] = (time.monotonic() + min(ttl_s, self.local_ttl_s), value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_max_entries:
+            self._local.popitem(last=False)
+
+    def _hit(self, value: Any, tier: str) -> Any:
+        self._counters[tier] += 1
+        if value is _ABSENT:
+            self._counters["negative_hits"] += 1
+            return None
+        return value
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        item = self._local_get(key)
+        if item is not None:
+            return self._hit(item[1], "local_hits")
+
+        # Concurrent misses for the same key share one Redis round trip / load. It runs in its
+        # own task, so a caller that is cancelled doesn't cancel it for the others.
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._fetch(key, loader))
+            self._loading[key] = task
+            task.add_done_callback(lambda t: self._load_done(key, t))
+        return await asyncio.shield(task)
+
+    def _load_done(self, key: str, task: asyncio.Task) -> None:
+        if self._loading.get(key) is task:
+            del self._loading[key]
+        # Don't leave "exception was never retrieved" behind when every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def _current(self, key: str) -> bool:
+        # False once invalidate() has detached this load: its value may predate the write
+        current = self._loading.get(key) is asyncio.current_task()
+        if not current:
+            self._counters["stale_loads"] += 1
+        return current
+
+    async def _fetch(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        raw, generation = None, None
+        if self._redis_available():
+            try:
+                raw, generation = await get_async_redis().mget(self._redis_key(key), self._generation_key(key))
+            except Exception:
+                self._redis_failed()
+        if raw is not None:
+            value = json.loads(raw)
+            cached = _ABSENT if value is None else value
+            if self._current(key):
+                self._local_put(key, cached, self.ttl_s if value is not None else self.negative_ttl_s)
+            return self._hit(cached, "redis_hits")
+
+        self._counters["misses"] += 1
+        self._counters["loads"] += 1
+        value = await loader()
+        ttl_s = self.ttl_s if value is not None else self.negative_ttl_s
+        if not self._current(key):
+            return value
+        self._local_put(key, _ABSENT if value is None else value, ttl_s)
+        if self._redis_available():
+            try:
+                await get_async_redis().eval(
+                    _SET_IF_GENERATION,
+                    2,
+                    self._redis_key(key),
+                    self._generation_key(key),
+                    "0" if generation is None else generation,
+                    json.dumps(value, default=str),
+                    max(1, int(ttl_s)),
+                )
+            except Exception:
+                self._redis_failed()
+        return value
+
+    async def invalidate(self, key: str) -> None:
+        # Drops this process's copy and the shared one, and bumps the key's generation so loads
+        # already in flight (here or elsewhere) don't store what they read. Other processes'
+        # local copies expire within local_ttl_s. Always tries Redis, breaker or not: a missed
+        # invalidation would serve the old value for the full ttl_s.
+        self._counters["invalidations"] += 1
+        self._local.pop(key, None)
+        self._loading.pop(key, None)
+        try:
+            await get_async_redis().eval(_INVALIDATE, 2, self._redis_key(key), self._generation_key(key), _GENERATION_TTL_S)
+        except Exception:
+            self._redis_failed()
+            logger.warning("cache invalidation of %s failed", self._redis_key(key), exc_info=True)
+
+    def stats(self) -> dict:
+        lookups = self._counters["local_hits"] + self._counters["redis_hits"] + self._counters["misses"]
+        hits = self._counters["local_hits"] + self._counters["redis_hits"]
+        return {
+            **self._counters,
+            "local_entries": len(self._local),
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+        }
+
+
+_caches: dict[str, TwoTierCache] = {}
+
+
+def cache_stats() -> dict[str, dict]:
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
@@ -19,5 +19,193 @@ class Settings(BaseSettings):
     model_path: str = "./artifacts/xgb_model.json"
     encoder_path: str = "./artifacts/feature_encoder.joblib"
 
+    # Versioned model directories + CURRENT pointer (see app.ml.registry); model_path and
+    # encoder_path are only used to seed the registry from pre-registry artifacts
+    model_registry_dir: str = "./artifacts/models"
+    model_registry_keep: int = 5
+    model_refresh_interval_s: float = 5.0
+    # .staging-* directories older than this are left over from trainers that died
+    model_registry_staging_ttl_s: int = 6 * 3600
+
+    # Retraining: labels are technician outcomes reported through /feedback (fault_confirmed),
+    # and each outcome is a trigger; triggers within retrain_min_interval_s coalesce into one run.
+    # Runs warm-start from the live model on labels newer than its watermark until
+    # retrain_max_trees is reached, or retrain in full when more than
+    # retrain_incremental_max_rows new labels would have to be held in memory
+    retrain_min_interval_s: int = 900
+    retrain_debounce_s: int = 30
+    retrain_lock_ttl_s: int = 1800
+    retrain_chunk_size: int = 5000
+    retrain_min_rows: int = 200
+    retrain_full_trees: int = 80
+    retrain_incremental_trees: int = 10
+    retrain_max_trees: int = 400
+    retrain_incremental_max_rows: int = 200_000
+
+    # Full retrains stream through app.ml.train_stream: rows are spooled in retrain_chunk_size
+    # shards under train_spool_dir and fed to XGBoost through a DataIter (quantised in memory,
+    # or paged from disk with train_external_memory). hist trees on train_n_jobs threads (<= 0:
+    # all cores), up to train_max_rounds with early stopping on a train_validation_fraction split
+    train_spool_dir: str = "./artifacts/train-spool"
+    train_external_memory: bool = False
+    train_max_bin: int = 256
+    train_n_jobs: int = -1
+    train_max_rounds: int = 300
+    train_early_stopping_rounds: int = 20
+    train_validation_fraction: float = 0.1
+
+    batch_max_records: int = 5000
+
+    # Daily partitions of telemetry_events / features / alerts (see app.db.partitions). Features
+    # share the telemetry retention: each day's features go with that day's telemetry
+    telemetry_retention_days: int = 30
+    alert_retention_days: int = 365
+    partition_premake_days: int = 7
+    partition_maintenance_minute: int = 15
+
+    # Rounds of skip-locked / waiting reservation attempts per center before giving up
+    booking_reserve_attempts: int = 3
+    # In-memory availability index (app.services.availability): ranked candidates tried per
+    # booking, rank penalty for slots outside the preferred center, center -> nearby centers
+    # (empty: every center is a candidate), rebuild interval and how far ahead it indexes
+    booking_candidates: int = 8
+    booking_other_center_penalty_h: float = 24.0
+    center_neighbors: dict[str, list[str]] = {}
+    availability_refresh_s: float = 30.0
+    availability_horizon_days: int = 28
+    # Slots generated at startup (idempotent) for the demo centers
+    seed_center_ids: list[str] = ["CENTER-001"]
+    seed_slot_days: int = 14
+
+    # Read-through caches (app.core.cache): per-process LRU size and TTL (the bound on
+    # staleness across processes after an invalidation), TTL for cached "not found" answers,
+    # and the shared Redis TTL for customer profiles. After a Redis error, reads skip Redis for
+    # cache_redis_retry_s instead of paying its timeout on every miss
+    cache_local_max_entries: int = 10_000
+    cache_local_ttl_s: float = 5.0
+    cache_negative_ttl_s: float = 30.0
+    cache_redis_retry_s: float = 5.0
+    customer_cache_ttl_s: float = 300.0
+
+    # Async orchestration jobs (app.services.workflow_jobs): retries of the Celery follow-up,
+    # how long a queued/running job may sit untouched before the sweeper re-enqueues it, and
+    # the status stream's poll interval
+    workflow_max_retries: int = 5
+    workflow_stale_s: int = 300
+    workflow_poll_ms: int = 500
+
+    # Write-behind buffer for telemetry/features/alerts (app.db.bulk_writer): flush after
+    # this many rows or milliseconds, and block submitters above max_buffered
+    write_behind_enabled: bool = True
+    bulk_flush_rows: int = 2000
+    bulk_flush_ms: int = 50
+    bulk_max_buffered: int = 20_000
+    bulk_copy_enabled: bool = True
+
+    # Security audit log (app.services.audit): rows are batched by a writer of their own and
+    # journalled to audit_spill_dir (None: no journal) until committed; denials are written
+    # before the response when audit_sync_denies is set
+    audit_async: bool = True
+    audit_flush_rows: int = 500
+    audit_flush_ms: int = 200
+    audit_max_buffered: int = 10_000
+    audit_sync_denies: bool = True
+    audit_spill_dir: str | None = "./artifacts/audit-spill"
+    audit_spill_segment_bytes: int = 4 * 1024 * 1024
+
+    # Streaming UEBA (app.services.ueba): baselines for at most ueba_max_entities customers +
+    # vehicles (least recently seen evicted), a request-rate window of ueba_window_buckets x
+    # ueba_bucket_s, EWMA weights per event (rate/sensors, action mix), and events seen before an
+    # entity is scored on action mix / sensor values. Each signal's alarm level (score 1.0):
+    # window count ueba_rate_z std devs above baseline, a sensor value ueba_sensor_z std devs
+    # off, an action with probability below ueba_action_min_p. An action the entity never took
+    # is scored as if seen ueba_action_unseen_weight times (a prior pseudo-count), which keeps
+    # it above the alarm level while actions the entity does take rarely stay below it.
+    # Requests at or above ueba_block_score are denied when ueba_enforce is set; otherwise
+    # scores are only audited.
+    ueba_enabled: bool = True
+    ueba_max_entities: int = 100_000
+    ueba_bucket_s: float = 10.0
+    ueba_window_buckets: int = 6
+    ueba_alpha: float = 0.02
+    ueba_action_alpha: float = 0.002
+    ueba_min_events: int = 20
+    ueba_max_actions: int = 16
+    ueba_sensor_fields: list[str] = [
+        "speed_kph",
+        "engine_temp_c",
+        "vibration_rms",
+        "oil_pressure_kpa",
+        "battery_v",
+        "ambient_temp_c",
+    ]
+    ueba_rate_z: float = 6.0
+    ueba_sensor_z: float = 8.0
+    ueba_action_min_p: float = 0.005
+    ueba_action_unseen_weight: float = 0.1
+    ueba_enforce: bool = False
+    ueba_block_score: float = 1.0
+    ueba_snapshot_path: str | None = "./artifacts/ueba/baselines.json"
+    ueba_snapshot_interval_s: float = 60.0
+
+    # RCA similar-case index (app.services.similar_cases): built and extended by the
+    # tasks.update_rca_index beat job every rca_index_update_s, memory-mapped by API processes
+    # (re-checked every rca_index_refresh_s). IVF lists (0: ~sqrt(cases)), lists probed per
+    # query, cases returned, re-read window for late-committed cases, and the growth over the
+    # case count the centroids were trained on that triggers a rebuild
+    rca_index_dir: str = "./artifacts/rca-index"
+    rca_index_nlist: int = 0
+    rca_index_nprobe: int = 8
+    rca_similar_k: int = 5
+    rca_index_overlap_s: int = 300
+    rca_index_rebuild_factor: float = 4.0
+    rca_index_update_s: int = 600
+    rca_index_refresh_s: float = 5.0
+    rca_index_lock_ttl_s: int = 3600
+
+    # Notifications (app.tasks.notifications): queued in Redis, sent by the
+    # tasks.dispatch_notifications beat job every notification_window_s, one message per
+    # destination + channel per window. Repeats for a vehicle + component within
+    # notification_dedupe_s are dropped; per-channel send limits in messages/s (channels not
+    # listed are unlimited). notification_store_results keeps Celery results for
+    # tasks.send_notification.
+    notification_window_s: float = 5.0
+    notification_dedupe_s: int = 1800
+    notification_max_batch: int = 5000
+    notification_max_attempts: int = 3
+    notification_rate_limits: dict[str, float] = {"sms": 20.0, "email": 100.0, "push": 200.0}
+    notification_store_results: bool = False
+
+    # /telemetry/stream: frames per ingest batch, max wait to fill one, and the bound on
+    # frames/acks held in memory per connection before the reader stops pulling
+    stream_batch_size: int = 256
+    stream_flush_ms: int = 50
+    stream_max_pending: int = 1024
+
+    # GET /metrics (Prometheus text format, see app.core.metrics), per-request latency
+    # histograms and database pool checkout timing
+    metrics_enabled: bool = True
+
+    # xgboost | numpy (compiled tree evaluator, see app.ml.tree_eval). The compiled evaluator
+    # only wins on small batches (crossover near 300 rows), so the numpy backend hands batches
+    # above inference_numpy_max_rows to xgboost (<= 0: never)
+    inference_backend: str = "xgboost"
+    inference_numpy_max_rows: int = 256
+
+    # Per-vehicle rolling-window features (FeatureRow.version "v2"), see app.services.feature_store
+    rolling_features_enabled: bool = True
+    feature_window_size: int = 32
+    feature_store_max_vehicles: int = 50_000
+    feature_ewma_alpha: float = 0.2
+
+    # inline | thread | process (process preloads the model in every worker)
+    inference_mode: str = "thread"
+    inference_workers: int = 2
+    inference_max_pending: int = 256
+
+    inference_batching: bool = True
+    inference_max_batch_size: int = 64
+    inference_max_wait_us: int = 1000
+
 
 settings = Settings()
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+
+# Process-local metrics rendered in the Prometheus text format (0.0.4) by GET /metrics.
+# Histograms are recorded as they happen; everything else is read from the components'
+# stats() at scrape time, so the request path only pays for the histograms it observes
+# (a bisect and a few additions under a lock). With several API worker processes each one
+# exposes its own numbers; scrape them individually or aggregate in Prometheus.
+
+# (suffix, labels, value) within a family, e.g. ("_bucket", {"le": "0.1"}, 12)
+Sample = tuple[str, dict[str, str], float]
+# (name, type, help, samples)
+Family = tuple[str, str, str, list[Sample]]
+
+# Seconds; 0.5 ms .. 10 s covers single predictions up to slow orchestrations
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # label values -> per-bucket counts (not cumulative; last slot is +Inf), then the sum
+        self._series: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+        _histograms.append(self)
+
+    def observe(self, value: float, *labels: str) -> None:
+        # Label values positionally, in labelnames order
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def collect(self) -> Family:
+        with self._lock:
+            snapshot = [(labels, list(series)) for labels, series in self._series.items()]
+        samples: list[Sample] = []
+        for labels, series in snapshot:
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), series):
+                cumulative += count
+                samples.append(("_bucket", {**base, "le": _format_value(bound)}, cumulative))
+            samples.append(("_sum", base, series[-1]))
+            samples.append(("_count", base, cumulative))
+        return self.name, "histogram", self.help, samples
+
+
+_histograms: list[Histogram] = []
+_collectors: list[Callable[[], Iterable[Family]]] = []
+
+
+def register_collector(fn: Callable[[], Iterable[Family]]) -> None:
+    # fn is called on every scrape and returns families read from live state
+    _collectors.append(fn)
+
+
+def stats_families(prefix: str, stats: dict, labels: dict[str, str] | None = None, help: str = "") -> list[Family]:
+    # A component's stats() dict as one untyped family per numeric entry (strings, None and
+    # nested dicts are skipped); counters and gauges alike, so the type is left to the query
+    families = []
+    for key, value in stats.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            families.append((f"{prefix}_{key}", "untyped", help, [("", labels or {}, value)]))
+    return families
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render() -> str:
+    # Families with the same name (e.g. one per cache namespace) are merged under one TYPE line
+    merged: dict[str, tuple[str, str, list[Sample]]] = {}
+    families: list[Family] = [h.collect() for h in _histograms]
+    for collector in _collectors:
+        families.extend(collector())
+    for name, kind, help, samples in families:
+        entry = merged.setdefault(name, (kind, help, []))
+        entry[2].extend(samples)
+
+    lines = []
+    for name, (kind, help, samples) in merged.items():
+        if help:
+            lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            label_text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+            lines.append(f"{name}{suffix}{{{label_text}}} {_format_value(value)}" if label_text else f"{name}{suffix} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# Shared histograms, observed by the modules they are named after
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by router and route template", ("router", "method", "route", "status")
+)
+STAGE_SECONDS = Histogram("orchestration_stage_duration_seconds", "Stage latency within an orchestration graph", ("graph", "stage"))
+PREDICT_RISK_SECONDS = Histogram("predict_risk_duration_seconds", "Model evaluation time per call", ("kind",))
+POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Time to obtain a pooled database connection, including connection setup"
+)
+
+
+class RequestMetricsMiddleware:
+    # Plain ASGI middleware (no per-request task or body buffering). Requests are labelled by
+    # the matched route's template and its router's first tag, so path parameters don't
+    # create series; unmatched paths share route="unmatched". Status is the class (2xx, 4xx, ...).
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            tags = getattr(route, "tags", None)
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                str(tags[0]) if tags else "app",
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                f"{status // 100}xx",
+            )
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+
+_async_client: aioredis.Redis | None = None
+_sync_client: redis.Redis | None = None
+
+
+def get_async_redis() -> aioredis.Redis:
+    # Shared pool for request handlers; connections are opened lazily on first command
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.from_url(settings.redis_url, socket_connect_timeout=1, socket_timeout=1)
+    return _async_client
+
+
+def get_redis() -> redis.Redis:
+    # Blocking client for Celery workers and scripts
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(settings.redis_url, socket_connect_timeout=1, socket_timeout=5)
+    return _sync_client
+
+
+async def close_async_redis() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
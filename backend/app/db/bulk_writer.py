@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections.abc import Mapping, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Rows to persist, keyed by ORM model (TelemetryEvent, FeatureRow, Alert, ...)
+RowBatch = Mapping[type, Sequence[dict]]
+
+
+def _complete(table, row: dict) -> dict:
+    # COPY bypasses SQLAlchemy column defaults, so apply the Python-side ones here.
+    # Ids are generated client-side, which is what lets callers reference rows before they are written.
+    out = dict(row)
+    for column in table.columns:
+        if column.key in out or column.default is None:
+            continue
+        default = column.default
+        if default.is_callable:
+            out[column.key] = default.arg(None)
+        elif default.is_scalar:
+            out[column.key] = default.arg
+    if "id" in table.columns and out.get("id") is None:
+        out["id"] = uuid.uuid4()
+    return out
+
+
+class BulkWriter:
+    # Write-behind buffer for the append-only tables: rows from many requests are coalesced
+    # and written in one transaction (a COPY per table on asyncpg, a multi-row INSERT otherwise)
+    # when `flush_rows` are buffered or every `flush_ms`. Each submit() gets a future that
+    # resolves once its rows are committed. If a batch is rejected over bad data (constraint
+    # or type errors), its submissions are retried one by one so only the offending one fails.
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        flush_rows: int,
+        flush_ms: int,
+        max_buffered: int,
+        use_copy: bool = True,
+    ) -> None:
+        self.engine = engine
+        self.flush_rows = max(1, flush_rows)
+        self.flush_s = max(1, flush_ms) / 1000
+        self.max_buffered = max(self.flush_rows, max_buffered)
+        self.use_copy = use_copy and engine.dialect.driver == "asyncpg"
+
+        # (future, rows) per submit(); rows is None for flush() barriers
+        self._pending: list[tuple[asyncio.Future, dict[type, list[dict]] | None]] = []
+        self._buffered = 0
+        # Rows of the flush being written; they count against max_buffered until it finishes
+        self._inflight = 0
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self._flushing = False
+
+        self._flushes = 0
+        self._rows_written = 0
+        self._failures = 0
+        self._failed_rows = 0
+        self._detached_failures = 0
+        self._last_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Drain: everything submitted before stop() is written before this returns
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        await self._task
+        self._task = None
+
+    async def submit(self, rows: RowBatch) -> asyncio.Future:
+        if self._closing or self._task is None:
+            raise RuntimeError("bulk writer is not running")
+        # Backpressure: callers wait rather than letting the buffer grow without bound
+        while self._buffered + self._inflight >= self.max_buffered:
+            self._space.clear()
+            self._wake.set()
+            await self._space.wait()
+
+        completed = {model: [_complete(model.__table__, row) for row in batch] for model, batch in rows.items() if batch}
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((future, completed))
+        self._buffered += sum(len(batch) for batch in completed.values())
+        if self._buffered >= self.flush_rows:
+            self._wake.set()
+        return future
+
+    async def flush(self) -> None:
+        # Force a flush and wait until everything submitted so far is durable
+        if not self._buffered and not self._pending and not self._flushing:
+            return
+        if self._task is None:
+            raise RuntimeError("bulk writer is not running")
+        barrier = asyncio.get_running_loop().create_future()
+        self._pending.append((barrier, None))
+        self._wake.set()
+        await barrier
+
+    def stats(self) -> dict:
+        return {
+            "mode": "copy" if self.use_copy else "insert",
+            "buffered_rows": self._buffered,
+            "inflight_rows": self._inflight,
+            "flushes": self._flushes,
+            "rows_written": self._rows_written,
+            "failures": self._failures,
+            "failed_rows": self._failed_rows,
+            "detached_failures": self._detached_failures,
+            "last_flush_ms": round(self._last_flush_ms, 3),
+        }
+
+    def detach(self, future: asyncio.Future) -> None:
+        # For submitters that don't wait for their rows: a failure can't reach them any more,
+        # so it is counted (detached_failures) and logged instead
+        future.add_done_callback(self._detached_done)
+
+    def _detached_done(self, future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            self._detached_failures += 1
+            logger.warning("write-behind rows were not persisted: %s", future.exception())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._flush_once()
+            if self._closing and not self._buffered and not self._pending:
+                return
+
+    async def _flush_once(self) -> None:
+        pending, self._pending = self._pending, []
+        n, self._buffered = self._buffered, 0
+        if not pending:
+            self._space.set()
+            return
+        # Submitters blocked on backpressure resume only once these rows have left memory
+        self._inflight = n
+        try:
+            await self._flush_pending(pending, n)
+        finally:
+            self._inflight = 0
+            self._space.set()
+
+    async def _flush_pending(self, pending: list[tuple[asyncio.Future, dict[type, list[dict]] | None]], n: int) -> None:
+        buffers: dict[type, list[dict]] = {}
+        for _, rows in pending:
+            for model, batch in (rows or {}).items():
+                buffers.setdefault(model, []).extend(batch)
+
+        self._flushing = True
+        start = time.perf_counter()
+        try:
+            if buffers:
+                await self._write(buffers)
+        except Exception as exc:
+            self._failures += 1
+            submissions = [(f, rows) for f, rows in pending if rows]
+            if _is_data_error(exc) and len(submissions) > 1:
+                logger.warning("bulk flush of %d rows rejected (%s); retrying per submission", n, exc)
+                await self._write_each(pending)
+            else:
+                logger.exception("bulk flush of %d rows failed", n)
+                self._failed_rows += n
+                for future, _ in pending:
+                    if not future.done():
+                        future.set_exception(exc)
+            return
+        finally:
+            self._flushing = False
+            self._last_flush_ms = (time.perf_counter() - start) * 1000
+
+        self._flushes += 1
+        self._rows_written += n
+        for future, _ in pending:
+            if not future.done():
+                future.set_result(None)
+
+    async def _write_each(self, pending: list[tuple[asyncio.Future, dict[type, list[dict]] | None]]) -> None:
+        for future, rows in pending:
+            if future.done():
+                continue
+            if not rows:
+                future.set_result(None)
+                continue
+            try:
+                await self._write(rows)
+            except Exception as exc:
+                self._failed_rows += sum(len(batch) for batch in rows.values())
+                future.set_exception(exc)
+            else:
+                self._rows_written += sum(len(batch) for batch in rows.values())
+                future.set_result(None)
+
+    async def _write(self, buffers: dict[type, list[dict]]) -> None:
+        if not self.use_copy:
+            async with self.engine.begin() as conn:
+                for model, rows in buffers.items():
+                    await conn.execute(insert(model.__table__), rows)
+            return
+
+        async with self.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            # One asyncpg transaction around all tables so a flush lands atomically
+            async with driver.transaction():
+                for model, rows in buffers.items():
+                    table = model.__table__
+                    columns = [c.name for c in table.columns]
+                    json_cols = {c.name for c in table.columns if isinstance(c.type, JSONB)}
+                    records = [
+                        tuple(
+                            json.dumps(row.get(col)) if col in json_cols and row.get(col) is not None else row.get(col)
+                            for col in columns
+                        )
+                        for row in rows
+                    ]
+                    await driver.copy_records_to_table(table.name, records=records, columns=columns)
+
+
+def _is_data_error(exc: Exception) -> bool:
+    # Rejections caused by the rows themselves (FK/unique/check violations, bad values), as
+    # opposed to the database being unreachable
+    from sqlalchemy.exc import DataError, IntegrityError
+
+    if isinstance(exc, (IntegrityError, DataError)):
+        return True
+    try:
+        import asyncpg
+    except ImportError:
+        return False
+    return isinstance(exc, (asyncpg.IntegrityConstraintViolationError, asyncpg.DataError))
+
+
+_writer: BulkWriter | None = None
+
+
+def get_bulk_writer() -> BulkWriter | None:
+    return _writer if _writer is not None and _writer.running else None
+
+
+async def start_bulk_writer(engine: AsyncEngine) -> BulkWriter | None:
+    global _writer
+    if not settings.write_behind_enabled:
+        return None
+    if _writer is None:
+        _writer = BulkWriter(
+            engine,
+            flush_rows=settings.bulk_flush_rows,
+            flush_ms=settings.bulk_flush_ms,
+            max_buffered=settings.bulk_max_buffered,
+            use_copy=settings.bulk_copy_enabled,
+        )
+        _writer.start()
+    return _writer
+
+
+async def stop_bulk_writer() -> None:
+    global _writer
+    if _writer is not None:
+        await _writer.stop()
+        _writer = None
+
+
+async def write_rows(
+    session: AsyncSession, rows: RowBatch, durable: bool = True, commit: bool = True
+) -> asyncio.Future | None:
+    # Append-only writes go through the write-behind buffer when it is running. With
+    # durable=False the caller returns before the flush with the flush's future, to await
+    # later or drop (failures are counted and logged either way);
+    # without a writer (Celery, scripts) rows are inserted on the caller's session and
+    # committed unless commit=False (the caller's own transaction commits them).
+    writer = get_bulk_writer()
+    if writer is None:
+        for model, batch in rows.items():
+            if batch:
+                await session.execute(insert(model), [_complete(model.__table__, row) for row in batch])
+        if commit:
+            await session.commit()
+        return None
+
+    future = await writer.submit(rows)
+    if durable:
+        await future
+        return None
+    writer.detach(future)
+    return future
+
+
+async def flush_writes() -> None:
+    # For paths that must read back (or reference) rows written moments ago
+    writer = get_bulk_writer()
+    if writer is not None:
+        await writer.flush()
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.db.models import Base
+from app.db.partitions import PARTITIONED_TABLES, ensure_partitions, retention_days
+
+
+logger = logging.getLogger(__name__)
+
+# create_all only creates missing tables, so changes to tables that already exist are listed
+# here and applied at startup right after it. Each step checks the catalog first and is a
+# no-op once applied, so every process can run this on boot; on a partitioned table the ALTER
+# on the parent reaches every partition. Append new steps; never edit an applied one.
+
+
+@dataclass(frozen=True)
+class AddColumn:
+    table: str
+    column: str
+    ddl_type: str
+
+
+@dataclass(frozen=True)
+class DropNotNull:
+    table: str
+    column: str
+
+
+@dataclass(frozen=True)
+class CreateIndex:
+    table: str
+    name: str
+    columns: tuple[str, ...]
+
+
+SCHEMA_UPGRADES: tuple[AddColumn | DropNotNull | CreateIndex, ...] = (
+    # Model version that scored each alert (versioned model registry)
+    AddColumn("alerts", "model_version", "VARCHAR(64)"),
+    # Technician outcomes as retraining labels, and the snapshot watermark over them
+    AddColumn("feedback", "fault_confirmed", "BOOLEAN"),
+    AddColumn("feedback", "confirmed_component", "VARCHAR(64)"),
+    AddColumn("feedback", "xid", "BIGINT NOT NULL DEFAULT (pg_current_xact_id()::text)::bigint"),
+    CreateIndex("feedback", "ix_feedback_xid", ("xid",)),
+    # Packed float32 feature vectors; the JSON dict is only kept on rows written before them
+    AddColumn("features", "vector", "BYTEA"),
+    DropNotNull("features", "features"),
+    # Lookups by alert id that used to go through the foreign key into the (now partitioned) alerts
+    CreateIndex("bookings", "ix_bookings_alert_id", ("alert_id",)),
+    CreateIndex("rca_cases", "ix_rca_cases_alert_id", ("alert_id",)),
+)
+
+
+async def _partition_existing(conn: AsyncConnection) -> list[str]:
+    # Tables created before partitioning are plain heaps that create_all leaves alone, and
+    # ensure_partitions cannot attach partitions to them. Each is rebuilt in this transaction:
+    # renamed aside, recreated partitioned from the model, given daily partitions back to its
+    # retention window (older or far-off rows land in the default partition and expire from
+    # there), refilled with INSERT ... SELECT and dropped. Dropping the old primary key also
+    # drops the foreign keys into it, which partitioned tables do not keep. The copy holds an
+    # exclusive lock for its duration, so large tables make for a slow first boot.
+    res = await conn.execute(
+        text(
+            "SELECT relname FROM pg_class JOIN pg_namespace ON pg_namespace.oid = relnamespace "
+            "WHERE nspname = current_schema() AND relkind = 'r' AND relname = ANY(:tables)"
+        ),
+        {"tables": list(PARTITIONED_TABLES)},
+    )
+    plain = set(res.scalars().all())
+    converted: list[str] = []
+    today = dt.datetime.now(dt.timezone.utc).date()
+    # telemetry_events first: the features and alerts foreign keys into it go with its primary key
+    for table in (t for t in PARTITIONED_TABLES if t in plain):
+        key = PARTITIONED_TABLES[table]
+        old = f"{table}_unpartitioned"
+        await conn.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+        res = await conn.execute(
+            text("SELECT conname FROM pg_constraint WHERE conrelid = CAST(:old AS regclass) AND contype = 'p'"),
+            {"old": old},
+        )
+        for name in res.scalars().all():
+            await conn.execute(text(f'ALTER TABLE {old} DROP CONSTRAINT "{name}" CASCADE'))
+        res = await conn.execute(
+            text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :old"),
+            {"old": old},
+        )
+        for name in res.scalars().all():
+            await conn.execute(text(f'DROP INDEX "{name}"'))
+
+        await conn.run_sync(Base.metadata.create_all, tables=[Base.metadata.tables[table]])
+        first = (await conn.execute(text(f'SELECT min("{key}") FROM {old}'))).scalar()
+        start = max(first.date() if first else today, today - dt.timedelta(days=retention_days(table)))
+        await ensure_partitions(conn, start, (today - start).days + settings.partition_premake_days + 1, (table,))
+
+        res = await conn.execute(
+            text("SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = :old"),
+            {"old": old},
+        )
+        columns = [c for c in res.scalars().all() if c in Base.metadata.tables[table].columns]
+        names = ", ".join(f'"{c}"' for c in columns)
+        values = ", ".join(f'coalesce("{c}", now())' if c == key else f'"{c}"' for c in columns)
+        res = await conn.execute(text(f"INSERT INTO {table} ({names}) SELECT {values} FROM {old}"))
+        await conn.execute(text(f"DROP TABLE {old}"))
+        converted.append(table)
+        logger.info("schema upgrade: partitioned %s (%d rows copied)", table, res.rowcount or 0)
+    return converted
+
+
+async def upgrade_schema(conn: AsyncConnection) -> list[str]:
+    applied = [f"PARTITION {table}" for table in await _partition_existing(conn)]
+    res = await conn.execute(
+        text(
+            "SELECT table_name, column_name, is_nullable FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = ANY(:tables)"
+        ),
+        {"tables": sorted({step.table for step in SCHEMA_UPGRADES})},
+    )
+    nullable = {(table, column): is_nullable == "YES" for table, column, is_nullable in res.all()}
+    res = await conn.execute(text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()"))
+    indexes = set(res.scalars().all())
+
+    for step in SCHEMA_UPGRADES:
+        if isinstance(step, AddColumn) and (step.table, step.column) not in nullable:
+            ddl = f"ALTER TABLE {step.table} ADD COLUMN IF NOT EXISTS {step.column} {step.ddl_type}"
+        elif isinstance(step, DropNotNull) and nullable.get((step.table, step.column)) is False:
+            ddl = f"ALTER TABLE {step.table} ALTER COLUMN {step.column} DROP NOT NULL"
+        elif isinstance(step, CreateIndex) and step.name not in indexes:
+            ddl = f"CREATE INDEX IF NOT EXISTS {step.name} ON {step.table} ({', '.join(step.columns)})"
+        else:
+            continue
+        await conn.execute(text(ddl))
+        applied.append(ddl)
+        logger.info("schema upgrade: %s", ddl)
+    return applied
@@ -1,7 +1,7 @@
 import datetime as dt
 import uuid
 
-from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Integer, String, Text, UniqueConstraint
+from sqlalchemy import BigInteger, Boolean, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String, Text, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -34,6 +34,12 @@ class CustomerPreference(Base):
     customer: Mapped[Customer] = relationship(back_populates="preferences")
 
 
+# telemetry_events, features and alerts are range-partitioned by day on their timestamp
+# (partitions are managed by app.db.partitions). Postgres requires the partition key in
+# every unique constraint, so their primary keys are (id, <timestamp>) and rows that point
+# at them carry a plain indexed id instead of a foreign key.
+
+
 class TelemetryEvent(Base):
     __tablename__ = "telemetry_events"
 
@@ -41,32 +47,72 @@ class TelemetryEvent(Base):
     customer_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("customers.id", ondelete="RESTRICT"), nullable=False)
 
     vehicle_id: Mapped[str] = mapped_column(String(64), nullable=False)
-    timestamp: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=lambda: dt.datetime.now(dt.timezone.utc))
+    timestamp: Mapped[dt.datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True, default=lambda: dt.datetime.now(dt.timezone.utc)
+    )
     payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
 
+    __table_args__ = (
+        # Rolling-window rebuilds read a vehicle's latest readings
+        Index("ix_telemetry_events_vehicle_ts", "vehicle_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
 
 class FeatureRow(Base):
     __tablename__ = "features"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    telemetry_event_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("telemetry_events.id", ondelete="CASCADE"), nullable=False)
+    telemetry_event_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False, index=True)
 
     version: Mapped[str] = mapped_column(String(32), default="v1")
-    features: Mapped[dict] = mapped_column(JSONB, nullable=False)
-    created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=lambda: dt.datetime.now(dt.timezone.utc))
+    # float32 vector laid out by app.services.feature_schema for `version`; `features` is
+    # only populated on rows written before packed storage
+    vector: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    features: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    created_at: Mapped[dt.datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True, default=lambda: dt.datetime.now(dt.timezone.utc)
+    )
+
+    __table_args__ = ({"postgresql_partition_by": "RANGE (created_at)"},)
 
 
 class Alert(Base):
     __tablename__ = "alerts"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    telemetry_event_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("telemetry_events.id", ondelete="CASCADE"), nullable=False)
+    telemetry_event_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False, index=True)
 
     risk_score: Mapped[float] = mapped_column(Float, nullable=False)
     risk_level: Mapped[str] = mapped_column(String(20), nullable=False)
     predicted_component: Mapped[str] = mapped_column(String(64), nullable=False)
+    model_version: Mapped[str | None] = mapped_column(String(64), nullable=True)
 
-    created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=lambda: dt.datetime.now(dt.timezone.utc))
+    created_at: Mapped[dt.datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True, default=lambda: dt.datetime.now(dt.timezone.utc)
+    )
+
+    __table_args__ = ({"postgresql_partition_by": "RANGE (created_at)"},)
+
+
+class TelemetryHourly(Base):
+    # Per-vehicle hourly rollup of raw telemetry, written when a telemetry partition expires
+    __tablename__ = "telemetry_hourly"
+
+    vehicle_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    hour: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    readings: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    speed_kph_avg: Mapped[float | None] = mapped_column(Float, nullable=True)
+    engine_temp_c_avg: Mapped[float | None] = mapped_column(Float, nullable=True)
+    engine_temp_c_max: Mapped[float | None] = mapped_column(Float, nullable=True)
+    vibration_rms_avg: Mapped[float | None] = mapped_column(Float, nullable=True)
+    vibration_rms_max: Mapped[float | None] = mapped_column(Float, nullable=True)
+    oil_pressure_kpa_avg: Mapped[float | None] = mapped_column(Float, nullable=True)
+    oil_pressure_kpa_min: Mapped[float | None] = mapped_column(Float, nullable=True)
+    battery_v_avg: Mapped[float | None] = mapped_column(Float, nullable=True)
+    battery_v_min: Mapped[float | None] = mapped_column(Float, nullable=True)
+    odometer_km_max: Mapped[float | None] = mapped_column(Float, nullable=True)
 
 
 class ServiceSlot(Base):
@@ -89,7 +135,7 @@ class Booking(Base):
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     customer_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("customers.id", ondelete="RESTRICT"), nullable=False)
-    alert_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("alerts.id", ondelete="CASCADE"), nullable=False)
+    alert_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False, index=True)
     slot_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("service_slots.id", ondelete="RESTRICT"), nullable=False)
 
     status: Mapped[str] = mapped_column(String(20), default="reserved")
@@ -102,7 +148,7 @@ class RCACase(Base):
     __tablename__ = "rca_cases"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    alert_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("alerts.id", ondelete="CASCADE"), nullable=False)
+    alert_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False, index=True)
 
     summary: Mapped[str] = mapped_column(Text, nullable=False)
     similar_cases: Mapped[dict] = mapped_column(JSONB, default=dict)
@@ -118,6 +164,14 @@ class Feedback(Base):
 
     csat: Mapped[int] = mapped_column(Integer, nullable=False)
     technician_notes: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Technician outcome, the retraining label: was the predicted fault found (None: not reported)
+    fault_confirmed: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
+    confirmed_component: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # Id of the inserting transaction, assigned by the server; retraining resumes after the
+    # snapshot its last run read under, so rows that commit late are never skipped
+    xid: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, index=True, server_default=text("(pg_current_xact_id()::text)::bigint")
+    )
 
     created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=lambda: dt.datetime.now(dt.timezone.utc))
 
@@ -135,3 +189,30 @@ class SecurityAudit(Base):
 
     audit_metadata: Mapped[dict] = mapped_column(JSONB, default=dict)
     created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=lambda: dt.datetime.now(dt.timezone.utc))
+
+
+class WorkflowJob(Base):
+    # Async-mode orchestration (POST /telemetry?mode=async): the prediction is returned at
+    # once and the rest of the workflow runs in the `tasks.continue_workflow` Celery task
+    __tablename__ = "workflow_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    customer_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    telemetry_event_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    alert_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False, index=True)
+
+    # queued -> running -> succeeded | failed | blocked
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="queued")
+    stage: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    completed_stages: Mapped[list] = mapped_column(JSONB, nullable=False, default=list)
+    # Inputs for the remaining stages (telemetry, features, prediction) and the final OrchestrationOut
+    context: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    result: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    notified: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=lambda: dt.datetime.now(dt.timezone.utc))
+    updated_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=lambda: dt.datetime.now(dt.timezone.utc))
+
+    __table_args__ = (Index("ix_workflow_jobs_status_updated", "status", "updated_at"),)
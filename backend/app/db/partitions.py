@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Parent table -> partition key. Children are named <table>_YYYYMMDD (one UTC day each)
+# plus <table>_default for rows outside every daily range (e.g. far-off client timestamps).
+PARTITIONED_TABLES: dict[str, str] = {
+    "telemetry_events": "timestamp",
+    "features": "created_at",
+    "alerts": "created_at",
+}
+
+_DAY_SUFFIX = re.compile(r"_(\d{8})$")
+
+_HOURLY_ROLLUP = """
+INSERT INTO telemetry_hourly AS h (
+    vehicle_id, hour, readings,
+    speed_kph_avg, engine_temp_c_avg, engine_temp_c_max, vibration_rms_avg, vibration_rms_max,
+    oil_pressure_kpa_avg, oil_pressure_kpa_min, battery_v_avg, battery_v_min, odometer_km_max
+)
+SELECT
+    vehicle_id,
+    date_trunc('hour', "timestamp", 'UTC'),
+    count(*),
+    avg((payload->>'speed_kph')::float8),
+    avg((payload->>'engine_temp_c')::float8),
+    max((payload->>'engine_temp_c')::float8),
+    avg((payload->>'vibration_rms')::float8),
+    max((payload->>'vibration_rms')::float8),
+    avg((payload->>'oil_pressure_kpa')::float8),
+    min((payload->>'oil_pressure_kpa')::float8),
+    avg((payload->>'battery_v')::float8),
+    min((payload->>'battery_v')::float8),
+    max((payload->>'odometer_km')::float8)
+FROM {source}
+{where}
+GROUP BY vehicle_id, date_trunc('hour', "timestamp", 'UTC')
+ON CONFLICT (vehicle_id, hour) DO UPDATE SET
+    readings = h.readings + EXCLUDED.readings,
+    speed_kph_avg = (h.speed_kph_avg * h.readings + EXCLUDED.speed_kph_avg * EXCLUDED.readings) / (h.readings + EXCLUDED.readings),
+    engine_temp_c_avg = (h.engine_temp_c_avg * h.readings + EXCLUDED.engine_temp_c_avg * EXCLUDED.readings) / (h.readings + EXCLUDED.readings),
+    engine_temp_c_max = greatest(h.engine_temp_c_max, EXCLUDED.engine_temp_c_max),
+    vibration_rms_avg = (h.vibration_rms_avg * h.readings + EXCLUDED.vibration_rms_avg * EXCLUDED.readings) / (h.readings + EXCLUDED.readings),
+    vibration_rms_max = greatest(h.vibration_rms_max, EXCLUDED.vibration_rms_max),
+    oil_pressure_kpa_avg = (h.oil_pressure_kpa_avg * h.readings + EXCLUDED.oil_pressure_kpa_avg * EXCLUDED.readings) / (h.readings + EXCLUDED.readings),
+    oil_pressure_kpa_min = least(h.oil_pressure_kpa_min, EXCLUDED.oil_pressure_kpa_min),
+    battery_v_avg = (h.battery_v_avg * h.readings + EXCLUDED.battery_v_avg * EXCLUDED.readings) / (h.readings + EXCLUDED.readings),
+    battery_v_min = least(h.battery_v_min, EXCLUDED.battery_v_min),
+    odometer_km_max = greatest(h.odometer_km_max, EXCLUDED.odometer_km_max)
+"""
+
+
+def retention_days(table: str) -> int:
+    # Features without their telemetry row would be orphans (there is no FK to cascade on
+    # partitioned tables), so they expire with it
+    return {
+        "telemetry_events": settings.telemetry_retention_days,
+        "features": settings.telemetry_retention_days,
+        "alerts": settings.alert_retention_days,
+    }[table]
+
+
+def partition_name(table: str, day: dt.date) -> str:
+    return f"{table}_{day:%Y%m%d}"
+
+
+def _bound(day: dt.date) -> str:
+    return f"{day.isoformat()} 00:00:00+00"
+
+
+async def list_partitions(conn: AsyncConnection) -> dict[str, dict[str, dt.date | None]]:
+    # {parent: {child_name: day or None for the default partition}}
+    res = await conn.execute(
+        text(
+            "SELECT parent.relname, child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = ANY(:tables)"
+        ),
+        {"tables": list(PARTITIONED_TABLES)},
+    )
+    out: dict[str, dict[str, dt.date | None]] = {t: {} for t in PARTITIONED_TABLES}
+    for parent, child in res.all():
+        m = _DAY_SUFFIX.search(child)
+        out[parent][child] = dt.datetime.strptime(m.group(1), "%Y%m%d").date() if m else None
+    return out
+
+
+async def ensure_partitions(
+    conn: AsyncConnection, start: dt.date, days: int, tables: tuple[str, ...] = tuple(PARTITIONED_TABLES)
+) -> list[str]:
+    existing = await list_partitions(conn)
+    created: list[str] = []
+    for table in tables:
+        await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+        for offset in range(days):
+            day = start + dt.timedelta(days=offset)
+            name = partition_name(table, day)
+            if name in existing[table]:
+                continue
+            try:
+                async with conn.begin_nested():
+                    await conn.execute(
+                        text(
+                            f"CREATE TABLE {name} PARTITION OF {table} "
+                            f"FOR VALUES FROM ('{_bound(day)}') TO ('{_bound(day + dt.timedelta(days=1))}')"
+                        )
+                    )
+                created.append(name)
+            except DBAPIError:
+                # The default partition already holds rows for this day; they stay there and
+                # are expired row-by-row by drop_expired_partitions
+                logger.warning("could not create partition %s", name, exc_info=True)
+    return created
+
+
+async def drop_expired_partitions(engine: AsyncEngine, today: dt.date) -> dict:
+    # Expired telemetry is rolled up into telemetry_hourly in the same transaction that
+    # drops its partition, so every raw reading is aggregated exactly once; the same day's
+    # features partition is dropped with it, so features never outlive their telemetry.
+    async with engine.connect() as conn:
+        partitions = await list_partitions(conn)
+
+    dropped: list[str] = []
+    purged: dict[str, int] = {}
+    for table, children in partitions.items():
+        cutoff = today - dt.timedelta(days=retention_days(table))
+        key = PARTITIONED_TABLES[table]
+
+        for name, day in sorted(children.items(), key=lambda kv: kv[1] or dt.date.max):
+            if day is None or day >= cutoff:
+                continue
+            features = partition_name("features", day)
+            with_features = table == "telemetry_events" and features in partitions["features"]
+            async with engine.begin() as conn:
+                if table == "telemetry_events":
+                    await conn.execute(text(_HOURLY_ROLLUP.format(source=name, where="")))
+                if with_features:
+                    await conn.execute(text(f"DROP TABLE {features}"))
+                await conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+            if with_features:
+                dropped.append(features)
+                del partitions["features"][features]
+
+        # Stragglers in the default partition are the only row-level deletes
+        async with engine.begin() as conn:
+            where = f'WHERE "{key}" < :cutoff'
+            params = {"cutoff": dt.datetime.combine(cutoff, dt.time(), tzinfo=dt.timezone.utc)}
+            if table == "telemetry_events":
+                await conn.execute(text(_HOURLY_ROLLUP.format(source=f"{table}_default", where=where)), params)
+            res = await conn.execute(text(f"DELETE FROM {table}_default {where}"), params)
+            purged[table] = res.rowcount or 0
+
+    return {"dropped": dropped, "purged_default_rows": purged}
+
+
+async def maintain_partitions(engine: AsyncEngine, today: dt.date | None = None) -> dict:
+    today = today or dt.datetime.now(dt.timezone.utc).date()
+    async with engine.begin() as conn:
+        # Start a day back so late writers near midnight still land in a daily partition
+        created = await ensure_partitions(conn, today - dt.timedelta(days=1), settings.partition_premake_days + 1)
+    result = await drop_expired_partitions(engine, today)
+    return {"created": created, **result}
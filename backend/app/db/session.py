@@ -1,13 +1,28 @@
+import time
 from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
 from app.core.config import settings
+from app.core.metrics import POOL_CHECKOUT_SECONDS
+
+
+class TimedPool(AsyncAdaptedQueuePool):
+    # Records how long each checkout took: waiting for a free connection, or opening a new one
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
 
 
 engine: AsyncEngine = create_async_engine(
     settings.postgres_dsn,
     pool_pre_ping=True,
+    **({"poolclass": TimedPool} if settings.metrics_enabled else {}),
 )
 
 AsyncSessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
@@ -16,3 +31,14 @@ AsyncSessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False, clas
 async def get_db_session() -> AsyncIterator[AsyncSession]:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+@asynccontextmanager
+async def worker_engine() -> AsyncIterator[AsyncEngine]:
+    # For Celery tasks that run async DB code under asyncio.run(): the pooled engine above
+    # is bound to the API's event loop, so each task run gets its own unpooled engine
+    task_engine = create_async_engine(settings.postgres_dsn, poolclass=NullPool)
+    try:
+        yield task_engine
+    finally:
+        await task_engine.dispose()
@@ -1,12 +1,25 @@
+import datetime as dt
 import os
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from app.api.routers import booking, customer, feedback, orchestrate, predict, rca, security, telemetry, voice
+from app.api.routers import booking, customer, feedback, metrics, orchestrate, predict, rca, security, telemetry, voice
 from app.core.config import settings
-from app.db.models import Base, Customer, CustomerPreference, ServiceSlot
+from app.core.metrics import RequestMetricsMiddleware
+from app.core.redis import close_async_redis
+from app.db.bulk_writer import start_bulk_writer, stop_bulk_writer
+from app.db.migrations import upgrade_schema
+from app.db.models import Base, Customer, CustomerPreference
+from app.db.partitions import ensure_partitions
 from app.db.session import engine
+from app.ml.executor import InferenceOverloadedError, start_executor, stop_executor
+from app.ml.scheduler import start_scheduler, stop_scheduler
+from app.services.audit import start_audit_writer, stop_audit_writer
+from app.services.availability import SlotGenerateIn, generate_slots, get_availability_index
+from app.services.similar_cases import get_case_index
+from app.services.ueba import start_ueba_snapshots, stop_ueba_snapshots
 
 
 def create_app() -> FastAPI:
@@ -30,6 +43,14 @@ def create_app() -> FastAPI:
     app.include_router(rca.router)
     app.include_router(feedback.router)
 
+    if settings.metrics_enabled:
+        app.add_middleware(RequestMetricsMiddleware)
+        app.include_router(metrics.router)
+
+    @app.exception_handler(InferenceOverloadedError)
+    async def inference_overloaded(request: Request, exc: InferenceOverloadedError):
+        return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
     @app.get("/health")
     async def health():
         return {"status": "ok", "env": settings.environment}
@@ -38,13 +59,15 @@ def create_app() -> FastAPI:
     async def on_startup():
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await upgrade_schema(conn)
+            today = dt.datetime.now(dt.timezone.utc).date()
+            await ensure_partitions(conn, today - dt.timedelta(days=1), settings.partition_premake_days + 1)
 
-        # Seed a sample customer + preferences + some slots for demo
+        # Seed a sample customer + preferences + slots for demo
         # (Idempotent-ish: best effort)
         from sqlalchemy import select
         from sqlalchemy.ext.asyncio import AsyncSession
         from app.db.session import AsyncSessionLocal
-        import datetime as dt
         import uuid
 
         async with AsyncSessionLocal() as session:  # type: AsyncSession
@@ -66,31 +89,44 @@ def create_app() -> FastAPI:
                     )
                 )
 
-                now = dt.datetime.now(dt.timezone.utc).replace(minute=0, second=0, microsecond=0)
-                for i in range(1, 10):
-                    starts = now + dt.timedelta(hours=i)
-                    ends = starts + dt.timedelta(hours=1)
-                    session.add(
-                        ServiceSlot(
-                            center_id="CENTER-001",
-                            starts_at=starts,
-                            ends_at=ends,
-                            capacity=5,
-                            reserved=0,
-                            is_active=True,
-                        )
-                    )
-
                 await session.commit()
 
-        # Auto-train a tiny model if artifacts missing
-        model_path = settings.model_path
-        encoder_path = settings.encoder_path
-        if not (os.path.exists(model_path) and os.path.exists(encoder_path)):
-            os.makedirs(os.path.dirname(model_path), exist_ok=True)
-            from app.ml.train import train_and_save
-
-            await train_and_save(model_path=model_path, encoder_path=encoder_path)
+            # Rolling window of demo slots; existing ones are left as they are
+            await generate_slots(
+                session, SlotGenerateIn(center_ids=settings.seed_center_ids, days=settings.seed_slot_days)
+            )
+            await get_availability_index().refresh(session)
+
+        # Seed the model registry: adopt pre-registry artifacts, or auto-train a tiny model
+        from app.ml.registry import get_registry, import_artifacts, read_current_version
+
+        registry_dir = settings.model_registry_dir
+        if read_current_version(registry_dir) is None:
+            os.makedirs(registry_dir, exist_ok=True)
+            if os.path.exists(settings.model_path) and os.path.exists(settings.encoder_path):
+                import_artifacts(registry_dir, settings.model_path, settings.encoder_path)
+            else:
+                from app.ml.train import train_and_publish
+
+                await train_and_publish(registry_dir)
+        get_registry().current()
+        # Map the similar-case index now rather than on the first RCA request
+        get_case_index().current()
+
+        start_executor()
+        await start_scheduler()
+        await start_bulk_writer(engine)
+        await start_audit_writer(engine)
+        start_ueba_snapshots()
+
+    @app.on_event("shutdown")
+    async def on_shutdown():
+        await stop_scheduler()
+        stop_executor()
+        await stop_ueba_snapshots()
+        await stop_audit_writer()
+        await stop_bulk_writer()
+        await close_async_redis()
 
     return app
 
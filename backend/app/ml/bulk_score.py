@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+# Offline re-scoring of telemetry dumps (CSV, or Parquet with pyarrow installed).
+#
+#   python -m app.ml.bulk_score vehicle_anomaly_results.csv -o scored.csv [--workers 8]
+#
+# The input is read in chunks of --chunk-rows; chunks are parsed, featurised and scored in a
+# process pool (one vectorized predict_proba per chunk) and written in input order as they
+# complete. At most 2 x workers chunks are in flight, so memory stays flat whatever the
+# file size. Columns map to the model's feature names as in app.ml.exports.plan_features
+# (extra mappings with --map).
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+
+import joblib
+import numpy as np
+
+from app.core.config import settings
+from app.ml.exports import (
+    FeaturePlan,
+    feature_matrix,
+    is_parquet,
+    iter_csv_lines,
+    iter_parquet_columns,
+    parse_column_map,
+    parse_csv_lines,
+    plan_features,
+    read_csv_header,
+    require_pyarrow,
+)
+from app.ml.inference import load_bundle
+from app.ml.registry import LEGACY_VERSION, read_current_version, version_paths
+from app.services.prediction import _risk_level
+
+
+DEFAULT_KEEP = ("vehicle_id", "timestamp")
+OUTPUT_COLUMNS = ("risk_score", "risk_level")
+
+
+@dataclass(frozen=True)
+class ScorePlan:
+    # Worked out once from the header and the encoder; shipped to every worker
+    features: FeaturePlan
+    model_path: str
+    encoder_path: str
+    backend: str
+    keep: tuple[int, ...]  # input columns copied to the output
+    output_header: tuple[str, ...]
+    output_format: str  # csv | parquet
+
+    def needed(self) -> list[int]:
+        return sorted(self.features.columns() | set(self.keep))
+
+
+def resolve_model(model_path: str | None, encoder_path: str | None, registry_dir: str | None) -> tuple[str, str, str]:
+    # Explicit artifacts, else the registry's live version, else the pre-registry artifacts
+    if model_path and encoder_path:
+        return model_path, encoder_path, os.path.basename(os.path.dirname(os.path.abspath(model_path))) or LEGACY_VERSION
+    root = registry_dir or settings.model_registry_dir
+    version = read_current_version(root)
+    if version is not None:
+        return *version_paths(root, version), version
+    return settings.model_path, settings.encoder_path, LEGACY_VERSION
+
+
+def build_plan(
+    header: list[str],
+    feature_names: list[str],
+    model_path: str,
+    encoder_path: str,
+    backend: str,
+    column_map: dict[str, str],
+    keep: list[str] | None,
+    output_format: str,
+) -> tuple[ScorePlan, dict]:
+    features, coverage = plan_features(header, feature_names, column_map)
+    if keep is None:
+        keep_names = [name for name in DEFAULT_KEEP if name in header]
+    else:
+        keep_names = keep
+        missing_keep = [name for name in keep_names if name not in header]
+        if missing_keep:
+            raise SystemExit(f"--keep columns not in the input: {', '.join(missing_keep)}")
+
+    plan = ScorePlan(
+        features=features,
+        model_path=model_path,
+        encoder_path=encoder_path,
+        backend=backend,
+        keep=tuple(header.index(name) for name in keep_names),
+        output_header=(*keep_names, *OUTPUT_COLUMNS),
+        output_format=output_format,
+    )
+    return plan, coverage
+
+
+# Per worker process: the plan and the loaded model
+_plan: ScorePlan | None = None
+_model = None
+
+
+def _init_worker(plan: ScorePlan) -> None:
+    global _plan, _model
+    _plan = plan
+    _model = load_bundle(plan.model_path, plan.encoder_path, backend=plan.backend).model
+    if hasattr(_model, "set_params"):
+        # One scoring thread per process; the pool provides the parallelism
+        _model.set_params(n_jobs=1)
+
+
+def _score_columns(columns: dict[int, object], n_rows: int):
+    # columns: input column index -> values for this chunk
+    plan = _plan
+    X = feature_matrix(plan.features, columns, n_rows)
+    scores = _model.predict_proba(X)[:, 1].astype(np.float64) if n_rows else np.empty(0)
+    levels = [_risk_level(s) for s in scores.tolist()]
+    kept = [columns[i] for i in plan.keep]
+
+    if plan.output_format == "parquet":
+        return n_rows, {"kept": kept, "risk_score": scores, "risk_level": levels}
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerows(zip(*kept, np.round(scores, 6).tolist(), levels))
+    return n_rows, buf.getvalue()
+
+
+def _score_csv_chunk(lines: list[str]):
+    return _score_columns(*parse_csv_lines(lines, _plan.needed()))
+
+
+class _Output:
+    def __init__(self, path: str, plan: ScorePlan):
+        self.plan = plan
+        self._parquet = None
+        if plan.output_format == "parquet":
+            pa = require_pyarrow()
+            self._pa = pa
+            self._schema = pa.schema(
+                [(name, pa.string()) for name in plan.output_header[: len(plan.keep)]]
+                + [("risk_score", pa.float64()), ("risk_level", pa.string())]
+            )
+            self._parquet = pa.parquet.ParquetWriter(path, self._schema)
+        else:
+            self._f = open(path, "w", newline="", encoding="utf-8")
+            csv.writer(self._f, lineterminator="\n").writerow(plan.output_header)
+
+    def write(self, payload) -> None:
+        if self._parquet is None:
+            self._f.write(payload)
+            return
+        arrays = [*payload["kept"], payload["risk_score"], payload["risk_level"]]
+        self._parquet.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+        else:
+            self._f.close()
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    chunk_rows: int = 50_000,
+    workers: int | None = None,
+    model_path: str | None = None,
+    encoder_path: str | None = None,
+    registry_dir: str | None = None,
+    backend: str | None = None,
+    column_map: dict[str, str] | None = None,
+    keep: list[str] | None = None,
+    progress_s: float = 5.0,
+) -> dict:
+    model_path, encoder_path, version = resolve_model(model_path, encoder_path, registry_dir)
+    feature_names = list(joblib.load(encoder_path)["feature_names"])
+    backend = backend or settings.inference_backend
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    output_format = "parquet" if is_parquet(output_path) else "csv"
+
+    if is_parquet(input_path):
+        pa = require_pyarrow()
+        source = pa.parquet.ParquetFile(input_path)
+        header = list(source.schema_arrow.names)
+        f = None
+    else:
+        f = open(input_path, newline="", encoding="utf-8-sig")
+        header = read_csv_header(f)
+
+    plan, coverage = build_plan(header, feature_names, model_path, encoder_path, backend, column_map or {}, keep, output_format)
+    if f is None:
+        needed = plan.needed()
+        chunks = ((_score_columns, args) for args in iter_parquet_columns(source, header, needed, set(plan.keep), chunk_rows))
+    else:
+        chunks = ((_score_csv_chunk, (lines,)) for lines in iter_csv_lines(f, chunk_rows))
+    output = _Output(output_path, plan)
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(plan,)) if workers > 0 else None
+    if pool is None:
+        _init_worker(plan)
+    max_in_flight = max(1, workers) * 2
+    in_flight: deque[Future] = deque()
+    rows = 0
+    start = last_report = time.perf_counter()
+
+    def drain_one() -> None:
+        nonlocal rows, last_report
+        n, payload = in_flight.popleft().result()
+        output.write(payload)
+        rows += n
+        now = time.perf_counter()
+        if progress_s and now - last_report >= progress_s:
+            last_report = now
+            print(f"{rows:,} rows, {rows / (now - start):,.0f} rows/s", file=sys.stderr, flush=True)
+
+    try:
+        for fn, args in chunks:
+            if pool is None:
+                future: Future = Future()
+                future.set_result(fn(*args))
+            else:
+                future = pool.submit(fn, *args)
+            in_flight.append(future)
+            # Results are written in input order; the window bounds memory
+            while len(in_flight) >= max_in_flight or (in_flight and in_flight[0].done()):
+                drain_one()
+        while in_flight:
+            drain_one()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        output.close()
+        if f is not None:
+            f.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed) if elapsed > 0 else None,
+        "workers": workers,
+        "model_version": version,
+        "output": output_path,
+        **coverage,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.ml.bulk_score", description="Score a telemetry dump offline.")
+    parser.add_argument("input", help="CSV or Parquet file")
+    parser.add_argument("-o", "--output", required=True, help="CSV or Parquet file (by extension)")
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=None, help="pool size (default: CPU count; 0: score inline)")
+    parser.add_argument("--model", default=None, help="model file (default: the registry's live version)")
+    parser.add_argument("--encoder", default=None, help="encoder artifact with feature_names (with --model)")
+    parser.add_argument("--registry-dir", default=None)
+    parser.add_argument("--backend", choices=("xgboost", "numpy"), default=None)
+    parser.add_argument("--map", action="append", default=[], metavar="COLUMN=FEATURE", help="extra column mapping")
+    parser.add_argument("--keep", default=None, help=f"comma-separated columns copied to the output (default: {','.join(DEFAULT_KEEP)})")
+    parser.add_argument("--progress-s", type=float, default=5.0, help="seconds between progress lines on stderr (0: off)")
+    args = parser.parse_args(argv)
+
+    if bool(args.model) != bool(args.encoder):
+        parser.error("--model and --encoder go together")
+    summary = score_file(
+        args.input,
+        args.output,
+        chunk_rows=max(1, args.chunk_rows),
+        workers=args.workers,
+        model_path=args.model,
+        encoder_path=args.encoder,
+        registry_dir=args.registry_dir,
+        backend=args.backend,
+        column_map=parse_column_map(args.map),
+        keep=[c for c in args.keep.split(",") if c] if args.keep is not None else None,
+        progress_s=args.progress_s,
+    )
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db.models import Alert, Booking, Feedback, FeatureRow
+from app.services.feature_schema import decode_rows
+
+
+# Labels are technician outcomes (Feedback.fault_confirmed), never the model's own risk_level:
+# a row is labeled once feedback on a booking made for its alert reports whether the fault
+# was found. Rows without an outcome are not training data.
+
+# Feedback rows not visible in a previous read's snapshot: committed since, however early
+# their transaction started (xid below the snapshot's xmin were all settled before it)
+_AFTER_SNAPSHOT = text(
+    "feedback.xid >= (pg_snapshot_xmin(CAST(:since AS pg_snapshot))::text)::bigint "
+    "AND NOT pg_visible_in_snapshot((feedback.xid::text)::xid8, CAST(:since AS pg_snapshot))"
+)
+
+
+@dataclass
+class TrainingData:
+    X: np.ndarray
+    y: np.ndarray
+    component: np.ndarray
+    watermark: str | None  # pg_snapshot the labels were read under; the next run starts after it
+
+    @property
+    def rows(self) -> int:
+        return int(self.X.shape[0])
+
+
+@dataclass
+class FeatureChunk:
+    X: np.ndarray  # float32 (rows, len(feature_names))
+    y: np.ndarray  # float32 1.0 where the technician confirmed the fault
+    component: list[str]  # confirmed component, else the predicted one
+    snapshot: str  # pg_current_snapshot() of the read, the same for every chunk
+
+
+async def iter_feature_chunks(
+    engine: AsyncEngine,
+    feature_names: Sequence[str],
+    since: str | None = None,
+    chunk_size: int = 5000,
+    versions: Sequence[str] = ("v1", "v2"),
+) -> AsyncIterator[FeatureChunk]:
+    # Bulk export: streams labeled FeatureRows through a server-side cursor, yielding float32
+    # matrices in `feature_names` column order. `since` is the snapshot of an earlier read.
+    # v2 rows are a superset of v1, so both versions feed models trained on v1 names.
+    stmt = (
+        select(
+            FeatureRow.version,
+            FeatureRow.vector,
+            FeatureRow.features,
+            Feedback.fault_confirmed,
+            func.coalesce(Feedback.confirmed_component, Alert.predicted_component).label("component"),
+        )
+        .join(Alert, Alert.telemetry_event_id == FeatureRow.telemetry_event_id)
+        .join(Booking, Booking.alert_id == Alert.id)
+        .join(Feedback, Feedback.booking_id == Booking.id)
+        .where(Feedback.fault_confirmed.is_not(None), FeatureRow.version.in_(list(versions)))
+        .order_by(Feedback.xid)
+    )
+    if since is not None:
+        stmt = stmt.where(_AFTER_SNAPSHOT.bindparams(since=since))
+
+    async with engine.connect() as conn:
+        # One REPEATABLE READ transaction, so the snapshot recorded is exactly what was read
+        conn = await conn.execution_options(isolation_level="REPEATABLE READ")
+        async with conn.begin():
+            snapshot = (await conn.execute(text("SELECT pg_current_snapshot()::text"))).scalar_one()
+            result = await conn.stream(stmt.execution_options(yield_per=chunk_size))
+            async for rows in result.partitions(chunk_size):
+                yield FeatureChunk(
+                    X=decode_rows(rows, feature_names),
+                    y=np.array([r.fault_confirmed for r in rows], dtype=np.float32),
+                    component=[r.component for r in rows],
+                    snapshot=snapshot,
+                )
+
+
+async def load_labeled_features(
+    engine: AsyncEngine,
+    feature_names: Sequence[str],
+    since: str | None = None,
+    chunk_size: int = 5000,
+    versions: Sequence[str] = ("v1", "v2"),
+    max_rows: int | None = None,
+) -> TrainingData | None:
+    # In memory, for incremental runs; None once more than max_rows turn up, so the caller can
+    # stream a full retrain instead of holding an unbounded matrix
+    x_chunks: list[np.ndarray] = []
+    y_chunks: list[np.ndarray] = []
+    c_chunks: list[np.ndarray] = []
+    rows = 0
+    watermark = None
+
+    async for chunk in iter_feature_chunks(engine, feature_names, since=since, chunk_size=chunk_size, versions=versions):
+        rows += len(chunk.y)
+        if max_rows is not None and rows > max_rows:
+            return None
+        x_chunks.append(chunk.X)
+        y_chunks.append(chunk.y.astype(np.int8))
+        c_chunks.append(np.array(chunk.component, dtype=object))
+        watermark = chunk.snapshot
+
+    if not x_chunks:
+        return TrainingData(
+            X=np.empty((0, len(feature_names)), dtype=np.float32),
+            y=np.empty(0, dtype=np.int8),
+            component=np.empty(0, dtype=object),
+            watermark=None,
+        )
+
+    return TrainingData(
+        X=np.vstack(x_chunks), y=np.concatenate(y_chunks), component=np.concatenate(c_chunks), watermark=watermark
+    )
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from app.core.config import settings
+
+
+T = TypeVar("T")
+
+EXECUTION_MODES = ("inline", "thread", "process")
+
+
+class InferenceOverloadedError(RuntimeError):
+    pass
+
+
+def _preload_worker() -> None:
+    # Runs once per pool process so the first request doesn't pay for model loading;
+    # each worker then follows registry updates on its own
+    from app.ml.registry import get_registry
+
+    get_registry().current()
+
+
+class InferenceExecutor:
+    # Runs model evaluation off the event loop. `pending` counts calls queued or running
+    # in the pool; beyond max_pending new work is rejected instead of piling up.
+
+    def __init__(self, mode: str = "inline", workers: int = 1, max_pending: int = 256):
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"unknown inference mode {mode!r}; expected one of {EXECUTION_MODES}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.pending = 0
+        self.rejected = 0
+        self._pool: Executor | None = None
+
+    def start(self) -> None:
+        if self._pool is not None or self.mode == "inline":
+            return
+        if self.mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        else:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_preload_worker)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def check_capacity(self, n: int = 1) -> None:
+        if self.pending + n > self.max_pending:
+            self.rejected += 1
+            raise InferenceOverloadedError(f"inference queue full ({self.pending}/{self.max_pending} pending)")
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        self.check_capacity()
+        self.pending += 1
+        try:
+            if self._pool is None:
+                return fn(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers if self.mode != "inline" else 0,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
+
+
+_executor: InferenceExecutor | None = None
+_inline = InferenceExecutor(mode="inline")
+
+
+def get_executor() -> InferenceExecutor:
+    # Scripts and Celery workers that never call start_executor() evaluate inline
+    return _executor or _inline
+
+
+def start_executor() -> InferenceExecutor:
+    global _executor
+    if _executor is None:
+        _executor = InferenceExecutor(
+            mode=settings.inference_mode,
+            workers=settings.inference_workers,
+            max_pending=settings.inference_max_pending,
+        )
+        _executor.start()
+    return _executor
+
+
+def stop_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
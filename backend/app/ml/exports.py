@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import csv
+import itertools
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.schemas.common import TelemetryPayload
+from app.services.feature_engineering import FEATURE_NAMES, RAW_FIELDS, features_from_raw
+
+
+# Reading telemetry / feature exports (CSV, or Parquet with pyarrow installed) in chunks and
+# mapping their columns onto model feature names. Used by the bulk scorer and streaming trainer.
+
+# Export column -> feature name, for dumps that predate the API's field names
+COLUMN_ALIASES = {
+    "speed": "speed_kph",
+    "engine_temp": "engine_temp_c",
+    "ambient_temp": "ambient_temp_c",
+    "vibration": "vibration_rms",
+    "oil_pressure": "oil_pressure_kpa",
+    "battery": "battery_v",
+    "battery_voltage": "battery_v",
+    "odometer": "odometer_km",
+}
+
+
+@dataclass(frozen=True)
+class FeaturePlan:
+    # Where each model feature comes from, worked out once from the header
+    feature_names: tuple[str, ...]
+    raw_sources: tuple[int | None, ...]  # input column per RAW_FIELDS entry (None: default)
+    raw_defaults: tuple[float, ...]
+    feature_sources: tuple[tuple[str, int], ...]  # per model feature: ("input"|"v1"|"zero", index)
+
+    def columns(self) -> set[int]:
+        used = {i for i in self.raw_sources if i is not None}
+        return used | {i for kind, i in self.feature_sources if kind == "input"}
+
+
+def plan_features(header: list[str], feature_names: list[str], column_map: dict[str, str] | None = None) -> tuple[FeaturePlan, dict]:
+    # Columns map by name, through COLUMN_ALIASES, or through column_map. Raw readings the input
+    # lacks take the TelemetryPayload defaults (what the API would use), derived v1 features are
+    # recomputed from the readings, and any other feature is zero, as in predict_risk.
+    column_map = column_map or {}
+    columns: dict[str, int] = {}
+    for i, name in enumerate(header):
+        feature = column_map.get(name) or COLUMN_ALIASES.get(name) or name
+        columns.setdefault(feature, i)
+
+    raw_sources = tuple(columns.get(name) for name in RAW_FIELDS)
+    v1_index = {name: i for i, name in enumerate(FEATURE_NAMES)}
+    feature_sources = []
+    for name in feature_names:
+        if name in RAW_FIELDS:
+            # Input column or default, already resolved into the v1 matrix
+            feature_sources.append(("v1", v1_index[name]))
+        elif name in columns:
+            feature_sources.append(("input", columns[name]))
+        elif name in v1_index:
+            feature_sources.append(("v1", v1_index[name]))
+        else:
+            feature_sources.append(("zero", 0))
+
+    plan = FeaturePlan(
+        feature_names=tuple(feature_names),
+        raw_sources=raw_sources,
+        raw_defaults=tuple(float(TelemetryPayload.model_fields[name].default) for name in RAW_FIELDS),
+        feature_sources=tuple(feature_sources),
+    )
+    coverage = {
+        "from_input": [n for n, (kind, _) in zip(feature_names, feature_sources) if kind == "input"],
+        "raw_defaulted": [n for n, src in zip(RAW_FIELDS, raw_sources) if src is None],
+        "zero_filled": [n for n, (kind, _) in zip(feature_names, feature_sources) if kind == "zero"],
+    }
+    return plan, coverage
+
+
+def parse_column_map(items: list[str]) -> dict[str, str]:
+    # COLUMN=FEATURE pairs from the command line
+    mapping = {}
+    for item in items:
+        column, sep, feature = item.partition("=")
+        if not sep or not column or not feature:
+            raise SystemExit(f"--map expects COLUMN=FEATURE, got {item!r}")
+        mapping[column] = feature
+    return mapping
+
+
+def to_float(values, default: float) -> np.ndarray:
+    # CSV strings or Parquet arrays -> float64; empty / null cells take the default, unparseable
+    # ones become NaN (scored as missing)
+    if isinstance(values, np.ndarray) and values.dtype.kind in "fiub":
+        out = values.astype(np.float64)
+        out[np.isnan(out)] = default
+        return out
+    fill = repr(default)
+    strings = [fill if v is None or v == "" else v for v in values]
+    try:
+        return np.array(strings, dtype=np.str_).astype(np.float64)
+    except ValueError:
+        out = np.empty(len(strings))
+        for i, v in enumerate(strings):
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                out[i] = np.nan
+        return out
+
+
+def feature_matrix(plan: FeaturePlan, columns: dict[int, object], n_rows: int) -> np.ndarray:
+    # columns: input column index -> values for this chunk; (n_rows, len(feature_names)) float64
+    raw = np.empty((n_rows, len(RAW_FIELDS)))
+    for j, (src, default) in enumerate(zip(plan.raw_sources, plan.raw_defaults)):
+        raw[:, j] = default if src is None else to_float(columns[src], default)
+    v1 = features_from_raw(raw)
+
+    X = np.zeros((n_rows, len(plan.feature_names)))
+    for j, (kind, i) in enumerate(plan.feature_sources):
+        if kind == "input":
+            X[:, j] = to_float(columns[i], 0.0)
+        elif kind == "v1":
+            X[:, j] = v1[:, i]
+    return X
+
+
+def is_parquet(path: str) -> bool:
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise SystemExit("Parquet input/output needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+def read_csv_header(f) -> list[str]:
+    return next(csv.reader([f.readline()]), [])
+
+
+def iter_csv_lines(f, chunk_rows: int) -> Iterator[list[str]]:
+    # Raw lines, so parsing can happen wherever the chunk is processed
+    while True:
+        lines = list(itertools.islice(f, chunk_rows))
+        if not lines:
+            return
+        # Never cut a quoted field that spans lines: extend until the quotes balance
+        quotes = sum(line.count('"') for line in lines)
+        while quotes % 2:
+            line = f.readline()
+            if not line:
+                break
+            lines.append(line)
+            quotes += line.count('"')
+        yield lines
+
+
+def parse_csv_lines(lines: list[str], needed: list[int]) -> tuple[dict[int, list[str]], int]:
+    rows = list(csv.reader(lines))
+    width = max(needed, default=-1) + 1
+    for row in rows:
+        if len(row) < width:
+            row.extend([""] * (width - len(row)))
+    return {i: [row[i] for row in rows] for i in needed}, len(rows)
+
+
+def iter_parquet_columns(
+    parquet_file, header: list[str], needed: list[int], text: set[int], chunk_rows: int
+) -> Iterator[tuple[dict[int, object], int]]:
+    # Numeric columns as arrays; `text` columns (identifiers copied through) as strings
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=[header[i] for i in needed]):
+        columns = {}
+        for i, array in zip(needed, batch.columns):
+            if i in text:
+                columns[i] = [None if v is None else str(v) for v in array.to_pylist()]
+            else:
+                columns[i] = array.to_numpy(zero_copy_only=False)
+        yield columns, batch.num_rows
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+# Fleet-scale synthetic telemetry: per-vehicle time series for load tests and training data.
+#
+#   python -m app.ml.fleet_sim --vehicles 100000 --days 7 --shard 0 --shards 8 -o shard-0.csv
+#
+# Every vehicle has its own profile (climate, duty cycle, sensor baselines, wear rates) and
+# correlated noise, drifts with mileage and age, and may develop one failure that ramps in
+# over failure_ramp_s before onset (cooling, bearing, lubrication or electrical, pushing the
+# matching sensor past the rule thresholds in app.services.prediction). Each vehicle's random
+# stream is keyed by (seed, vehicle index), so a vehicle's series doesn't depend on the chunk
+# size or on which shard generates it, and shards of one fleet are disjoint. Generation is
+# lazy: one chunk of chunk_steps readings per vehicle at a time, rows in time order.
+
+import argparse
+import csv
+import datetime as dt
+import math
+import sys
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from app.services.feature_engineering import RAW_FIELDS
+
+
+FAILURE_MODES = ("cooling", "bearing", "lubrication", "electrical")
+
+# Correlated noise: AR(1) per signal with this per-step coefficient
+_AR_PHI = 0.9
+_AR_SIGNALS = ("speed", "engine", "vibration", "oil", "battery")
+
+
+def vehicle_id(index: int) -> str:
+    return f"VEH-{index:07d}"
+
+
+def shard_range(vehicles: int, shard: int, shards: int) -> range:
+    # Contiguous, disjoint vehicle indices for shard `shard` of `shards`
+    if not 0 <= shard < shards:
+        raise ValueError(f"shard must be in [0, {shards}), got {shard}")
+    return range(vehicles * shard // shards, vehicles * (shard + 1) // shards)
+
+
+@dataclass(frozen=True)
+class FleetConfig:
+    vehicles: int = 1000
+    start: dt.datetime = field(default_factory=lambda: dt.datetime(2025, 1, 1, tzinfo=dt.timezone.utc))
+    duration_s: float = 86_400.0
+    interval_s: float = 60.0
+    seed: int = 7
+    failure_rate_per_day: float = 0.01  # chance a vehicle starts failing on any given day
+    failure_ramp_s: float = 6 * 3600.0
+
+    @property
+    def steps(self) -> int:
+        return int(self.duration_s // self.interval_s)
+
+
+@dataclass
+class FleetChunk:
+    vehicle_index: np.ndarray  # int64 (rows,)
+    timestamp: np.ndarray  # datetime64[ms] (rows,)
+    values: dict[str, np.ndarray]  # RAW_FIELDS -> (rows,)
+    severity: np.ndarray  # 0..1, how far into its failure ramp the vehicle is
+    failure_mode: np.ndarray  # str, "" while healthy
+
+    @property
+    def rows(self) -> int:
+        return int(self.vehicle_index.shape[0])
+
+    def payloads(self) -> Iterator[dict]:
+        # TelemetryPayload-shaped dicts, in row order
+        columns = [self.values[name].tolist() for name in RAW_FIELDS]
+        stamps = self.timestamp.astype("datetime64[ms]").astype(dt.datetime).tolist()
+        for i, index in enumerate(self.vehicle_index.tolist()):
+            payload = {"vehicle_id": vehicle_id(index), "timestamp": stamps[i].replace(tzinfo=dt.timezone.utc)}
+            payload.update(zip(RAW_FIELDS, (column[i] for column in columns)))
+            yield payload
+
+
+class FleetSimulator:
+    # Holds per-vehicle profiles and noise state for one set of vehicles (e.g. a shard)
+    def __init__(self, config: FleetConfig, vehicles: range | list[int] | None = None) -> None:
+        self.config = config
+        self.indices = np.array(list(vehicles if vehicles is not None else range(config.vehicles)), dtype=np.int64)
+        self._rngs = [np.random.Generator(np.random.Philox(key=[config.seed, int(i)])) for i in self.indices]
+        self._step = 0
+        self._profile()
+
+    def _profile(self) -> None:
+        cfg = self.config
+        n = len(self.indices)
+        p = np.array([rng.random(16) for rng in self._rngs]).reshape(n, 16)
+        self.climate = (p[:, 0] - 0.5) * 20  # ambient mean offset, +-10 C
+        self.engine_offset = (p[:, 1] - 0.5) * 8
+        self.vibration_base = 0.15 + 0.2 * p[:, 2]
+        self.oil_base = 225 + 40 * p[:, 3]
+        self.battery_base = 12.4 + 0.4 * p[:, 4]
+        self.odometer = 200_000 * p[:, 5]
+        self.odometer_start = self.odometer.copy()
+        self.cruise = 40 + 60 * p[:, 6]
+        self.shift_start_h = 5 + 5 * p[:, 7]
+        self.shift_h = 6 + 8 * p[:, 8]
+        # Wear: per 1000 km for vibration / oil pressure, per day for the battery
+        self.vibration_wear = 0.004 * p[:, 9]
+        self.oil_wear = 0.3 * p[:, 10]
+        self.battery_wear = 0.004 * p[:, 11]
+
+        days = cfg.duration_s / 86_400
+        fails = p[:, 12] < 1 - math.exp(-cfg.failure_rate_per_day * days)
+        self.failure_onset_s = np.where(fails, p[:, 13] * cfg.duration_s, np.inf)
+        self.failure_mode = np.where(fails, (p[:, 14] * len(FAILURE_MODES)).astype(int), -1)
+        self.state = np.zeros((n, len(_AR_SIGNALS)))
+
+    def _noise(self, steps: int) -> np.ndarray:
+        # (vehicles, steps, signals + 1); the extra column is ambient jitter
+        return np.stack([rng.standard_normal((steps, len(_AR_SIGNALS) + 1)) for rng in self._rngs])
+
+    def chunk(self, steps: int) -> FleetChunk | None:
+        cfg = self.config
+        steps = min(steps, cfg.steps - self._step)
+        if steps <= 0 or len(self.indices) == 0:
+            return None
+        n = len(self.indices)
+        offsets_s = (self._step + np.arange(steps)) * cfg.interval_s  # (steps,)
+        self._step += steps
+
+        noise = self._noise(steps)
+        ar = np.empty((n, steps, len(_AR_SIGNALS)))
+        innovation = math.sqrt(1 - _AR_PHI**2)
+        for j in range(steps):
+            self.state = _AR_PHI * self.state + innovation * noise[:, j, : len(_AR_SIGNALS)]
+            ar[:, j] = self.state
+
+        epoch_h = cfg.start.timestamp() / 3600 + offsets_s / 3600
+        hour = epoch_h % 24  # (steps,)
+        driving = ((hour[None, :] - self.shift_start_h[:, None]) % 24) < self.shift_h[:, None]
+
+        ambient = 25 + self.climate[:, None] + 7 * np.sin(2 * np.pi * (hour[None, :] - 9) / 24) + 0.5 * noise[:, :, -1]
+        speed = np.where(driving, np.clip(self.cruise[:, None] + 15 * ar[:, :, 0], 0, 140), 0.0)
+        odometer = self.odometer[:, None] + np.cumsum(speed * cfg.interval_s / 3600, axis=1)
+        self.odometer = odometer[:, -1].copy()
+        km_1000 = (odometer - self.odometer_start[:, None]) / 1000
+        days = offsets_s[None, :] / 86_400
+
+        ramp_start = self.failure_onset_s[:, None] - cfg.failure_ramp_s
+        severity = np.clip((offsets_s[None, :] - ramp_start) / cfg.failure_ramp_s, 0, 1)
+        mode = self.failure_mode[:, None]
+
+        engine = (
+            ambient
+            + np.where(driving, 65 + self.engine_offset[:, None], 50)
+            + 2.5 * ar[:, :, 1]
+            + 30 * severity * (mode == 0)
+        )
+        vibration = (
+            (self.vibration_base[:, None] + self.vibration_wear[:, None] * km_1000 + 0.03 * ar[:, :, 2])
+            * np.where(driving, 1.0, 0.4)
+            + 0.8 * severity * (mode == 1)
+        )
+        oil = (
+            self.oil_base[:, None]
+            - self.oil_wear[:, None] * km_1000
+            + 6 * ar[:, :, 3]
+            - np.where(driving, 0, 20)
+            - 120 * severity * (mode == 2)
+        )
+        battery = (
+            self.battery_base[:, None]
+            - self.battery_wear[:, None] * days
+            + 0.05 * ar[:, :, 4]
+            + np.where(driving, 0.4, 0)
+            - 1.5 * severity * (mode == 3)
+        )
+
+        def flat(a: np.ndarray) -> np.ndarray:
+            # (vehicles, steps) -> rows in time order
+            return np.ascontiguousarray(a.T).ravel()
+
+        start = np.datetime64(cfg.start.astimezone(dt.timezone.utc).replace(tzinfo=None), "ms")
+        values = {
+            "speed_kph": flat(speed),
+            "engine_temp_c": flat(engine),
+            "vibration_rms": flat(np.clip(vibration, 0.01, 3.0)),
+            "oil_pressure_kpa": flat(np.clip(oil, 20, 400)),
+            "battery_v": flat(np.clip(battery, 9.0, 15.0)),
+            "odometer_km": flat(odometer),
+            "ambient_temp_c": flat(ambient),
+        }
+        flat_severity = flat(severity)
+        flat_mode = np.repeat(np.array(("",) + FAILURE_MODES)[self.failure_mode + 1][None, :], steps, axis=0).ravel()
+        return FleetChunk(
+            vehicle_index=np.tile(self.indices, steps),
+            timestamp=np.repeat(start + (offsets_s * 1000).astype("timedelta64[ms]"), n),
+            values=values,
+            severity=flat_severity,
+            failure_mode=np.where(flat_severity > 0, flat_mode, ""),
+        )
+
+
+def iter_fleet(config: FleetConfig, vehicles: range | list[int] | None = None, chunk_steps: int = 60) -> Iterator[FleetChunk]:
+    simulator = FleetSimulator(config, vehicles)
+    while (chunk := simulator.chunk(chunk_steps)) is not None:
+        yield chunk
+
+
+def write_csv(chunks: Iterator[FleetChunk], f) -> int:
+    # Same field names as the API, plus ground truth: usable by app.ml.bulk_score and
+    # app.ml.train_stream (--label failing --component-column failure_mode)
+    writer = csv.writer(f, lineterminator="\n")
+    writer.writerow(["vehicle_id", "timestamp", *RAW_FIELDS, "failure_mode", "failing"])
+    rows = 0
+    for chunk in chunks:
+        ids = [vehicle_id(i) for i in chunk.vehicle_index.tolist()]
+        stamps = np.datetime_as_string(chunk.timestamp, unit="s")
+        columns = [np.round(chunk.values[name], 3).tolist() for name in RAW_FIELDS]
+        failing = (chunk.severity > 0).astype(int).tolist()
+        writer.writerows(zip(ids, stamps.tolist(), *columns, chunk.failure_mode.tolist(), failing))
+        rows += chunk.rows
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.ml.fleet_sim", description="Generate synthetic fleet telemetry.")
+    parser.add_argument("-o", "--output", default="-", help="CSV file (default: stdout)")
+    parser.add_argument("--vehicles", type=int, default=1000)
+    parser.add_argument("--days", type=float, default=1.0)
+    parser.add_argument("--interval-s", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--start", default="2025-01-01T00:00:00+00:00")
+    parser.add_argument("--failure-rate", type=float, default=0.01, help="per vehicle per day")
+    parser.add_argument("--shard", type=int, default=0)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--chunk-steps", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    start = dt.datetime.fromisoformat(args.start)
+    config = FleetConfig(
+        vehicles=args.vehicles,
+        start=start if start.tzinfo else start.replace(tzinfo=dt.timezone.utc),
+        duration_s=args.days * 86_400,
+        interval_s=args.interval_s,
+        seed=args.seed,
+        failure_rate_per_day=args.failure_rate,
+    )
+    chunks = iter_fleet(config, shard_range(args.vehicles, args.shard, args.shards), args.chunk_steps)
+    if args.output == "-":
+        rows = write_csv(chunks, sys.stdout)
+    else:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            rows = write_csv(chunks, f)
+    print(f"{rows} rows", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,45 +1,111 @@
 from __future__ import annotations
 
-import os
+import threading
+import time
+from collections.abc import Sequence
 from dataclasses import dataclass
 
 import joblib
 import numpy as np
 
+from app.core.config import settings
+from app.core.metrics import PREDICT_RISK_SECONDS
+
 
 @dataclass
 class ModelBundle:
     feature_names: list[str]
     model: object
+    version: str = "legacy"
+
+
+INFERENCE_BACKENDS = ("xgboost", "numpy")
+
+# Score returned when no model has been published yet
+UNAVAILABLE_SCORE = 0.5
+UNAVAILABLE_VERSION = "unavailable"
+
 
+class SizedModel:
+    # numpy backend: the compiled evaluator for batches up to max_rows, xgboost (loaded on the
+    # first larger batch, so small-batch processes never import it) above
+    def __init__(self, compiled: object, model_path: str, max_rows: int) -> None:
+        self.compiled = compiled
+        self.model_path = model_path
+        self.max_rows = max_rows
+        self._large: object | None = None
+        self._lock = threading.Lock()
 
-_bundle: ModelBundle | None = None
+    def predict_proba(self, x: np.ndarray) -> np.ndarray:
+        if self.max_rows <= 0 or np.ndim(x) < 2 or x.shape[0] <= self.max_rows:
+            return self.compiled.predict_proba(x)
+        if self._large is None:
+            with self._lock:
+                if self._large is None:
+                    self._large = _load_model(self.model_path, "xgboost")
+        return self._large.predict_proba(x)
 
 
-def load_bundle(model_path: str, encoder_path: str) -> ModelBundle:
-    global _bundle
-    if _bundle is not None:
-        return _bundle
+def _load_model(model_path: str, backend: str) -> object:
+    if backend == "numpy":
+        # Compiled flat-array evaluator; scores without importing xgboost
+        from app.ml.tree_eval import compile_xgb_json
 
-    from xgboost import XGBClassifier
+        return SizedModel(compile_xgb_json(model_path), model_path, settings.inference_numpy_max_rows)
+    if backend == "xgboost":
+        from xgboost import XGBClassifier
 
+        model = XGBClassifier()
+        model.load_model(model_path)
+        return model
+    raise ValueError(f"unknown inference backend {backend!r}; expected one of {INFERENCE_BACKENDS}")
+
+
+def load_bundle(model_path: str, encoder_path: str, backend: str | None = None, version: str = "legacy") -> ModelBundle:
     meta = joblib.load(encoder_path)
     feature_names: list[str] = meta["feature_names"]
 
-    model = XGBClassifier()
-    model.load_model(model_path)
+    model = _load_model(model_path, backend or settings.inference_backend)
+    return ModelBundle(feature_names=feature_names, model=model, version=version)
+
+
+def _current_bundle() -> ModelBundle | None:
+    from app.ml.registry import get_registry
 
-    _bundle = ModelBundle(feature_names=feature_names, model=model)
-    return _bundle
+    return get_registry().current()
 
 
-def predict_risk(features: dict, model_path: str, encoder_path: str) -> float:
-    if not (os.path.exists(model_path) and os.path.exists(encoder_path)):
+def predict_risk(features: dict) -> tuple[float, str]:
+    bundle = _current_bundle()
+    if bundle is None:
         # Should be trained at startup, but be defensive
-        return 0.5
+        return UNAVAILABLE_SCORE, UNAVAILABLE_VERSION
 
-    bundle = load_bundle(model_path=model_path, encoder_path=encoder_path)
+    start = time.perf_counter()
     x = np.array([[float(features.get(name, 0.0)) for name in bundle.feature_names]])
 
     proba = bundle.model.predict_proba(x)[0, 1]
-    return float(proba)
+    # Recorded in the process that evaluates: with inference_mode=process that is a pool worker
+    PREDICT_RISK_SECONDS.observe(time.perf_counter() - start, "single")
+    return float(proba), bundle.version
+
+
+def predict_risk_batch(matrix: np.ndarray, feature_names: Sequence[str]) -> tuple[np.ndarray, str]:
+    # One predict_proba call for the whole batch; columns are reordered to the model's feature order
+    n_rows = matrix.shape[0]
+    bundle = _current_bundle()
+    if bundle is None:
+        return np.full(n_rows, UNAVAILABLE_SCORE), UNAVAILABLE_VERSION
+    if n_rows == 0:
+        return np.empty(0, dtype=float), bundle.version
+
+    start = time.perf_counter()
+    index = {name: i for i, name in enumerate(feature_names)}
+    x = np.zeros((n_rows, len(bundle.feature_names)), dtype=float)
+    for j, name in enumerate(bundle.feature_names):
+        if name in index:
+            x[:, j] = matrix[:, index[name]]
+
+    scores = bundle.model.predict_proba(x)[:, 1].astype(float)
+    PREDICT_RISK_SECONDS.observe(time.perf_counter() - start, "batch")
+    return scores, bundle.version
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import contextlib
+import datetime as dt
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from app.core.config import settings
+from app.ml.inference import ModelBundle, load_bundle
+
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILENAME = "xgb_model.json"
+ENCODER_FILENAME = "feature_encoder.joblib"
+TRAINING_FILENAME = "training.json"
+POINTER_FILENAME = "CURRENT"
+LEGACY_VERSION = "legacy"
+
+# Layout under the registry root:
+#   <root>/<version>/xgb_model.json + feature_encoder.joblib   immutable once published
+#   <root>/.staging-<version>/                                 being written by a trainer
+#   <root>/CURRENT                                             name of the live version
+# Readers only ever open directories named by CURRENT, and CURRENT is replaced atomically,
+# so a retrain in progress can never be observed half-written. A reader holds a shared flock
+# on the version directory while loading it; pruning skips directories it can't lock
+# exclusively, so a version being loaded is never removed under the reader.
+
+
+def new_version() -> str:
+    return f"{dt.datetime.now(dt.timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+def version_paths(root: str, version: str) -> tuple[str, str]:
+    directory = os.path.join(root, version)
+    return os.path.join(directory, MODEL_FILENAME), os.path.join(directory, ENCODER_FILENAME)
+
+
+def read_current_version(root: str) -> str | None:
+    try:
+        with open(os.path.join(root, POINTER_FILENAME), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_training_meta(root: str, version: str) -> dict:
+    # Written by trainers next to the model; absent for imported artifacts
+    try:
+        with open(os.path.join(root, version, TRAINING_FILENAME), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def stage_version(root: str) -> tuple[str, str]:
+    version = new_version()
+    staging = os.path.join(root, f".staging-{version}")
+    os.makedirs(staging, exist_ok=False)
+    return version, staging
+
+
+def publish_version(root: str, version: str, staging_dir: str, keep: int | None = None) -> str:
+    final_dir = os.path.join(root, version)
+    for name in (MODEL_FILENAME, ENCODER_FILENAME):
+        if not os.path.exists(os.path.join(staging_dir, name)):
+            raise FileNotFoundError(f"staged version {version} is missing {name}")
+    os.replace(staging_dir, final_dir)
+
+    pointer = os.path.join(root, POINTER_FILENAME)
+    tmp = f"{pointer}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, pointer)
+
+    prune_versions(root, keep=settings.model_registry_keep if keep is None else keep)
+    return version
+
+
+def import_artifacts(root: str, model_path: str, encoder_path: str) -> str:
+    # Publish a pre-registry model/encoder pair as the first registry version
+    version, staging = stage_version(root)
+    shutil.copy2(model_path, os.path.join(staging, MODEL_FILENAME))
+    shutil.copy2(encoder_path, os.path.join(staging, ENCODER_FILENAME))
+    return publish_version(root, version, staging)
+
+
+@contextlib.contextmanager
+def _version_lock(directory: str, exclusive: bool):
+    # Yields False instead of waiting when `exclusive` and the directory is in use
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB if exclusive else fcntl.LOCK_SH)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        os.close(fd)
+
+
+def prune_versions(root: str, keep: int, staging_ttl_s: float | None = None) -> None:
+    current = read_current_version(root)
+    names = os.listdir(root)
+    versions = sorted(name for name in names if not name.startswith(".") and os.path.isdir(os.path.join(root, name)))
+    for name in versions[: max(0, len(versions) - keep)]:
+        if name == current:
+            continue
+        directory = os.path.join(root, name)
+        try:
+            with _version_lock(directory, exclusive=True) as locked:
+                if locked:
+                    shutil.rmtree(directory, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+    # Staging directories of trainers that died before publishing
+    ttl = settings.model_registry_staging_ttl_s if staging_ttl_s is None else staging_ttl_s
+    cutoff = time.time() - ttl
+    for name in names:
+        if name.startswith(".staging-"):
+            directory = os.path.join(root, name)
+            try:
+                if os.path.getmtime(directory) < cutoff:
+                    shutil.rmtree(directory, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+
+
+class ModelRegistry:
+    # Per-process view of the published model. current() is called on every prediction but
+    # only stats the CURRENT pointer once per check interval; a changed pointer is loaded
+    # and warmed on a background thread and swapped in with a single reference assignment,
+    # so in-flight requests keep the bundle they already hold.
+
+    def __init__(
+        self,
+        root: str,
+        backend: str | None = None,
+        check_interval_s: float = 5.0,
+        fallback_model_path: str | None = None,
+        fallback_encoder_path: str | None = None,
+    ):
+        self.root = root
+        self.backend = backend
+        self.check_interval_s = check_interval_s
+        self.fallback_model_path = fallback_model_path
+        self.fallback_encoder_path = fallback_encoder_path
+
+        self._active: ModelBundle | None = None
+        self._pointer_mtime_ns: int | None = None
+        self._next_check = 0.0
+        self._loading = False
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    @property
+    def version(self) -> str | None:
+        return self._active.version if self._active is not None else None
+
+    def current(self) -> ModelBundle | None:
+        if self._active is None:
+            # First use in this process: load synchronously, nothing to serve otherwise
+            with self._lock:
+                if self._active is None:
+                    self._pointer_mtime_ns = self._pointer_mtime()
+                    self._active = self._load_current()
+                    self._next_check = time.monotonic() + self.check_interval_s
+            return self._active
+
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval_s
+            self._check_for_update()
+        return self._active
+
+    def _pointer_mtime(self) -> int | None:
+        try:
+            return os.stat(os.path.join(self.root, POINTER_FILENAME)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _check_for_update(self) -> None:
+        mtime = self._pointer_mtime()
+        if mtime is None or mtime == self._pointer_mtime_ns:
+            return
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+        threading.Thread(target=self._reload, args=(mtime,), name="model-reload", daemon=True).start()
+
+    def _reload(self, mtime: int) -> None:
+        try:
+            version = read_current_version(self.root)
+            if version is None or version == self.version:
+                self._pointer_mtime_ns = mtime
+                return
+            bundle = self._load_current()
+            if bundle is not None:
+                self._active = bundle
+                self.reloads += 1
+                logger.info("model registry: now serving version %s", version)
+            self._pointer_mtime_ns = mtime
+        except Exception:
+            # Keep serving the previous version; the pointer is retried on the next check
+            logger.exception("model registry: failed to load new version")
+        finally:
+            with self._lock:
+                self._loading = False
+
+    def _load_current(self) -> ModelBundle | None:
+        # A version pruned between reading CURRENT and locking it means CURRENT has moved on
+        for _ in range(3):
+            version = read_current_version(self.root)
+            if version is None:
+                return self._load(None)
+            try:
+                with _version_lock(os.path.join(self.root, version), exclusive=False):
+                    return self._load(version)
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _load(self, version: str | None) -> ModelBundle | None:
+        if version is not None:
+            model_path, encoder_path = version_paths(self.root, version)
+        elif self.fallback_model_path and self.fallback_encoder_path:
+            model_path, encoder_path, version = self.fallback_model_path, self.fallback_encoder_path, LEGACY_VERSION
+        else:
+            return None
+
+        if not (os.path.exists(model_path) and os.path.exists(encoder_path)):
+            return None
+
+        bundle = load_bundle(model_path=model_path, encoder_path=encoder_path, backend=self.backend, version=version)
+        # Warm-up: first predict_proba call allocates buffers / JIT state in the backend
+        bundle.model.predict_proba(np.zeros((1, len(bundle.feature_names))))
+        return bundle
+
+    def stats(self) -> dict:
+        return {"version": self.version, "reloads": self.reloads, "root": self.root}
+
+
+_registry: ModelRegistry | None = None
+
+
+def get_registry() -> ModelRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry(
+            root=settings.model_registry_dir,
+            backend=settings.inference_backend,
+            check_interval_s=settings.model_refresh_interval_s,
+            fallback_model_path=settings.model_path,
+            fallback_encoder_path=settings.encoder_path,
+        )
+    return _registry
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from collections.abc import Awaitable, Callable, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.ml.executor import InferenceOverloadedError, get_executor
+from app.ml.inference import predict_risk, predict_risk_batch
+from app.services.feature_engineering import FEATURE_NAMES
+
+
+BatchFn = Callable[[np.ndarray, Sequence[str]], Awaitable[tuple[np.ndarray, str]]]
+
+
+class InferenceScheduler:
+    # Gathers concurrent single-row scoring requests into small batches so one
+    # predict_proba call amortizes the per-call model overhead across callers.
+
+    def __init__(
+        self,
+        batch_fn: BatchFn,
+        max_batch_size: int = 64,
+        max_wait_us: int = 1000,
+        max_queue: int = 0,
+        concurrency: int = 1,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max(0, max_wait_us) / 1_000_000
+
+        self._queue: asyncio.Queue[tuple[np.ndarray, asyncio.Future]] = asyncio.Queue(maxsize=max(0, max_queue))
+        self._task: asyncio.Task | None = None
+        # Batches in flight at once; keeps every pool worker busy while the next batch fills
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        self._inflight: set[asyncio.Task] = set()
+
+        # Adaptive wait: only hold a batch open when recent traffic actually produced batches
+        self._avg_batch_size = 1.0
+
+        self._bucket_bounds = [1 << i for i in range(self.max_batch_size.bit_length()) if (1 << i) < self.max_batch_size]
+        self._bucket_bounds.append(self.max_batch_size)
+        self._bucket_counts = [0] * len(self._bucket_bounds)
+        # Rows still queued as each batch is taken: 0 while batches keep up, growing when they don't
+        self._depth_bounds = [0, *(1 << i for i in range((self.max_batch_size * 16).bit_length()))]
+        self._depth_counts = [0] * len(self._depth_bounds)
+        self._depth_sum = 0
+        self.batches = 0
+        self.requests = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        while not self._queue.empty():
+            _, fut = self._queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError("inference scheduler stopped"))
+
+    async def submit(self, features: dict) -> tuple[float, str]:
+        row = np.array([float(features.get(name, 0.0)) for name in FEATURE_NAMES])
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((row, fut))
+        except asyncio.QueueFull:
+            raise InferenceOverloadedError(f"inference scheduler queue full ({self._queue.maxsize})") from None
+        return await fut
+
+    def stats(self) -> dict:
+        histogram = {str(bound): count for bound, count in zip(self._bucket_bounds, self._bucket_counts)}
+        depth_histogram = {str(bound): count for bound, count in zip(self._depth_bounds, self._depth_counts)}
+        return {
+            "queue_depth": self.queue_depth,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_us": int(self.max_wait_s * 1_000_000),
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": (self.requests / self.batches) if self.batches else 0.0,
+            "batch_size_histogram": histogram,
+            "queue_depth_histogram": depth_histogram,
+            "queue_depth_sum": self._depth_sum,
+        }
+
+    async def _collect(self) -> list[tuple[np.ndarray, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+        if len(batch) < self.max_batch_size and self.max_wait_s > 0 and self._avg_batch_size > 1.5:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        return batch
+
+    def _record(self, size: int, depth: int) -> None:
+        self.batches += 1
+        self.requests += size
+        self._avg_batch_size = 0.9 * self._avg_batch_size + 0.1 * size
+        for i, bound in enumerate(self._bucket_bounds):
+            if size <= bound:
+                self._bucket_counts[i] += 1
+                break
+        self._depth_sum += depth
+        for i, bound in enumerate(self._depth_bounds):
+            if depth <= bound:
+                self._depth_counts[i] += 1
+                break
+
+    async def _run(self) -> None:
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            live = [(row, fut) for row, fut in batch if not fut.cancelled()]
+            self._record(len(batch), self.queue_depth)
+            if not live:
+                self._slots.release()
+                continue
+
+            task = asyncio.create_task(self._dispatch(live))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, live: list[tuple[np.ndarray, asyncio.Future]]) -> None:
+        try:
+            scores, model_version = await self.batch_fn(np.vstack([row for row, _ in live]), FEATURE_NAMES)
+        except Exception as exc:
+            for _, fut in live:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        finally:
+            self._slots.release()
+
+        for (_, fut), score in zip(live, scores.tolist()):
+            if not fut.done():
+                fut.set_result((float(score), model_version))
+
+
+async def _default_batch_fn(matrix: np.ndarray, feature_names: Sequence[str]) -> tuple[np.ndarray, str]:
+    return await get_executor().run(predict_risk_batch, matrix, feature_names)
+
+
+_scheduler: InferenceScheduler | None = None
+
+
+def get_scheduler() -> InferenceScheduler | None:
+    return _scheduler
+
+
+async def start_scheduler() -> None:
+    global _scheduler
+    if not settings.inference_batching or _scheduler is not None:
+        return
+    executor = get_executor()
+    _scheduler = InferenceScheduler(
+        _default_batch_fn,
+        max_batch_size=settings.inference_max_batch_size,
+        max_wait_us=settings.inference_max_wait_us,
+        max_queue=settings.inference_max_pending,
+        concurrency=executor.workers if executor.mode != "inline" else 1,
+    )
+    await _scheduler.start()
+
+
+async def stop_scheduler() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        await _scheduler.stop()
+        _scheduler = None
+
+
+async def score_risk(features: dict) -> tuple[float, str]:
+    # Entry point for request handlers: micro-batched when the scheduler runs, otherwise
+    # a single-row call through the configured executor. Returns (score, model_version).
+    if _scheduler is None:
+        return await get_executor().run(predict_risk, features)
+    return await _scheduler.submit(features)
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import os
+import shutil
 
 import joblib
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import OneHotEncoder
 
+from app.core.config import settings
+from app.ml.datasets import TrainingData
 from app.ml.synthetic_data import make_synthetic_dataset
 
 
@@ -16,31 +20,112 @@ async def train_and_save(model_path: str, encoder_path: str) -> None:
     await asyncio.to_thread(_train_and_save_sync, model_path, encoder_path)
 
 
-def _train_and_save_sync(model_path: str, encoder_path: str) -> None:
-    from xgboost import XGBClassifier
+async def train_and_publish(registry_dir: str) -> str:
+    return await asyncio.to_thread(train_and_publish_sync, registry_dir)
 
-    X_dict, y, component = make_synthetic_dataset(n=4000, seed=7)
 
-    feature_names = list(X_dict.keys())
-    X = np.column_stack([X_dict[k] for k in feature_names])
+def train_and_publish_sync(registry_dir: str) -> str:
+    # Train into a private staging directory, then atomically publish it as the new version
+    from app.ml.registry import ENCODER_FILENAME, MODEL_FILENAME, publish_version, stage_version
 
-    # Encode predicted component as an auxiliary target (stubbed by heuristic at inference)
-    enc = OneHotEncoder(handle_unknown="ignore", sparse_output=False)
-    enc.fit(component.reshape(-1, 1))
+    os.makedirs(registry_dir, exist_ok=True)
+    version, staging = stage_version(registry_dir)
+    try:
+        _train_and_save_sync(
+            model_path=os.path.join(staging, MODEL_FILENAME), encoder_path=os.path.join(staging, ENCODER_FILENAME)
+        )
+        return publish_version(registry_dir, version, staging)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=7, stratify=y)
 
-    model = XGBClassifier(
-        n_estimators=80,
+def train_threads() -> int:
+    return settings.train_n_jobs if settings.train_n_jobs > 0 else (os.cpu_count() or 1)
+
+
+def _new_classifier(n_estimators: int = 80):
+    from xgboost import XGBClassifier
+
+    return XGBClassifier(
+        n_estimators=n_estimators,
         max_depth=4,
         learning_rate=0.1,
         subsample=0.9,
         colsample_bytree=0.9,
         reg_lambda=1.0,
         eval_metric="logloss",
-        n_jobs=1,
+        tree_method="hist",
+        max_bin=settings.train_max_bin,
+        n_jobs=train_threads(),
         random_state=7,
     )
+
+
+def fit_and_publish_sync(
+    registry_dir: str,
+    data: TrainingData,
+    feature_names: list[str],
+    n_estimators: int,
+    base_version: str | None = None,
+    meta: dict | None = None,
+) -> str:
+    # With base_version the booster is warm-started: n_estimators new trees are boosted on
+    # top of the published model using only `data`, and its component encoder is reused.
+    from app.ml.registry import (
+        ENCODER_FILENAME,
+        MODEL_FILENAME,
+        TRAINING_FILENAME,
+        publish_version,
+        stage_version,
+        version_paths,
+    )
+
+    os.makedirs(registry_dir, exist_ok=True)
+    version, staging = stage_version(registry_dir)
+    try:
+        model = _new_classifier(n_estimators=n_estimators)
+        if base_version is not None:
+            base_model_path, base_encoder_path = version_paths(registry_dir, base_version)
+            model.fit(data.X, data.y, xgb_model=base_model_path)
+            enc = joblib.load(base_encoder_path)["component_encoder"]
+        else:
+            model.fit(data.X, data.y)
+            enc = OneHotEncoder(handle_unknown="ignore", sparse_output=False)
+            enc.fit(data.component.reshape(-1, 1))
+
+        model.save_model(os.path.join(staging, MODEL_FILENAME))
+        joblib.dump({"feature_names": feature_names, "component_encoder": enc}, os.path.join(staging, ENCODER_FILENAME))
+
+        training = {
+            "rows": data.rows,
+            "label_snapshot": data.watermark,
+            "base_version": base_version,
+            "n_trees": int(model.get_booster().num_boosted_rounds()),
+            **(meta or {}),
+        }
+        with open(os.path.join(staging, TRAINING_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(training, f)
+
+        return publish_version(registry_dir, version, staging)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def _train_and_save_sync(model_path: str, encoder_path: str) -> None:
+    X_dict, y, component = make_synthetic_dataset(n=4000, seed=7)
+
+    feature_names = list(X_dict.keys())
+    X = np.column_stack([X_dict[k] for k in feature_names])
+
+    # Encode predicted component as an auxiliary target (stubbed by heuristic at inference)
+    enc = OneHotEncoder(handle_unknown="ignore", sparse_output=False)
+    enc.fit(component.reshape(-1, 1))
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=7, stratify=y)
+
+    model = _new_classifier()
     model.fit(X_train, y_train)
 
     os.makedirs(os.path.dirname(model_path), exist_ok=True)
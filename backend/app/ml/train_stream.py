@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+# Streaming training for fleet-scale data (full retrains and exported files).
+#
+#   python -m app.ml.train_stream                                  # labeled rows from the DB
+#   python -m app.ml.train_stream --input features.csv --label anomaly_detected
+#
+# Feature batches are spooled chunk by chunk to .npz shards (randomly split into train and
+# validation), then fed to XGBoost through a DataIter: quantised into a QuantileDMatrix, or
+# paged from disk as an external-memory DMatrix with --external-memory. Neither the database
+# result nor the float matrix is ever held whole. Trees use the hist method on all cores with
+# early stopping on the validation shards; timings and peak RSS go into training.json next to
+# the model, which load_bundle reads like any other version.
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+import joblib
+import numpy as np
+import xgboost as xgb
+from sklearn.preprocessing import OneHotEncoder
+
+from app.core.config import settings
+from app.ml.datasets import iter_feature_chunks
+from app.ml.exports import (
+    feature_matrix,
+    is_parquet,
+    iter_csv_lines,
+    iter_parquet_columns,
+    parse_column_map,
+    parse_csv_lines,
+    plan_features,
+    read_csv_header,
+    require_pyarrow,
+    to_float,
+)
+from app.ml.train import train_threads
+
+
+@dataclass
+class Spool:
+    directory: str
+    train: list[str] = field(default_factory=list)
+    validation: list[str] = field(default_factory=list)
+    rows: int = 0
+    validation_rows: int = 0
+    positives: int = 0
+    components: set[str] = field(default_factory=set)
+    watermark: str | None = None  # pg_snapshot the DB rows were read under
+
+
+class SpoolWriter:
+    # Appends one train shard and one validation shard per chunk; rows go to validation with
+    # probability validation_fraction (a random split: chunks arrive in time order)
+    def __init__(self, directory: str, validation_fraction: float, seed: int = 7) -> None:
+        self.spool = Spool(directory=directory)
+        self.validation_fraction = validation_fraction
+        self._rng = np.random.default_rng(seed)
+
+    def _save(self, kind: str, X: np.ndarray, y: np.ndarray) -> str:
+        shards = getattr(self.spool, kind)
+        path = os.path.join(self.spool.directory, f"{kind}-{len(shards):06d}.npz")
+        np.savez(path, X=np.ascontiguousarray(X, dtype=np.float32), y=y.astype(np.float32))
+        shards.append(path)
+        return path
+
+    def add(self, X: np.ndarray, y: np.ndarray, components: Iterable[str] | None = None, watermark: str | None = None) -> None:
+        keep = ~np.isnan(y)
+        X, y = X[keep], y[keep]
+        if len(y) == 0:
+            return
+        validation = self._rng.random(len(y)) < self.validation_fraction
+        if (~validation).any():
+            self._save("train", X[~validation], y[~validation])
+        if validation.any():
+            self._save("validation", X[validation], y[validation])
+            self.spool.validation_rows += int(validation.sum())
+        self.spool.rows += len(y)
+        self.spool.positives += int((y > 0.5).sum())
+        if components is not None:
+            self.spool.components.update(c for c in components if c)
+        if watermark is not None:
+            self.spool.watermark = watermark
+
+
+@contextlib.contextmanager
+def spool_directory(root: str | None = None) -> Iterator[str]:
+    root = root or settings.train_spool_dir
+    os.makedirs(root, exist_ok=True)
+    directory = tempfile.mkdtemp(prefix="spool-", dir=root)
+    try:
+        yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+async def spool_from_db(engine, feature_names: list[str], directory: str, since: str | None = None) -> Spool:
+    writer = SpoolWriter(directory, settings.train_validation_fraction)
+    async for chunk in iter_feature_chunks(engine, feature_names, since=since, chunk_size=settings.retrain_chunk_size):
+        writer.add(chunk.X, chunk.y, chunk.component, chunk.snapshot)
+    return writer.spool
+
+
+def spool_from_file(
+    path: str,
+    feature_names: list[str],
+    directory: str,
+    label: str,
+    component_column: str | None = None,
+    column_map: dict[str, str] | None = None,
+    chunk_rows: int | None = None,
+) -> tuple[Spool, dict]:
+    # Exported telemetry/features with a 0/1 label column; rows with an empty label are skipped
+    chunk_rows = chunk_rows or settings.retrain_chunk_size
+    writer = SpoolWriter(directory, settings.train_validation_fraction)
+
+    f = None
+    if is_parquet(path):
+        source = require_pyarrow().parquet.ParquetFile(path)
+        header = list(source.schema_arrow.names)
+    else:
+        f = open(path, newline="", encoding="utf-8-sig")
+        header = read_csv_header(f)
+    try:
+        for name in (label, component_column):
+            if name is not None and name not in header:
+                raise SystemExit(f"column {name!r} not in {path}")
+        plan, coverage = plan_features(header, feature_names, column_map)
+        label_i = header.index(label)
+        component_i = header.index(component_column) if component_column else None
+        needed = sorted(plan.columns() | {label_i} | ({component_i} if component_i is not None else set()))
+        if f is None:
+            text = {component_i} if component_i is not None else set()
+            chunks = iter_parquet_columns(source, header, needed, text, chunk_rows)
+        else:
+            chunks = (parse_csv_lines(lines, needed) for lines in iter_csv_lines(f, chunk_rows))
+        for columns, n_rows in chunks:
+            X = feature_matrix(plan, columns, n_rows)
+            y = to_float(columns[label_i], np.nan)
+            writer.add(X, y, columns[component_i] if component_i is not None else None)
+    finally:
+        if f is not None:
+            f.close()
+    return writer.spool, coverage
+
+
+class ShardIter(xgb.DataIter):
+    # Hands the spooled shards to XGBoost one at a time; XGBoost may make several passes
+    def __init__(self, paths: list[str], cache_prefix: str | None = None) -> None:
+        self._paths = paths
+        self._i = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        if self._i == len(self._paths):
+            return False
+        with np.load(self._paths[self._i]) as shard:
+            input_data(data=shard["X"], label=shard["y"])
+        self._i += 1
+        return True
+
+    def reset(self) -> None:
+        self._i = 0
+
+
+class PeakRss:
+    # Peak resident set size of this process while the block runs, sampled on a thread
+    # (ru_maxrss alone would report the peak since process start)
+    def __init__(self, interval_s: float = 0.05) -> None:
+        self.interval_s = interval_s
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _rss(self) -> int:
+        try:
+            with open("/proc/self/statm", encoding="ascii") as f:
+                return int(f.read().split()[1]) * self._page
+        except OSError:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.peak_bytes = max(self.peak_bytes, self._rss())
+
+    def __enter__(self) -> PeakRss:
+        self.peak_bytes = self._rss()
+        self._thread = threading.Thread(target=self._run, name="peak-rss", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self._rss())
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak_bytes / 2**20, 1)
+
+
+def _params(nthread: int) -> dict:
+    # Same model shape as train._new_classifier
+    return {
+        "objective": "binary:logistic",
+        "eval_metric": "logloss",
+        "tree_method": "hist",
+        "max_bin": settings.train_max_bin,
+        "max_depth": 4,
+        "eta": 0.1,
+        "subsample": 0.9,
+        "colsample_bytree": 0.9,
+        "lambda": 1.0,
+        "nthread": nthread,
+        "seed": 7,
+    }
+
+
+def train_on_spool(spool: Spool, external_memory: bool | None = None, max_rounds: int | None = None) -> tuple[xgb.Booster, dict]:
+    external_memory = settings.train_external_memory if external_memory is None else external_memory
+    max_rounds = max_rounds or settings.train_max_rounds
+    nthread = train_threads()
+
+    with PeakRss() as rss:
+        started = time.perf_counter()
+        if external_memory:
+            cache = os.path.join(spool.directory, "cache")
+            dtrain = xgb.DMatrix(ShardIter(spool.train, cache_prefix=f"{cache}-train"), nthread=nthread)
+            dval = xgb.DMatrix(ShardIter(spool.validation, cache_prefix=f"{cache}-val"), nthread=nthread) if spool.validation else None
+        else:
+            dtrain = xgb.QuantileDMatrix(ShardIter(spool.train), max_bin=settings.train_max_bin, nthread=nthread)
+            dval = xgb.QuantileDMatrix(ShardIter(spool.validation), ref=dtrain, nthread=nthread) if spool.validation else None
+        matrix_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        evals = [(dval, "validation")] if dval is not None else []
+        booster = xgb.train(
+            _params(nthread),
+            dtrain,
+            num_boost_round=max_rounds,
+            evals=evals,
+            early_stopping_rounds=settings.train_early_stopping_rounds if evals else None,
+            verbose_eval=False,
+        )
+        train_s = time.perf_counter() - started
+        # Frees the quantised pages (and removes external-memory cache files) before the spool goes
+        early_stopping = bool(evals)
+        del dtrain, dval, evals
+
+    best_iteration = booster.best_iteration if early_stopping else None
+    best_score = booster.best_score if early_stopping else None
+    if best_iteration is not None and best_iteration + 1 < booster.num_boosted_rounds():
+        # Keep only the trees up to the best validation score
+        booster = booster[: best_iteration + 1]
+    stats = {
+        "rows": spool.rows - spool.validation_rows,
+        "validation_rows": spool.validation_rows,
+        "best_iteration": best_iteration,
+        "best_validation_logloss": round(float(best_score), 6) if best_score is not None else None,
+        "n_trees": int(booster.num_boosted_rounds()),
+        "tree_method": "hist",
+        "nthread": nthread,
+        "external_memory": external_memory,
+        "matrix_seconds": round(matrix_s, 3),
+        "train_seconds": round(train_s, 3),
+        "peak_rss_mb": rss.peak_mb,
+    }
+    return booster, stats
+
+
+def publish_spool(
+    registry_dir: str,
+    spool: Spool,
+    feature_names: list[str],
+    external_memory: bool | None = None,
+    max_rounds: int | None = None,
+    meta: dict | None = None,
+) -> tuple[str, dict]:
+    # Same artifacts as train.fit_and_publish_sync: model JSON, encoder with feature_names,
+    # training.json; the version is published atomically through the registry
+    from app.ml.registry import ENCODER_FILENAME, MODEL_FILENAME, TRAINING_FILENAME, publish_version, stage_version
+
+    os.makedirs(registry_dir, exist_ok=True)
+    version, staging = stage_version(registry_dir)
+    try:
+        booster, stats = train_on_spool(spool, external_memory=external_memory, max_rounds=max_rounds)
+        booster.save_model(os.path.join(staging, MODEL_FILENAME))
+
+        # Sources without a component column still get a usable encoder
+        enc = OneHotEncoder(handle_unknown="ignore", sparse_output=False)
+        enc.fit(np.array(sorted(spool.components) or ["general"], dtype=object).reshape(-1, 1))
+        joblib.dump({"feature_names": feature_names, "component_encoder": enc}, os.path.join(staging, ENCODER_FILENAME))
+
+        training = {
+            **stats,
+            "rows": spool.rows,
+            "label_snapshot": spool.watermark,
+            "base_version": None,
+            **(meta or {}),
+        }
+        with open(os.path.join(staging, TRAINING_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(training, f)
+        return publish_version(registry_dir, version, staging), training
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+async def _spool_db(feature_names: list[str], directory: str) -> Spool:
+    from app.db.session import worker_engine
+
+    async with worker_engine() as engine:
+        return await spool_from_db(engine, feature_names, directory)
+
+
+def main(argv: list[str] | None = None) -> int:
+    from app.services.feature_engineering import FEATURE_NAMES
+
+    parser = argparse.ArgumentParser(prog="python -m app.ml.train_stream", description="Train and publish a model from streamed batches.")
+    parser.add_argument("--input", default=None, help="CSV or Parquet export (default: labeled rows from the database)")
+    parser.add_argument("--label", default="label", help="0/1 label column of --input")
+    parser.add_argument("--component-column", default=None)
+    parser.add_argument("--map", action="append", default=[], metavar="COLUMN=FEATURE")
+    parser.add_argument("--registry-dir", default=settings.model_registry_dir)
+    parser.add_argument("--spool-dir", default=None)
+    parser.add_argument("--external-memory", action="store_true", default=None)
+    parser.add_argument("--max-rounds", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    feature_names = list(FEATURE_NAMES)
+    started = time.perf_counter()
+    with spool_directory(args.spool_dir) as directory:
+        if args.input:
+            spool, coverage = spool_from_file(
+                args.input, feature_names, directory, args.label, args.component_column, parse_column_map(args.map)
+            )
+        else:
+            spool, coverage = asyncio.run(_spool_db(feature_names, directory)), {}
+        spool_s = time.perf_counter() - started
+        if spool.positives in (0, spool.rows):
+            print(json.dumps({"trained": False, "reason": "need both label classes", "rows": spool.rows}))
+            return 1
+        version, training = publish_spool(
+            args.registry_dir,
+            spool,
+            feature_names,
+            external_memory=args.external_memory,
+            max_rounds=args.max_rounds,
+            meta={"mode": "full", "source": args.input or "database", "spool_seconds": round(spool_s, 3)},
+        )
+    print(json.dumps({"model_version": version, **training, **coverage, "seconds": round(time.perf_counter() - started, 3)}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+
+import numpy as np
+
+
+_SIGMOID_OBJECTIVES = {"binary:logistic", "reg:logistic"}
+
+# Rows scored per chunk; keeps the (rows x trees) working set cache-sized for large batches
+_CHUNK_ROWS = 1024
+
+# Padding to a perfect tree doubles storage per level; deeper models stay on xgboost
+_MAX_PADDED_DEPTH = 12
+
+
+@dataclass(frozen=True)
+class CompiledForest:
+    # Every tree is padded to a perfect binary tree of depth max_depth and stored in heap
+    # order (children of slot i are 2i+1 / 2i+2), so traversal is pure index arithmetic:
+    # one gather of feature/threshold per level and one gather of leaf values at the end.
+    # Leaves that sit above max_depth become pass-through splits (threshold=+inf, missing
+    # goes left) whose value is copied to every padded leaf beneath them.
+    feature: np.ndarray  # int32 (n_trees * n_internal,), split feature index
+    threshold: np.ndarray  # float32 (n_trees * n_internal,), go left when x < threshold
+    default_left: np.ndarray  # bool (n_trees * n_internal,), direction for missing (NaN) values
+    value: np.ndarray  # float32 (n_trees * n_leaves,), leaf values
+    max_depth: int
+    base_margin: float
+    objective: str
+    num_features: int
+
+    @property
+    def n_internal(self) -> int:
+        return (1 << self.max_depth) - 1
+
+    @property
+    def n_trees(self) -> int:
+        return int(self.value.shape[0] >> self.max_depth)
+
+    def decision_function(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        n_rows, n_cols = x.shape
+        if n_rows > _CHUNK_ROWS:
+            return np.concatenate(
+                [self.decision_function(x[i : i + _CHUNK_ROWS]) for i in range(0, n_rows, _CHUNK_ROWS)]
+            )
+
+        flat = x.ravel()
+        row_base = (np.arange(n_rows, dtype=np.intp) * n_cols)[:, None]
+        tree_base = np.arange(self.n_trees, dtype=np.intp) * self.n_internal
+        has_missing = bool(np.isnan(x).any())
+
+        # node = position within the current level of each tree, per row
+        node = np.zeros((n_rows, self.n_trees), dtype=np.intp)
+        for depth in range(self.max_depth):
+            slot = tree_base + ((1 << depth) - 1) + node
+            xv = flat[row_base + self.feature[slot]]
+            go_right = ~(xv < self.threshold[slot])
+            if has_missing:
+                go_right &= ~(np.isnan(xv) & self.default_left[slot])
+            node = 2 * node + go_right
+
+        leaf_base = np.arange(self.n_trees, dtype=np.intp) << self.max_depth
+        return self.value[leaf_base + node].sum(axis=1, dtype=np.float32).astype(np.float64) + self.base_margin
+
+    def predict_proba(self, x: np.ndarray) -> np.ndarray:
+        # Same shape contract as XGBClassifier.predict_proba: column 1 is P(failure)
+        p = 1.0 / (1.0 + np.exp(-self.decision_function(x)))
+        return np.column_stack([1.0 - p, p])
+
+    def save(self, path: str) -> None:
+        meta = {
+            "max_depth": self.max_depth,
+            "base_margin": self.base_margin,
+            "objective": self.objective,
+            "num_features": self.num_features,
+        }
+        np.savez(
+            path,
+            feature=self.feature,
+            threshold=self.threshold,
+            default_left=self.default_left,
+            value=self.value,
+            meta=np.array(json.dumps(meta)),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> CompiledForest:
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            arrays = {k: data[k] for k in ("feature", "threshold", "default_left", "value")}
+        return cls(**arrays, **meta)
+
+
+def _tree_depth(left: list[int], right: list[int]) -> int:
+    depth = 0
+    stack = [(0, 0)]
+    while stack:
+        node, d = stack.pop()
+        if left[node] == -1:
+            depth = max(depth, d)
+        else:
+            stack.append((left[node], d + 1))
+            stack.append((right[node], d + 1))
+    return depth
+
+
+def compile_xgb_json(model_path: str) -> CompiledForest:
+    with open(model_path, encoding="utf-8") as f:
+        learner = json.load(f)["learner"]
+
+    objective = learner["objective"]["name"]
+    if objective not in _SIGMOID_OBJECTIVES:
+        raise ValueError(f"unsupported objective for compiled evaluation: {objective}")
+
+    booster = learner["gradient_booster"]
+    if booster["name"] != "gbtree":
+        raise ValueError(f"unsupported booster for compiled evaluation: {booster['name']}")
+
+    params = learner["learner_model_param"]
+    if int(params.get("num_class", "0")) > 1 or int(params.get("num_target", "1")) > 1:
+        raise ValueError("compiled evaluation supports single-output models only")
+
+    trees = booster["model"]["trees"]
+    for tree in trees:
+        if any(int(t) != 0 for t in tree["split_type"]):
+            raise ValueError("categorical splits are not supported by the compiled evaluator")
+
+    # base_score is stored as a probability for logistic objectives; trees add to its logit
+    base_score = float(params["base_score"])
+    base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+    max_depth = max((_tree_depth(t["left_children"], t["right_children"]) for t in trees), default=0)
+    if max_depth > _MAX_PADDED_DEPTH:
+        raise ValueError(f"tree depth {max_depth} exceeds compiled evaluator limit {_MAX_PADDED_DEPTH}")
+    n_internal = (1 << max_depth) - 1
+    n_leaves = 1 << max_depth
+
+    feature = np.zeros((len(trees), n_internal), dtype=np.int32)
+    threshold = np.full((len(trees), n_internal), np.inf, dtype=np.float32)
+    default_left = np.ones((len(trees), n_internal), dtype=bool)
+    value = np.zeros((len(trees), n_leaves), dtype=np.float32)
+
+    for t, tree in enumerate(trees):
+        left, right = tree["left_children"], tree["right_children"]
+        conditions, indices, defaults = tree["split_conditions"], tree["split_indices"], tree["default_left"]
+
+        stack = [(0, 0, 0)]  # (xgboost node id, depth, position within level)
+        while stack:
+            node, depth, pos = stack.pop()
+            if left[node] == -1:
+                span = 1 << (max_depth - depth)
+                value[t, pos * span : (pos + 1) * span] = conditions[node]
+                continue
+            slot = (1 << depth) - 1 + pos
+            feature[t, slot] = indices[node]
+            threshold[t, slot] = conditions[node]
+            default_left[t, slot] = bool(defaults[node])
+            stack.append((left[node], depth + 1, 2 * pos))
+            stack.append((right[node], depth + 1, 2 * pos + 1))
+
+    return CompiledForest(
+        feature=feature.ravel(),
+        threshold=threshold.ravel(),
+        default_left=default_left.ravel(),
+        value=value.ravel(),
+        max_depth=max_depth,
+        base_margin=base_margin,
+        objective=objective,
+        num_features=int(params["num_feature"]),
+    )
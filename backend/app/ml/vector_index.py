@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import os
+import shutil
+import uuid
+from collections.abc import Sequence
+
+import numpy as np
+
+
+META_FILENAME = "meta.json"
+CENTROIDS_FILENAME = "centroids.npy"
+VECTORS_FILENAME = "vectors.f32"
+ROWS_FILENAME = "rows.bin"
+POINTER_FILENAME = "CURRENT"
+
+# Per-vector metadata, parallel to vectors.f32
+ROW_DTYPE = np.dtype(
+    [
+        ("case_id", "V16"),
+        ("alert_id", "V16"),
+        ("created_at", "<f8"),  # epoch seconds
+        ("component", "<i4"),  # index into meta["components"]
+        ("list", "<i4"),  # IVF list (nearest centroid)
+    ]
+)
+
+# Layout under the index root:
+#   <root>/<version>/meta.json       dims, standardisation, IVF size, committed row count, watermark
+#   <root>/<version>/centroids.npy   (nlist, dim) float32 coarse quantizer
+#   <root>/<version>/vectors.f32     (rows, dim) standardised float32, append-only
+#   <root>/<version>/rows.bin        ROW_DTYPE records, append-only
+#   <root>/CURRENT                   name of the live version
+# A rebuild writes a new version and swaps CURRENT; incremental adds append to the live
+# version's files and then replace meta.json atomically. Readers memory-map only the first
+# meta["count"] rows, so they never see a partially written row.
+
+
+def train_centroids(sample: np.ndarray, nlist: int, iterations: int = 15, seed: int = 0) -> np.ndarray:
+    # Lloyd's k-means on a sample; empty clusters are re-seeded from random sample points
+    rng = np.random.default_rng(seed)
+    sample = np.ascontiguousarray(sample, dtype=np.float32)
+    nlist = max(1, min(nlist, sample.shape[0]))
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = nearest_centroid(sample, centroids)
+        counts = np.bincount(assign, minlength=nlist)
+        sums = np.stack(
+            [np.bincount(assign, weights=sample[:, d], minlength=nlist) for d in range(sample.shape[1])], axis=1
+        )
+        empty = counts == 0
+        centroids[~empty] = (sums[~empty] / counts[~empty, None]).astype(np.float32)
+        if empty.any():
+            centroids[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()), replace=False)]
+    return centroids
+
+
+def _sq_distances(X: np.ndarray, Y: np.ndarray, y_sq: np.ndarray | None = None) -> np.ndarray:
+    # Squared L2 via ||x||^2 - 2 x.y + ||y||^2: one GEMM instead of an (n, m, dim) broadcast
+    if y_sq is None:
+        y_sq = np.einsum("ij,ij->i", Y, Y)
+    d = np.einsum("ij,ij->i", X, X)[:, None] - 2.0 * (X @ Y.T) + y_sq[None, :]
+    return np.maximum(d, 0.0, out=d)
+
+
+def nearest_centroid(X: np.ndarray, centroids: np.ndarray, chunk: int = 65_536) -> np.ndarray:
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(X.shape[0], dtype=np.int32)
+    for i in range(0, X.shape[0], chunk):
+        out[i : i + chunk] = _sq_distances(X[i : i + chunk], centroids, c_sq).argmin(axis=1)
+    return out
+
+
+def read_pointer(root: str) -> str | None:
+    try:
+        with open(os.path.join(root, POINTER_FILENAME), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_json_atomic(path: str, data: dict) -> None:
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class VectorIndex:
+    # IVF (inverted file) approximate nearest-neighbour index in plain NumPy. Vectors are
+    # standardised per feature (mean/std fixed at build time) and assigned to the nearest of
+    # `nlist` k-means centroids; a query scans only the `nprobe` lists closest to it. Vectors
+    # and row metadata are memory-mapped, so opening an index costs one pass over the list ids
+    # (to group rows by list) and the pages a query touches.
+
+    def __init__(self, directory: str, meta: dict, writable: bool = False) -> None:
+        self.directory = directory
+        self.meta = meta
+        self.writable = writable
+        self.names: tuple[str, ...] = tuple(meta["names"])
+        self.dim = len(self.names)
+        self.mean = np.asarray(meta["mean"], dtype=np.float32)
+        self.std = np.asarray(meta["std"], dtype=np.float32)
+        self.centroids = np.load(os.path.join(directory, CENTROIDS_FILENAME))
+        self.nlist = self.centroids.shape[0]
+        self._load_arrays()
+
+    @classmethod
+    def create(
+        cls,
+        directory: str,
+        names: Sequence[str],
+        mean: np.ndarray,
+        std: np.ndarray,
+        centroids: np.ndarray,
+        extra: dict | None = None,
+    ) -> "VectorIndex":
+        os.makedirs(directory, exist_ok=False)
+        np.save(os.path.join(directory, CENTROIDS_FILENAME), np.ascontiguousarray(centroids, dtype=np.float32))
+        for name in (VECTORS_FILENAME, ROWS_FILENAME):
+            open(os.path.join(directory, name), "wb").close()
+        meta = {
+            "names": list(names),
+            "mean": np.asarray(mean, dtype=np.float64).tolist(),
+            "std": np.asarray(std, dtype=np.float64).tolist(),
+            "count": 0,
+            "components": [],
+            "watermark": None,
+            "trained_count": 0,
+            **(extra or {}),
+        }
+        _write_json_atomic(os.path.join(directory, META_FILENAME), meta)
+        return cls(directory, meta, writable=True)
+
+    @classmethod
+    def open(cls, directory: str, writable: bool = False) -> "VectorIndex":
+        with open(os.path.join(directory, META_FILENAME), encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(directory, meta, writable=writable)
+
+    @property
+    def count(self) -> int:
+        return int(self.meta["count"])
+
+    def _load_arrays(self) -> None:
+        n = self.count
+        if n:
+            self.vectors = np.memmap(os.path.join(self.directory, VECTORS_FILENAME), dtype=np.float32, mode="r", shape=(n, self.dim))
+            self.rows = np.memmap(os.path.join(self.directory, ROWS_FILENAME), dtype=ROW_DTYPE, mode="r", shape=(n,))
+            lists = np.asarray(self.rows["list"])
+        else:
+            self.vectors = np.empty((0, self.dim), dtype=np.float32)
+            self.rows = np.empty(0, dtype=ROW_DTYPE)
+            lists = np.empty(0, dtype=np.int32)
+        # Row ids grouped by list; builds write rows in list order, so these are mostly
+        # contiguous runs and a probe reads sequential pages
+        self._order = np.argsort(lists, kind="stable")
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=self.nlist))])
+        self._sq_norms = np.einsum("ij,ij->i", self.vectors, self.vectors) if n else np.empty(0, dtype=np.float32)
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return ((np.asarray(X, dtype=np.float32) - self.mean) / self.std).astype(np.float32, copy=False)
+
+    def add(
+        self,
+        X: np.ndarray,
+        case_ids: Sequence[uuid.UUID],
+        alert_ids: Sequence[uuid.UUID],
+        created_at: Sequence[dt.datetime],
+        components: Sequence[str],
+        order_by_list: bool = False,
+    ) -> int:
+        # Append raw (unstandardised) vectors in self.names column order. order_by_list writes
+        # the batch grouped by IVF list (what a full build does, for sequential probes).
+        if not self.writable:
+            raise RuntimeError("index was opened read-only")
+        if len(X) == 0:
+            return 0
+        Z = self.transform(X)
+        lists = nearest_centroid(Z, self.centroids)
+
+        vocab = {name: i for i, name in enumerate(self.meta["components"])}
+        for name in components:
+            if name not in vocab:
+                vocab[name] = len(vocab)
+        records = np.empty(len(Z), dtype=ROW_DTYPE)
+        records["case_id"] = [u.bytes for u in case_ids]
+        records["alert_id"] = [u.bytes for u in alert_ids]
+        records["created_at"] = [t.timestamp() for t in created_at]
+        records["component"] = [vocab[name] for name in components]
+        records["list"] = lists
+        if order_by_list:
+            order = np.argsort(lists, kind="stable")
+            Z, records = Z[order], records[order]
+
+        # Row data first, then the count that makes it visible
+        for name, data in ((VECTORS_FILENAME, Z), (ROWS_FILENAME, records)):
+            path = os.path.join(self.directory, name)
+            with open(path, "r+b") as f:
+                # Drop bytes past the committed count left behind by an interrupted add
+                width = self.dim * 4 if name == VECTORS_FILENAME else ROW_DTYPE.itemsize
+                f.truncate(self.count * width)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(data).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        newest = max(created_at).astimezone(dt.timezone.utc).isoformat()
+        self.meta = {
+            **self.meta,
+            "count": self.count + len(Z),
+            "components": list(vocab),
+            "watermark": max(self.meta["watermark"] or newest, newest),
+        }
+        _write_json_atomic(os.path.join(self.directory, META_FILENAME), self.meta)
+        self._load_arrays()
+        return len(Z)
+
+    def search(self, X: np.ndarray, k: int, nprobe: int) -> tuple[np.ndarray, np.ndarray]:
+        # Batch query with raw vectors: (Q, k) squared distances in standardised space and row
+        # ids, ascending; -1 / inf pad when fewer than k rows sit in the probed lists
+        Q = self.transform(np.atleast_2d(X))
+        best_d = np.full((len(Q), k), np.inf, dtype=np.float32)
+        best_i = np.full((len(Q), k), -1, dtype=np.int64)
+        if not self.count:
+            return best_d, best_i
+
+        nprobe = max(1, min(nprobe, self.nlist))
+        probes = np.argpartition(_sq_distances(Q, self.centroids), nprobe - 1, axis=1)[:, :nprobe]
+        # Gather each probed list once and score every query that probes it with one GEMM
+        for lst in np.unique(probes):
+            start, stop = self._offsets[lst], self._offsets[lst + 1]
+            if start == stop:
+                continue
+            rows = self._order[start:stop]
+            qs = np.nonzero((probes == lst).any(axis=1))[0]
+            if rows[-1] - rows[0] + 1 == len(rows):
+                vectors = self.vectors[rows[0] : rows[-1] + 1]
+            else:
+                vectors = self.vectors[rows]
+            d = _sq_distances(Q[qs], np.asarray(vectors), self._sq_norms[rows])
+
+            cand_d = np.concatenate([best_d[qs], d], axis=1)
+            cand_i = np.concatenate([best_i[qs], np.broadcast_to(rows, d.shape)], axis=1)
+            top = np.argpartition(cand_d, k - 1, axis=1)[:, :k] if cand_d.shape[1] > k else np.argsort(cand_d, axis=1)
+            best_d[qs] = np.take_along_axis(cand_d, top, axis=1)
+            best_i[qs] = np.take_along_axis(cand_i, top, axis=1)
+
+        order = np.argsort(best_d, axis=1)
+        return np.take_along_axis(best_d, order, axis=1), np.take_along_axis(best_i, order, axis=1)
+
+    def row(self, i: int) -> dict:
+        r = self.rows[i]
+        return {
+            "case_id": uuid.UUID(bytes=bytes(r["case_id"])),
+            "alert_id": uuid.UUID(bytes=bytes(r["alert_id"])),
+            "created_at": dt.datetime.fromtimestamp(float(r["created_at"]), dt.timezone.utc),
+            "component": self.meta["components"][int(r["component"])],
+        }
+
+    def case_ids(self, since: float | None = None) -> set[uuid.UUID]:
+        # Ids of rows created at or after `since` (epoch seconds); used to de-duplicate adds
+        rows = self.rows if since is None else self.rows[self.rows["created_at"] >= since]
+        return {uuid.UUID(bytes=bytes(b)) for b in rows["case_id"]}
+
+    def stats(self) -> dict:
+        sizes = np.diff(self._offsets)
+        return {
+            "version": os.path.basename(self.directory),
+            "count": self.count,
+            "nlist": self.nlist,
+            "dim": self.dim,
+            "max_list": int(sizes.max()) if sizes.size else 0,
+            "watermark": self.meta.get("watermark"),
+        }
+
+
+def publish(root: str, version: str, keep: int = 2) -> None:
+    # Point CURRENT at `version`, then drop all but the newest `keep` versions (readers still
+    # mapping a removed version keep working; the files go once they are unmapped)
+    tmp = os.path.join(root, f"{POINTER_FILENAME}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, POINTER_FILENAME))
+
+    versions = sorted(n for n in os.listdir(root) if not n.startswith(".") and os.path.isdir(os.path.join(root, n)))
+    for name in versions[: max(0, len(versions) - keep)]:
+        if name != version:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
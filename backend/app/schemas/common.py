@@ -28,10 +28,27 @@ class TelemetryIn(BaseModel):
     telemetry: TelemetryPayload
 
 
+class TelemetryBatchIn(BaseModel):
+    records: list[TelemetryIn] = Field(min_length=1)
+
+
 class PredictionOut(BaseModel):
     risk_score: float
     risk_level: str
     predicted_component: str
+    model_version: str | None = None
+
+
+class BatchRecordOut(BaseModel):
+    index: int
+    telemetry_event_id: uuid.UUID
+    alert_id: uuid.UUID | None = None
+    prediction: PredictionOut
+
+
+class BatchPredictionOut(BaseModel):
+    count: int
+    results: list[BatchRecordOut]
 
 
 class BookingOut(BaseModel):
@@ -57,3 +74,4 @@ class OrchestrationOut(BaseModel):
     rca: RCAOut
     voice_script: str
     security_allowed: bool
+    stage_timings_ms: dict[str, float] | None = None
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import fcntl
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+from collections.abc import Callable
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.core.config import settings
+from app.db.bulk_writer import BulkWriter
+from app.db.models import SecurityAudit
+from app.db.session import AsyncSessionLocal
+
+
+logger = logging.getLogger(__name__)
+
+
+class AuditSpill:
+    # Local journal of audit rows that are buffered but not yet committed. Rows are appended
+    # to the current segment before they are queued; a segment is deleted once it has been
+    # rotated out and all of its rows are durable. Whatever is left on disk after a crash is
+    # replayed at the next startup (replay_spill), keyed on the client-side ids.
+    #
+    # Several processes on a host share the directory, so segments are named after their
+    # owner and each owner holds an flock on its own lock file for as long as it lives; the
+    # kernel drops the lock when the process dies, however it dies.
+    def __init__(self, directory: str, max_segment_bytes: int) -> None:
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.owner = f"{os.getpid()}.{uuid.uuid4().hex[:8]}"
+        self._lock = open(_lock_path(directory, self.owner), "w")
+        fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._segment: str | None = None
+        self._file = None
+        self._pending: dict[str, int] = {}
+
+    def _rotate(self) -> None:
+        old = self._segment
+        if self._file is not None:
+            self._file.close()
+        self._segment = os.path.join(self.directory, f"audit-{self.owner}-{time.time_ns()}.jsonl")
+        self._file = open(self._segment, "a", encoding="utf-8")
+        self._pending[self._segment] = 0
+        if old is not None and self._pending.get(old) == 0:
+            self._remove(old)
+
+    def _remove(self, segment: str) -> None:
+        self._pending.pop(segment, None)
+        try:
+            os.remove(segment)
+        except FileNotFoundError:
+            pass
+
+    def append(self, row: dict) -> str:
+        if self._file is None or self._file.tell() >= self.max_segment_bytes:
+            self._rotate()
+        # flush() hands the line to the OS: survives a process crash, not a host crash
+        self._file.write(json.dumps(row, default=str) + "\n")
+        self._file.flush()
+        self._pending[self._segment] += 1
+        return self._segment
+
+    def settle(self, segment: str) -> None:
+        if segment not in self._pending:
+            return
+        self._pending[segment] -= 1
+        if self._pending[segment] == 0 and segment != self._segment:
+            self._remove(segment)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for segment, count in list(self._pending.items()):
+            if count == 0:
+                self._remove(segment)
+        # Unsettled segments stay behind for replay; the lock file goes with the last of them
+        if not self._pending:
+            _unlink(_lock_path(self.directory, self.owner))
+        self._lock.close()
+
+
+def _lock_path(directory: str, owner: str) -> str:
+    return os.path.join(directory, f"audit-{owner}.lock")
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _segment_owner(path: str) -> str | None:
+    # audit-<owner>-<ns>.jsonl; None for segments written before owners were recorded
+    parts = os.path.basename(path)[: -len(".jsonl")].split("-")
+    return parts[1] if len(parts) == 3 else None
+
+
+def _claim_owner(directory: str, owner: str):
+    # The owner's lock if its process is gone (held while its segments are replayed), else None
+    try:
+        lock = open(_lock_path(directory, owner), "a")
+    except OSError:
+        return None
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+
+def _audit_row(audit: SecurityAudit | dict) -> dict:
+    # evaluate_security hands over plain row dicts; ORM instances are still accepted
+    if isinstance(audit, dict):
+        row = {c.key: audit.get(c.key) for c in SecurityAudit.__table__.columns}
+    else:
+        row = {c.key: getattr(audit, c.key) for c in SecurityAudit.__table__.columns}
+    row["id"] = row["id"] or uuid.uuid4()
+    row["created_at"] = row["created_at"] or dt.datetime.now(dt.timezone.utc)
+    row["audit_metadata"] = row["audit_metadata"] or {}
+    row["allowed"] = True if row["allowed"] is None else row["allowed"]
+    return row
+
+
+def _decode_row(data: dict) -> dict:
+    return {
+        **data,
+        "id": uuid.UUID(data["id"]),
+        "customer_id": uuid.UUID(data["customer_id"]) if data.get("customer_id") else None,
+        "created_at": dt.datetime.fromisoformat(data["created_at"]),
+    }
+
+
+async def replay_spill(engine: AsyncEngine, directory: str) -> int:
+    # Re-insert rows journalled by processes that have exited; rows that did commit are
+    # skipped by id. Segments of live processes (their owner lock is held) are left alone.
+    replayed = 0
+    by_owner: dict[str | None, list[str]] = {}
+    for path in sorted(glob.glob(os.path.join(directory, "audit-*.jsonl"))):
+        by_owner.setdefault(_segment_owner(path), []).append(path)
+    # Lock files of owners that exited with nothing left to replay
+    for path in glob.glob(os.path.join(directory, "audit-*.lock")):
+        owner = os.path.basename(path)[len("audit-") : -len(".lock")]
+        if owner not in by_owner and (lock := _claim_owner(directory, owner)) is not None:
+            _unlink(path)
+            lock.close()
+    for owner, paths in by_owner.items():
+        lock = None
+        if owner is not None:
+            lock = _claim_owner(directory, owner)
+            if lock is None:
+                continue
+        try:
+            replayed += await _replay_segments(engine, paths)
+            if lock is not None:
+                _unlink(_lock_path(directory, owner))
+        finally:
+            if lock is not None:
+                lock.close()
+    return replayed
+
+
+async def _replay_segments(engine: AsyncEngine, paths: list[str]) -> int:
+    replayed = 0
+    for path in paths:
+        rows = []
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rows.append(_decode_row(json.loads(line)))
+                except (ValueError, KeyError):
+                    # Torn last line from a crash mid-write
+                    continue
+        if rows:
+            stmt = insert(SecurityAudit).on_conflict_do_nothing(index_elements=[SecurityAudit.id])
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(stmt, rows)
+            except Exception:
+                # One bad row must not block the rest of the journal
+                for row in rows:
+                    try:
+                        async with engine.begin() as conn:
+                            await conn.execute(stmt, [row])
+                    except Exception:
+                        logger.warning("dropping unreplayable audit row %s", row["id"], exc_info=True)
+        replayed += len(rows)
+        os.remove(path)
+    return replayed
+
+
+_writer: BulkWriter | None = None
+_spill: AuditSpill | None = None
+
+
+def get_audit_writer() -> BulkWriter | None:
+    return _writer if _writer is not None and _writer.running else None
+
+
+async def start_audit_writer(engine: AsyncEngine) -> BulkWriter | None:
+    # A writer of its own, separate from the telemetry write-behind buffer, so audit batching
+    # and failures never interfere with ingest
+    global _writer, _spill
+    if not settings.audit_async or _writer is not None:
+        return _writer
+    if settings.audit_spill_dir:
+        replayed = await replay_spill(engine, settings.audit_spill_dir)
+        if replayed:
+            logger.info("replayed %d journalled audit rows", replayed)
+        _spill = AuditSpill(settings.audit_spill_dir, settings.audit_spill_segment_bytes)
+    _writer = BulkWriter(
+        engine,
+        flush_rows=settings.audit_flush_rows,
+        flush_ms=settings.audit_flush_ms,
+        max_buffered=settings.audit_max_buffered,
+        use_copy=settings.bulk_copy_enabled,
+    )
+    _writer.start()
+    return _writer
+
+
+async def stop_audit_writer() -> None:
+    global _writer, _spill
+    if _writer is not None:
+        await _writer.stop()
+        _writer = None
+    if _spill is not None:
+        _spill.close()
+        _spill = None
+
+
+async def record_audit(
+    audit: SecurityAudit | dict,
+    session: AsyncSession | None = None,
+    sessions: Callable[[], AsyncSession] = AsyncSessionLocal,
+    sync: bool = False,
+    commit: bool = True,
+) -> None:
+    # Queue the audit row for the background writer; the caller's decision doesn't wait for it.
+    # sync=True returns only once the row is committed (settings.audit_sync_denies uses this
+    # for denials). Without a running writer (Celery, scripts) the row is written on `session`
+    # (committed unless commit=False) or on a short-lived session from `sessions`.
+    writer = get_audit_writer()
+    if writer is None:
+        if isinstance(audit, dict):
+            audit = SecurityAudit(**_audit_row(audit))
+        if session is not None:
+            session.add(audit)
+            if commit:
+                await session.commit()
+            return
+        async with sessions() as own:
+            own.add(audit)
+            await own.commit()
+        return
+
+    row = _audit_row(audit)
+    spill, segment = _spill, None
+    if spill is not None:
+        segment = spill.append(row)
+    future = await writer.submit({SecurityAudit: [row]})
+
+    def settle(done: asyncio.Future) -> None:
+        if done.cancelled() or done.exception() is not None:
+            # Kept in the journal for the next startup's replay
+            logger.warning("audit row %s not persisted: %s", row["id"], None if done.cancelled() else done.exception())
+            return
+        if segment is not None:
+            spill.settle(segment)
+
+    future.add_done_callback(settle)
+    if sync:
+        await writer.flush()
+        await future
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import datetime as dt
+import heapq
+import itertools
+import time
+import uuid
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from pydantic import BaseModel, Field, model_validator
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import ServiceSlot
+
+
+@dataclass
+class SlotEntry:
+    id: uuid.UUID
+    center_id: str
+    starts_at: dt.datetime
+    ends_at: dt.datetime
+    capacity: int
+    reserved: int
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self.reserved
+
+
+def parse_time_window(value: str | None) -> tuple[int, int] | None:
+    # CustomerPreference.time_window, e.g. "9-18": slots *starting* in [9:00, 18:00) UTC.
+    # "20-6" wraps past midnight; anything unparsable means no restriction.
+    if not value:
+        return None
+    try:
+        start, end = (int(part) for part in value.split("-", 1))
+    except ValueError:
+        return None
+    if not (0 <= start <= 24 and 0 <= end <= 24) or start == end:
+        return None
+    return start, end
+
+
+def _window_ranges(day: dt.date, window: tuple[int, int] | None) -> list[tuple[dt.datetime, dt.datetime]]:
+    # The window as [from, to) start-time ranges within one UTC day, in order
+    midnight = dt.datetime.combine(day, dt.time(), tzinfo=dt.timezone.utc)
+    if window is None:
+        return [(midnight, midnight + dt.timedelta(days=1))]
+    start, end = (midnight + dt.timedelta(hours=h) for h in window)
+    if start < end:
+        return [(start, end)]
+    return [(midnight, end), (start, midnight + dt.timedelta(days=1))]
+
+
+def _starts_at(entry: SlotEntry) -> dt.datetime:
+    return entry.starts_at
+
+
+_Buckets = tuple[list[dt.date], dict[dt.date, list[SlotEntry]]]
+
+
+def _day_buckets(entries: list[SlotEntry]) -> _Buckets:
+    buckets: dict[dt.date, list[SlotEntry]] = {}
+    for entry in entries:
+        buckets.setdefault(entry.starts_at.astimezone(dt.timezone.utc).date(), []).append(entry)
+    for bucket in buckets.values():
+        bucket.sort(key=_starts_at)
+    return sorted(buckets), buckets
+
+
+class AvailabilityIndex:
+    # Open service slots held in memory per (center, UTC day) and per UTC day across all
+    # centers, each bucket sorted by start time. Reads are lock-free; refresh() builds new
+    # structures and swaps them in.
+    # The index only ranks candidates: reservations still go through the conditional UPDATE
+    # in app.services.booking, so a stale entry costs a retry, never an oversold slot.
+    def __init__(self, refresh_interval_s: float, horizon_days: int) -> None:
+        self.refresh_interval_s = refresh_interval_s
+        self.horizon_days = horizon_days
+        self._centers: dict[str, _Buckets] = {}
+        self._all: _Buckets = ([], {})
+        self._by_id: dict[uuid.UUID, SlotEntry] = {}
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval_s
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    async def ensure_fresh(self, session: AsyncSession) -> None:
+        if not self.stale:
+            return
+        async with self._lock:
+            if self.stale:
+                await self.refresh(session)
+
+    async def refresh(self, session: AsyncSession) -> None:
+        now = dt.datetime.now(dt.timezone.utc)
+        res = await session.execute(
+            select(
+                ServiceSlot.id,
+                ServiceSlot.center_id,
+                ServiceSlot.starts_at,
+                ServiceSlot.ends_at,
+                ServiceSlot.capacity,
+                ServiceSlot.reserved,
+            )
+            .where(
+                ServiceSlot.is_active.is_(True),
+                ServiceSlot.starts_at >= now,
+                ServiceSlot.starts_at < now + dt.timedelta(days=self.horizon_days),
+            )
+            .order_by(ServiceSlot.center_id, ServiceSlot.starts_at)
+        )
+        self.load([SlotEntry(*row) for row in res.all()])
+
+    def load(self, entries: list[SlotEntry]) -> None:
+        per_center: dict[str, list[SlotEntry]] = {}
+        for entry in entries:
+            per_center.setdefault(entry.center_id, []).append(entry)
+        centers = {center: _day_buckets(slots) for center, slots in per_center.items()}
+        everything = _day_buckets(entries)
+        self._centers, self._all = centers, everything
+        self._by_id = {entry.id: entry for entry in entries}
+        self._loaded_at = time.monotonic()
+
+    def centers(self) -> list[str]:
+        return sorted(self._centers)
+
+    def record_reservation(self, slot_id: uuid.UUID) -> None:
+        entry = self._by_id.get(slot_id)
+        if entry is not None:
+            entry.reserved += 1
+
+    @staticmethod
+    def _open_slots(
+        index: _Buckets,
+        now: dt.datetime,
+        window: tuple[int, int] | None,
+        penalty_s: float,
+        exclude_center: str | None = None,
+    ) -> Iterator[tuple[float, SlotEntry]]:
+        # (score, slot) in score order: start time plus a fixed per-stream penalty. Only the
+        # in-window part of each day bucket is visited, located by bisection.
+        day_keys, buckets = index
+        for day in day_keys[bisect.bisect_left(day_keys, now.astimezone(dt.timezone.utc).date()) :]:
+            bucket = buckets[day]
+            for lo, hi in _window_ranges(day, window):
+                if hi <= now:
+                    continue
+                start = bisect.bisect_left(bucket, max(lo, now), key=_starts_at)
+                stop = bisect.bisect_left(bucket, hi, key=_starts_at)
+                for entry in itertools.islice(bucket, start, stop):
+                    if entry.free > 0 and entry.center_id != exclude_center:
+                        yield entry.starts_at.timestamp() + penalty_s, entry
+
+    def best(
+        self,
+        preferred_center_id: str | None,
+        time_window: str | None,
+        n: int,
+        now: dt.datetime | None = None,
+    ) -> list[SlotEntry]:
+        # Best N open slots: earliest start within the customer's time window, with slots outside
+        # the preferred center pushed back by booking_other_center_penalty_h. Candidate centers are
+        # the preferred one plus its configured neighbours (all indexed centers if none are configured).
+        now = now or dt.datetime.now(dt.timezone.utc)
+        window = parse_time_window(time_window)
+        penalty_s = settings.booking_other_center_penalty_h * 3600
+
+        if not preferred_center_id:
+            streams = [self._open_slots(self._all, now, window, 0.0)]
+        elif preferred_center_id in settings.center_neighbors:
+            neighbors = [c for c in dict.fromkeys(settings.center_neighbors[preferred_center_id]) if c != preferred_center_id]
+            streams = [self._open_slots(self._centers.get(preferred_center_id, ([], {})), now, window, 0.0)]
+            streams += [self._open_slots(self._centers.get(c, ([], {})), now, window, penalty_s) for c in neighbors]
+        else:
+            # Preferred center vs. every other center: two streams regardless of how many centers exist
+            streams = [
+                self._open_slots(self._centers.get(preferred_center_id, ([], {})), now, window, 0.0),
+                self._open_slots(self._all, now, window, penalty_s, exclude_center=preferred_center_id),
+            ]
+        merged = heapq.merge(*streams, key=lambda scored: scored[0])
+        return [entry for _, entry in itertools.islice(merged, n)]
+
+    def stats(self) -> dict:
+        return {
+            "centers": len(self._centers),
+            "slots": len(self._by_id),
+            "open_seats": sum(max(e.free, 0) for e in self._by_id.values()),
+            "age_s": None if self._loaded_at is None else round(time.monotonic() - self._loaded_at, 3),
+        }
+
+
+_index: AvailabilityIndex | None = None
+
+
+def get_availability_index() -> AvailabilityIndex:
+    global _index
+    if _index is None:
+        _index = AvailabilityIndex(settings.availability_refresh_s, settings.availability_horizon_days)
+    return _index
+
+
+class SlotGenerateIn(BaseModel):
+    center_ids: list[str] = Field(min_length=1)
+    start_date: dt.date | None = None
+    days: int = Field(default=14, ge=1, le=366)
+    open_hour: int = Field(default=9, ge=0, le=23)
+    close_hour: int = Field(default=18, ge=1, le=24)
+    slot_minutes: int = Field(default=60, ge=5, le=24 * 60)
+    capacity: int = Field(default=5, ge=1)
+    # Monday=0 .. Sunday=6
+    weekdays: list[int] = Field(default_factory=lambda: [0, 1, 2, 3, 4, 5, 6])
+
+    @model_validator(mode="after")
+    def _check_hours(self) -> "SlotGenerateIn":
+        if self.close_hour <= self.open_hour:
+            raise ValueError("close_hour must be after open_hour")
+        return self
+
+
+class SlotGenerateOut(BaseModel):
+    requested: int
+    created: int
+
+
+def _slot_rows(spec: SlotGenerateIn) -> list[dict]:
+    start_date = spec.start_date or dt.datetime.now(dt.timezone.utc).date()
+    step = dt.timedelta(minutes=spec.slot_minutes)
+    weekdays = set(spec.weekdays)
+    rows = []
+    for offset in range(spec.days):
+        day = start_date + dt.timedelta(days=offset)
+        if day.weekday() not in weekdays:
+            continue
+        opens = dt.datetime.combine(day, dt.time(), tzinfo=dt.timezone.utc) + dt.timedelta(hours=spec.open_hour)
+        closes = dt.datetime.combine(day, dt.time(), tzinfo=dt.timezone.utc) + dt.timedelta(hours=spec.close_hour)
+        starts = opens
+        while starts + step <= closes:
+            for center_id in spec.center_ids:
+                rows.append(
+                    {
+                        "id": uuid.uuid4(),
+                        "center_id": center_id,
+                        "starts_at": starts,
+                        "ends_at": starts + step,
+                        "capacity": spec.capacity,
+                        "reserved": 0,
+                        "is_active": True,
+                    }
+                )
+            starts += step
+    return rows
+
+
+async def generate_slots(session: AsyncSession, spec: SlotGenerateIn, chunk_size: int = 1000) -> SlotGenerateOut:
+    # Idempotent: slots that already exist (same center + times) are left untouched
+    rows = _slot_rows(spec)
+    created = 0
+    for i in range(0, len(rows), chunk_size):
+        res = await session.execute(
+            pg_insert(ServiceSlot)
+            .values(rows[i : i + chunk_size])
+            .on_conflict_do_nothing(constraint="uq_slot_center_time")
+            .returning(ServiceSlot.id)
+        )
+        created += len(res.all())
+    await session.commit()
+    get_availability_index().invalidate()
+    return SlotGenerateOut(requested=len(rows), created=created)
@@ -3,12 +3,16 @@ from __future__ import annotations
 import datetime as dt
 import uuid
 
+from fastapi import HTTPException
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import case, func, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.db.models import Booking, ServiceSlot
 from app.schemas.common import BookingOut
+from app.services.availability import get_availability_index, parse_time_window
+from app.services.customers import get_customer_profile, preference
 
 
 class BookingSelectIn(BaseModel):
@@ -17,36 +21,144 @@ class BookingSelectIn(BaseModel):
     preferred_center_id: str | None = None
 
 
-async def select_and_reserve_slot(payload: BookingSelectIn, session: AsyncSession) -> BookingOut:
-    # Simplified ranking: earliest available slot in preferred center (or any)
-    now = dt.datetime.now(dt.timezone.utc)
+class NoSlotAvailable(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(status_code=409, detail="no service slot available")
 
-    q = select(ServiceSlot).where(
+
+def _open_slot_filter(now: dt.datetime, center_id: str | None, window: tuple[int, int] | None) -> list:
+    # Open slots from now on, in one center (or any) and starting within the customer's time
+    # window (parse_time_window: start hours in [start, end) UTC, wrapping past midnight)
+    clauses = [
         ServiceSlot.is_active.is_(True),
         ServiceSlot.starts_at >= now,
         ServiceSlot.reserved < ServiceSlot.capacity,
+    ]
+    if center_id:
+        clauses.append(ServiceSlot.center_id == center_id)
+    if window is not None:
+        start, end = window
+        hour = func.extract("hour", func.timezone("UTC", ServiceSlot.starts_at))
+        clauses.append((hour >= start) & (hour < end) if start < end else or_(hour >= start, hour < end))
+    return clauses
+
+
+def _reserve_stmt(now: dt.datetime, center_id: str | None, skip_locked: bool, window: tuple[int, int] | None = None):
+    # Claim one seat on the earliest open slot in a single statement. The candidate row is
+    # locked by the subquery; with SKIP LOCKED a concurrent request skips slots another
+    # transaction is reserving and lands on the next one, so bursts fan out across
+    # candidates instead of queueing on the earliest row. The outer `reserved < capacity`
+    # is re-evaluated on the locked row version, so capacity can never be exceeded.
+    candidate = select(ServiceSlot.id).where(*_open_slot_filter(now, center_id, window))
+    candidate = candidate.order_by(ServiceSlot.starts_at.asc()).limit(1).with_for_update(skip_locked=skip_locked)
+
+    return (
+        update(ServiceSlot)
+        .where(ServiceSlot.id == candidate.scalar_subquery(), ServiceSlot.reserved < ServiceSlot.capacity)
+        .values(reserved=ServiceSlot.reserved + 1)
+        .returning(ServiceSlot.id, ServiceSlot.center_id, ServiceSlot.starts_at, ServiceSlot.ends_at)
+        .execution_options(synchronize_session=False)
     )
-    if payload.preferred_center_id:
-        q = q.where(ServiceSlot.center_id == payload.preferred_center_id)
 
-    q = q.order_by(ServiceSlot.starts_at.asc()).limit(1)
 
-    res = await session.execute(q)
-    slot = res.scalar_one_or_none()
-    if slot is None:
-        # fallback: any slot
-        res = await session.execute(
-            select(ServiceSlot)
-            .where(ServiceSlot.is_active.is_(True), ServiceSlot.starts_at >= now, ServiceSlot.reserved < ServiceSlot.capacity)
-            .order_by(ServiceSlot.starts_at.asc())
-            .limit(1)
+async def reserve_seat(
+    session: AsyncSession,
+    center_id: str | None,
+    fallback_any: bool = True,
+    now: dt.datetime | None = None,
+    time_window: str | None = None,
+):
+    # Returns (id, center_id, starts_at, ends_at) of the reserved slot, or None when nothing is
+    # open within time_window (CustomerPreference.time_window; None: any time).
+    # The row stays locked until the caller's transaction ends.
+    now = now or dt.datetime.now(dt.timezone.utc)
+    window = parse_time_window(time_window)
+    centers = [center_id, None] if center_id and fallback_any else [center_id]
+    for center in centers:
+        for _ in range(settings.booking_reserve_attempts):
+            row = (await session.execute(_reserve_stmt(now, center, skip_locked=True, window=window))).one_or_none()
+            if row is not None:
+                return row
+            # Everything open is locked by concurrent reservations (or nothing is open): wait on
+            # the earliest candidate instead of skipping. If it filled up meanwhile, try again.
+            row = (await session.execute(_reserve_stmt(now, center, skip_locked=False, window=window))).one_or_none()
+            if row is not None:
+                return row
+            exists = await session.execute(select(ServiceSlot.id).where(*_open_slot_filter(now, center, window)).limit(1))
+            if exists.first() is None:
+                break
+    return None
+
+
+async def reserve_ranked(session: AsyncSession, slot_ids: list[uuid.UUID]):
+    # Claim a seat on the best-ranked candidate that is neither full nor being reserved
+    # concurrently; same guarantees as reserve_seat, ranking supplied by the caller
+    rank = case({slot_id: i for i, slot_id in enumerate(slot_ids)}, value=ServiceSlot.id)
+    candidate = (
+        select(ServiceSlot.id)
+        .where(
+            ServiceSlot.id.in_(slot_ids),
+            ServiceSlot.is_active.is_(True),
+            ServiceSlot.reserved < ServiceSlot.capacity,
         )
-        slot = res.scalar_one()
+        .order_by(rank)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    res = await session.execute(
+        update(ServiceSlot)
+        .where(ServiceSlot.id == candidate.scalar_subquery(), ServiceSlot.reserved < ServiceSlot.capacity)
+        .values(reserved=ServiceSlot.reserved + 1)
+        .returning(ServiceSlot.id, ServiceSlot.center_id, ServiceSlot.starts_at, ServiceSlot.ends_at)
+        .execution_options(synchronize_session=False)
+    )
+    return res.one_or_none()
+
 
-    slot.reserved += 1
-    booking = Booking(customer_id=payload.customer_id, alert_id=payload.alert_id, slot_id=slot.id, status="reserved")
+async def any_open(session: AsyncSession, slot_ids: list[uuid.UUID]) -> bool:
+    # Non-locking: whether any of the slots still has a free seat (rows locked by concurrent
+    # reservations are read, not skipped)
+    res = await session.execute(
+        select(ServiceSlot.id)
+        .where(
+            ServiceSlot.id.in_(slot_ids),
+            ServiceSlot.is_active.is_(True),
+            ServiceSlot.reserved < ServiceSlot.capacity,
+        )
+        .limit(1)
+    )
+    return res.first() is not None
+
+
+async def select_and_reserve_slot(payload: BookingSelectIn, session: AsyncSession, commit: bool = True) -> BookingOut:
+    # Candidates come ranked from the in-memory availability index (customer's time window,
+    # preferred center first); if none of them can be claimed, fall back to the earliest open
+    # slot within the time window in the preferred center (or any). The index learns about the
+    # seat only once it is committed: with commit=False the caller records it after its commit
+    # (get_availability_index().record_reservation), so a rollback never leaves it undercounted.
+    index = get_availability_index()
+    await index.ensure_fresh(session)
+    profile = await get_customer_profile(payload.customer_id, session=session)
+    time_window = preference(profile, "time_window")
+    candidates = index.best(payload.preferred_center_id, time_window, settings.booking_candidates)
+
+    slot = await reserve_ranked(session, [c.id for c in candidates]) if candidates else None
+    if slot is None:
+        # Candidates that are only locked by in-flight bookings are normal under contention; a
+        # rebuild is due only when they are really full or inactive (other workers, manual edits)
+        if candidates and not await any_open(session, [c.id for c in candidates]):
+            index.invalidate()
+        slot = await reserve_seat(session, payload.preferred_center_id, time_window=time_window)
+    if slot is None:
+        raise NoSlotAvailable()
+
+    booking = Booking(
+        id=uuid.uuid4(), customer_id=payload.customer_id, alert_id=payload.alert_id, slot_id=slot.id, status="reserved"
+    )
     session.add(booking)
-    await session.commit()
+    if commit:
+        await session.commit()
+        index.record_reservation(slot.id)
 
     return BookingOut(
         booking_id=booking.id,
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import uuid
+from collections.abc import Callable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TwoTierCache
+from app.core.config import settings
+from app.db.models import Customer, CustomerPreference
+from app.db.session import AsyncSessionLocal
+
+
+_profiles: TwoTierCache | None = None
+
+
+def _profile_cache() -> TwoTierCache:
+    global _profiles
+    if _profiles is None:
+        _profiles = TwoTierCache("customer_profile", ttl_s=settings.customer_cache_ttl_s)
+    return _profiles
+
+
+async def load_customer_profile(session: AsyncSession, customer_id: uuid.UUID) -> dict | None:
+    # Contact details + preferences in one round trip; `preferences` is None when the
+    # customer has none stored
+    res = await session.execute(
+        select(
+            Customer.id,
+            Customer.name,
+            Customer.email,
+            Customer.phone,
+            CustomerPreference.language,
+            CustomerPreference.channel,
+            CustomerPreference.time_window,
+            CustomerPreference.id.label("preference_id"),
+        )
+        .outerjoin(CustomerPreference, CustomerPreference.customer_id == Customer.id)
+        .where(Customer.id == customer_id)
+    )
+    row = res.one_or_none()
+    if row is None:
+        return None
+    preferences = None
+    if row.preference_id is not None:
+        preferences = {"language": row.language, "channel": row.channel, "time_window": row.time_window}
+    return {
+        "id": str(row.id),
+        "name": row.name,
+        "email": row.email,
+        "phone": row.phone,
+        "preferences": preferences,
+    }
+
+
+async def get_customer_profile(
+    customer_id: uuid.UUID,
+    session: AsyncSession | None = None,
+    sessions: Callable[[], AsyncSession] = AsyncSessionLocal,
+) -> dict | None:
+    # Cached profile, None for unknown customers. On a miss the loader uses `session` when
+    # given, otherwise a short-lived one from `sessions` (so cache hits never touch the pool).
+    async def loader() -> dict | None:
+        if session is not None:
+            return await load_customer_profile(session, customer_id)
+        async with sessions() as own:
+            return await load_customer_profile(own, customer_id)
+
+    return await _profile_cache().get(str(customer_id), loader)
+
+
+async def invalidate_customer(customer_id: uuid.UUID) -> None:
+    await _profile_cache().invalidate(str(customer_id))
+
+
+def preference(profile: dict | None, name: str, default: str | None = None) -> str | None:
+    if profile is None or profile["preferences"] is None:
+        return default
+    return profile["preferences"].get(name) or default
@@ -1,16 +1,46 @@
 from __future__ import annotations
 
+from collections.abc import Sequence
 from dataclasses import dataclass
 
+import numpy as np
+
 from app.schemas.common import TelemetryPayload
 
 
+FEATURE_NAMES: tuple[str, ...] = (
+    "speed_kph",
+    "engine_temp_c",
+    "vibration_rms",
+    "oil_pressure_kpa",
+    "battery_v",
+    "odometer_km",
+    "ambient_temp_c",
+    "temp_delta",
+    "vibration_x_temp",
+    "low_oil_pressure",
+    "low_battery",
+)
+
+RAW_FIELDS: tuple[str, ...] = FEATURE_NAMES[:7]
+
+
 @dataclass(frozen=True)
 class FeatureSet:
     version: str
     values: dict
 
 
+@dataclass(frozen=True)
+class FeatureMatrix:
+    version: str
+    names: tuple[str, ...]
+    values: np.ndarray
+
+    def row_dicts(self) -> list[dict]:
+        return [dict(zip(self.names, row)) for row in self.values.tolist()]
+
+
 def build_features(telemetry: TelemetryPayload) -> FeatureSet:
     # Lightweight feature engineering for a low-compute prototype
     # (You can expand with rolling stats once you have time-series)
@@ -28,3 +58,24 @@ def build_features(telemetry: TelemetryPayload) -> FeatureSet:
         "low_battery": 1.0 if telemetry.battery_v < 11.8 else 0.0,
     }
     return FeatureSet(version="v1", values=values)
+
+
+def build_feature_matrix(telemetry: Sequence[TelemetryPayload]) -> FeatureMatrix:
+    # Vectorized equivalent of build_features: one row per reading, columns in FEATURE_NAMES order
+    raw = np.array([[getattr(t, name) for name in RAW_FIELDS] for t in telemetry], dtype=float).reshape(-1, len(RAW_FIELDS))
+    return FeatureMatrix(version="v1", names=FEATURE_NAMES, values=features_from_raw(raw))
+
+
+def features_from_raw(raw: np.ndarray) -> np.ndarray:
+    # (n, len(RAW_FIELDS)) readings in RAW_FIELDS order -> (n, len(FEATURE_NAMES)) v1 features
+    engine_temp, vibration, oil_pressure, battery, ambient = raw[:, 1], raw[:, 2], raw[:, 3], raw[:, 4], raw[:, 6]
+
+    derived = np.column_stack(
+        [
+            engine_temp - ambient,
+            vibration * engine_temp,
+            (oil_pressure < 180).astype(float),
+            (battery < 11.8).astype(float),
+        ]
+    )
+    return np.hstack([raw, derived])
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from app.services.feature_engineering import FEATURE_NAMES
+from app.services.feature_store import ROLLING_FEATURE_VERSION, WINDOW_FEATURE_NAMES
+
+
+# Packed vectors are little-endian float32, one slot per schema position
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+@dataclass(frozen=True)
+class FeatureSchema:
+    version: str
+    names: tuple[str, ...]
+    index: dict[str, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "index", {name: i for i, name in enumerate(self.names)})
+
+    @property
+    def width(self) -> int:
+        return len(self.names)
+
+    def pack(self, values: dict) -> bytes:
+        return np.array([values.get(name, 0.0) for name in self.names], dtype=VECTOR_DTYPE).tobytes()
+
+    def pack_rows(self, matrix: np.ndarray, names: tuple[str, ...] | list[str]) -> list[bytes]:
+        # `names` labels the columns of `matrix`; they are laid out in schema order
+        if tuple(names) != self.names:
+            source = {name: i for i, name in enumerate(names)}
+            matrix = np.column_stack(
+                [matrix[:, source[n]] if n in source else np.zeros(matrix.shape[0]) for n in self.names]
+            )
+        packed = np.ascontiguousarray(matrix, dtype=VECTOR_DTYPE)
+        return [row.tobytes() for row in packed]
+
+    def unpack(self, blob: bytes) -> dict:
+        return dict(zip(self.names, np.frombuffer(blob, dtype=VECTOR_DTYPE).tolist()))
+
+    def unpack_rows(self, blobs: list[bytes]) -> np.ndarray:
+        # One allocation for the whole chunk: (len(blobs), width) float32
+        return np.frombuffer(b"".join(blobs), dtype=VECTOR_DTYPE).reshape(len(blobs), self.width)
+
+    def project(self, matrix: np.ndarray, names: tuple[str, ...] | list[str]) -> np.ndarray:
+        # Columns reordered to `names`; names the schema doesn't carry are zero-filled
+        out = np.zeros((matrix.shape[0], len(names)), dtype=matrix.dtype)
+        for j, name in enumerate(names):
+            i = self.index.get(name)
+            if i is not None:
+                out[:, j] = matrix[:, i]
+        return out
+
+
+# Append-only: a version's layout must never change once rows have been written with it
+_SCHEMAS: dict[str, FeatureSchema] = {
+    "v1": FeatureSchema("v1", FEATURE_NAMES),
+    ROLLING_FEATURE_VERSION: FeatureSchema(ROLLING_FEATURE_VERSION, FEATURE_NAMES + WINDOW_FEATURE_NAMES),
+}
+
+
+def get_schema(version: str) -> FeatureSchema:
+    try:
+        return _SCHEMAS[version]
+    except KeyError:
+        raise KeyError(f"unknown feature schema version {version!r}") from None
+
+
+def schema_versions() -> list[str]:
+    return list(_SCHEMAS)
+
+
+def decode_rows(rows: Sequence, feature_names: Sequence[str]) -> np.ndarray:
+    # FeatureRow-like rows (.version, .vector, .features) as a float32 matrix over
+    # feature_names. Packed vectors of one schema version decode with a single frombuffer;
+    # pre-packed rows fall back to their JSON dict.
+    out = np.zeros((len(rows), len(feature_names)), dtype=np.float32)
+    by_version: dict[str, list[int]] = defaultdict(list)
+    for i, r in enumerate(rows):
+        if r.vector is not None:
+            by_version[r.version].append(i)
+        else:
+            out[i] = [float((r.features or {}).get(name, 0.0)) for name in feature_names]
+
+    for version, idx in by_version.items():
+        schema = get_schema(version)
+        out[idx] = schema.project(schema.unpack_rows([rows[i].vector for i in idx]), feature_names)
+    return out
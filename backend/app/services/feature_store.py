@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import TelemetryEvent
+from app.schemas.common import TelemetryPayload
+from app.services.feature_engineering import FeatureMatrix, FeatureSet, build_feature_matrix, build_features
+
+
+SIGNALS: tuple[str, ...] = ("engine_temp_c", "vibration_rms", "oil_pressure_kpa", "battery_v")
+STATS: tuple[str, ...] = ("mean", "std", "ewma", "slope", "min", "max")
+
+# FeatureRow.version for v1 point features + the rolling-window statistics below
+ROLLING_FEATURE_VERSION = "v2"
+
+WINDOW_FEATURE_NAMES: tuple[str, ...] = tuple(f"{s}_{stat}_w" for s in SIGNALS for stat in STATS) + ("window_n",)
+
+
+class VehicleWindow:
+    # Fixed-size ring buffer of the last `size` readings for one vehicle. Sums for mean,
+    # variance and least-squares slope are updated incrementally on push/evict; min/max come
+    # from monotonic deques. Every push is O(1) (amortized for the deques).
+
+    __slots__ = ("size", "alpha", "values", "seq", "count", "sum", "sumsq", "sum_ky", "ewma", "_mins", "_maxs", "_since_resync")
+
+    def __init__(self, size: int, alpha: float):
+        self.size = size
+        self.alpha = alpha
+        self.values = np.zeros((size, len(SIGNALS)), dtype=np.float64)
+        self.seq = 0  # readings pushed so far; slot = seq % size
+        self.count = 0
+        self.sum = np.zeros(len(SIGNALS))
+        self.sumsq = np.zeros(len(SIGNALS))
+        self.sum_ky = np.zeros(len(SIGNALS))  # sum of (k - first_k) * y over the window
+        self.ewma = np.zeros(len(SIGNALS))
+        self._mins: list[deque] = [deque() for _ in SIGNALS]
+        self._maxs: list[deque] = [deque() for _ in SIGNALS]
+        self._since_resync = 0
+
+    def push(self, reading: np.ndarray) -> None:
+        slot = self.seq % self.size
+        if self.count == self.size:
+            old = self.values[slot]
+            self.sum -= old
+            self.sumsq -= old * old
+            # Dropping the oldest shifts every remaining index down by one
+            self.sum_ky -= self.sum
+        else:
+            self.count += 1
+
+        self.values[slot] = reading
+        self.sum += reading
+        self.sumsq += reading * reading
+        self.sum_ky += (self.count - 1) * reading
+        self.ewma = reading.copy() if self.seq == 0 else self.alpha * reading + (1 - self.alpha) * self.ewma
+
+        first = self.seq - self.count + 1
+        for i, v in enumerate(reading.tolist()):
+            mins, maxs = self._mins[i], self._maxs[i]
+            while mins and mins[-1][1] >= v:
+                mins.pop()
+            mins.append((self.seq, v))
+            while mins[0][0] < first:
+                mins.popleft()
+            while maxs and maxs[-1][1] <= v:
+                maxs.pop()
+            maxs.append((self.seq, v))
+            while maxs[0][0] < first:
+                maxs.popleft()
+
+        self.seq += 1
+        self._since_resync += 1
+        if self._since_resync >= 16 * self.size:
+            self._resync()
+
+    def _resync(self) -> None:
+        # Recompute the running sums from the buffer to cancel floating-point drift; amortized O(1)
+        window = self._ordered()
+        k = np.arange(self.count, dtype=np.float64)[:, None]
+        self.sum = window.sum(axis=0)
+        self.sumsq = (window * window).sum(axis=0)
+        self.sum_ky = (k * window).sum(axis=0)
+        self._since_resync = 0
+
+    def _ordered(self) -> np.ndarray:
+        if self.count < self.size:
+            return self.values[: self.count]
+        start = self.seq % self.size
+        return np.concatenate([self.values[start:], self.values[:start]])
+
+    def features(self) -> dict:
+        n = self.count
+        mean = self.sum / n
+        var = np.maximum(self.sumsq / n - mean * mean, 0.0)
+        if n > 1:
+            # Least-squares slope against reading index 0..n-1, per reading
+            sum_k = n * (n - 1) / 2
+            sum_kk = (n - 1) * n * (2 * n - 1) / 6
+            slope = (n * self.sum_ky - sum_k * self.sum) / (n * sum_kk - sum_k * sum_k)
+        else:
+            slope = np.zeros(len(SIGNALS))
+
+        out: dict = {}
+        for i, signal in enumerate(SIGNALS):
+            out[f"{signal}_mean_w"] = float(mean[i])
+            out[f"{signal}_std_w"] = float(np.sqrt(var[i]))
+            out[f"{signal}_ewma_w"] = float(self.ewma[i])
+            out[f"{signal}_slope_w"] = float(slope[i])
+            out[f"{signal}_min_w"] = float(self._mins[i][0][1])
+            out[f"{signal}_max_w"] = float(self._maxs[i][0][1])
+        out["window_n"] = float(n)
+        return out
+
+
+def _reading(telemetry: TelemetryPayload) -> np.ndarray:
+    return np.array([float(getattr(telemetry, s)) for s in SIGNALS])
+
+
+class FeatureStore:
+    # Per-process, LRU-bounded map of vehicle_id -> VehicleWindow. A vehicle missing from
+    # memory (new process, or evicted while idle) is rebuilt from its latest telemetry_events.
+
+    def __init__(self, window: int = 32, max_vehicles: int = 50_000, alpha: float = 0.2):
+        self.window = window
+        self.max_vehicles = max_vehicles
+        self.alpha = alpha
+        self._windows: OrderedDict[str, VehicleWindow] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, vehicle_id: str) -> bool:
+        return vehicle_id in self._windows
+
+    def push(self, vehicle_id: str, telemetry: TelemetryPayload) -> dict:
+        w = self._windows.get(vehicle_id)
+        if w is None:
+            w = self._insert(vehicle_id)
+        else:
+            self._windows.move_to_end(vehicle_id)
+        w.push(_reading(telemetry))
+        return w.features()
+
+    def _insert(self, vehicle_id: str) -> VehicleWindow:
+        w = VehicleWindow(self.window, self.alpha)
+        self._windows[vehicle_id] = w
+        while len(self._windows) > self.max_vehicles:
+            self._windows.popitem(last=False)
+            self.evictions += 1
+        return w
+
+    async def ensure_loaded(self, session: AsyncSession, vehicle_ids: Iterable[str]) -> None:
+        wanted = set(vehicle_ids)
+        missing = [v for v in wanted if v not in self._windows]
+        self.hits += len(wanted) - len(missing)
+        if not missing:
+            return
+        self.misses += len(missing)
+
+        # Last `window` readings per missing vehicle in one round trip
+        ranked = select(
+            TelemetryEvent.vehicle_id,
+            TelemetryEvent.payload,
+            TelemetryEvent.timestamp,
+            func.row_number()
+            .over(partition_by=TelemetryEvent.vehicle_id, order_by=TelemetryEvent.timestamp.desc())
+            .label("rn"),
+        ).where(TelemetryEvent.vehicle_id.in_(missing)).subquery()
+
+        res = await session.execute(
+            select(ranked.c.vehicle_id, ranked.c.payload)
+            .where(ranked.c.rn <= self.window)
+            .order_by(ranked.c.vehicle_id, ranked.c.timestamp.asc())
+        )
+
+        # Skip vehicles another request rebuilt while this query was in flight
+        rebuild = {v for v in missing if v not in self._windows}
+        for vehicle_id, payload in res.all():
+            if vehicle_id in rebuild:
+                w = self._windows.get(vehicle_id) or self._insert(vehicle_id)
+                w.push(_reading(TelemetryPayload.model_validate(payload)))
+
+    def stats(self) -> dict:
+        return {
+            "vehicles": len(self._windows),
+            "max_vehicles": self.max_vehicles,
+            "window": self.window,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+_store: FeatureStore | None = None
+
+
+def get_feature_store() -> FeatureStore:
+    global _store
+    if _store is None:
+        _store = FeatureStore(
+            window=settings.feature_window_size,
+            max_vehicles=settings.feature_store_max_vehicles,
+            alpha=settings.feature_ewma_alpha,
+        )
+    return _store
+
+
+async def build_rolling_features(telemetry: TelemetryPayload, session: AsyncSession) -> FeatureSet:
+    # v1 point features plus the vehicle's rolling-window statistics (including this reading)
+    base = build_features(telemetry)
+    if not settings.rolling_features_enabled:
+        return base
+
+    store = get_feature_store()
+    await store.ensure_loaded(session, [telemetry.vehicle_id])
+    window = store.push(telemetry.vehicle_id, telemetry)
+    return FeatureSet(version=ROLLING_FEATURE_VERSION, values={**base.values, **window})
+
+
+async def build_rolling_feature_matrix(telemetry: Sequence[TelemetryPayload], session: AsyncSession) -> FeatureMatrix:
+    # Readings are applied to their vehicle's window in batch order
+    base = build_feature_matrix(telemetry)
+    if not settings.rolling_features_enabled:
+        return base
+
+    store = get_feature_store()
+    await store.ensure_loaded(session, {t.vehicle_id for t in telemetry})
+    window = np.array(
+        [[stats[name] for name in WINDOW_FEATURE_NAMES] for stats in (store.push(t.vehicle_id, t) for t in telemetry)],
+        dtype=float,
+    ).reshape(-1, len(WINDOW_FEATURE_NAMES))
+    return FeatureMatrix(
+        version=ROLLING_FEATURE_VERSION,
+        names=base.names + WINDOW_FEATURE_NAMES,
+        values=np.hstack([base.values, window]),
+    )
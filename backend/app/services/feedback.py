@@ -12,18 +12,30 @@ class FeedbackIn(BaseModel):
     booking_id: uuid.UUID
     csat: int
     technician_notes: str | None = None
+    fault_confirmed: bool | None = None
+    confirmed_component: str | None = None
 
 
 class FeedbackOut(BaseModel):
     feedback_id: uuid.UUID
 
 
-async def create_feedback(payload: BaseModel, session: AsyncSession) -> FeedbackOut:
+async def create_feedback(payload: BaseModel, session: AsyncSession, commit: bool = True) -> FeedbackOut:
+    # commit=False leaves the row in the caller's transaction. A reported outcome is a new
+    # retraining label, so it triggers a (coalesced) retrain once committed.
     row = Feedback(
+        id=uuid.uuid4(),
         booking_id=getattr(payload, "booking_id"),
         csat=int(getattr(payload, "csat")),
         technician_notes=getattr(payload, "technician_notes", None),
+        fault_confirmed=getattr(payload, "fault_confirmed", None),
+        confirmed_component=getattr(payload, "confirmed_component", None),
     )
     session.add(row)
-    await session.commit()
+    if commit:
+        await session.commit()
+        if row.fault_confirmed is not None:
+            from app.tasks.retraining import schedule_retrain
+
+            schedule_retrain(reason=f"feedback:{row.id}")
     return FeedbackOut(feedback_id=row.id)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import datetime as dt
+import uuid
+from collections.abc import Sequence
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.bulk_writer import write_rows
+from app.db.models import Alert, FeatureRow, TelemetryEvent
+from app.ml.executor import get_executor
+from app.ml.inference import predict_risk_batch
+from app.schemas.common import BatchPredictionOut, BatchRecordOut, PredictionOut, TelemetryIn
+from app.services.feature_schema import get_schema
+from app.services.feature_store import build_rolling_feature_matrix
+from app.services.prediction import _predict_component, _risk_level
+
+
+async def ingest_batch(records: Sequence[TelemetryIn], session: AsyncSession, create_alerts: bool) -> BatchPredictionOut:
+    # Bulk path for buffered gateway uploads: one feature matrix, one predict_proba call,
+    # and the rows handed to the write-behind buffer, which coalesces them with other
+    # requests' rows. Returns once they are durable.
+    if len(records) > settings.batch_max_records:
+        raise HTTPException(status_code=413, detail=f"batch exceeds {settings.batch_max_records} records")
+
+    now = dt.datetime.now(dt.timezone.utc)
+    matrix = await build_rolling_feature_matrix([r.telemetry for r in records], session)
+    scores, model_version = await get_executor().run(predict_risk_batch, matrix.values, matrix.names)
+
+    event_rows: list[dict] = []
+    feature_rows: list[dict] = []
+    alert_rows: list[dict] = []
+    results: list[BatchRecordOut] = []
+
+    vectors = get_schema(matrix.version).pack_rows(matrix.values, matrix.names)
+
+    for i, (record, features, vector, score) in enumerate(
+        zip(records, matrix.row_dicts(), vectors, scores.tolist())
+    ):
+        event_id = uuid.uuid4()
+        level = _risk_level(score)
+        component = _predict_component(features)
+
+        event_rows.append(
+            {
+                "id": event_id,
+                "customer_id": record.customer_id,
+                "vehicle_id": record.telemetry.vehicle_id,
+                "timestamp": record.telemetry.timestamp or now,
+                "payload": record.telemetry.model_dump(mode="json"),
+            }
+        )
+        feature_rows.append(
+            {"id": uuid.uuid4(), "telemetry_event_id": event_id, "version": matrix.version, "vector": vector, "created_at": now}
+        )
+
+        alert_id = None
+        if create_alerts:
+            alert_id = uuid.uuid4()
+            alert_rows.append(
+                {
+                    "id": alert_id,
+                    "telemetry_event_id": event_id,
+                    "risk_score": score,
+                    "risk_level": level,
+                    "predicted_component": component,
+                    "model_version": model_version,
+                    "created_at": now,
+                }
+            )
+
+        results.append(
+            BatchRecordOut(
+                index=i,
+                telemetry_event_id=event_id,
+                alert_id=alert_id,
+                prediction=PredictionOut(
+                    risk_score=score, risk_level=level, predicted_component=component, model_version=model_version
+                ),
+            )
+        )
+
+    await write_rows(session, {TelemetryEvent: event_rows, FeatureRow: feature_rows, Alert: alert_rows})
+
+    return BatchPredictionOut(count=len(results), results=results)
@@ -1,148 +1,301 @@
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
+import logging
 import uuid
+from typing import Any
 
 from fastapi import HTTPException
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.db.bulk_writer import write_rows
 from app.db.models import Alert, FeatureRow, TelemetryEvent
-from app.schemas.common import OrchestrationOut, TelemetryIn
+from app.db.session import AsyncSessionLocal
+from app.schemas.common import OrchestrationOut, PredictionOut, TelemetryIn
+from app.services.audit import record_audit
+from app.services.availability import get_availability_index
 from app.services.booking import BookingSelectIn, select_and_reserve_slot
-from app.services.feature_engineering import build_features
+from app.services.customers import get_customer_profile, preference
+from app.services.feature_schema import get_schema
+from app.services.feature_store import build_rolling_features
 from app.services.prediction import _predict_component, _risk_level
-from app.services.rca import RCAIn, analyze_rca
-from app.services.security import SecurityResult, security_check
-from app.services.voice import generate_call_script
+from app.services.rca import RCAIn, build_rca_case, rca_out
+from app.services.security import SecurityCheckIn, evaluate_security
+from app.services.stages import Stage, StageGraph
+from app.services.voice import VoiceCallIn, generate_call_script
 from app.services.feedback import FeedbackIn, create_feedback
+from app.tasks.notifications import enqueue_notification
 
 
-async def run_full_workflow(payload: TelemetryIn, session: AsyncSession) -> OrchestrationOut:
-    # STRICT ORDER (logical):
-    # /telemetry -> /predict -> /orchestrate -> /security/check -> /booking/select -> /voice/call -> /rca/analyze -> /feedback
-
-    # 1) Persist telemetry
-    event = TelemetryEvent(
-        customer_id=payload.customer_id,
-        vehicle_id=payload.telemetry.vehicle_id,
-        timestamp=payload.telemetry.timestamp or dt.datetime.now(dt.timezone.utc),
-        payload=payload.telemetry.model_dump(mode="json"),
-    )
-    session.add(event)
-    await session.flush()
+logger = logging.getLogger(__name__)
 
-    # 2) Feature engineering + store features
-    feature_set = build_features(payload.telemetry)
-    session.add(FeatureRow(telemetry_event_id=event.id, version=feature_set.version, features=feature_set.values))
-    await session.flush()
 
-    # 3) Prediction (XGBoost inference)
-    from app.core.config import settings
-    from app.ml.inference import predict_risk
+class SecurityBlocked(Exception):
+    def __init__(self, reason: str | None, audit) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.audit = audit
 
-    risk_score = predict_risk(feature_set.values, model_path=settings.model_path, encoder_path=settings.encoder_path)
-    risk_level = _risk_level(risk_score)
-    predicted_component = _predict_component(feature_set.values)
 
-    alert = Alert(
-        telemetry_event_id=event.id,
-        risk_score=risk_score,
-        risk_level=risk_level,
-        predicted_component=predicted_component,
-    )
-    session.add(alert)
-    await session.flush()
-    await session.commit()
+# Stages receive the results dict: the initial context ("payload", "session", "sessions",
+# "event_id", "alert_id", "now") plus the return value of every stage that has finished. Only
+# stages with a path between them may share ctx["session"]: features -> persist -> booking ->
+# commit. The customer lookup opens its own session from ctx["sessions"] so it overlaps with
+# feature building. Nothing is written before the security check passes: a denied request
+# leaves only its audit row.
 
-    # 4) Security check
-    sec = await security_check(
-        payload=type(
-            "SecurityPayload",
-            (),
-            {
-                "request_id": f"req-{uuid.uuid4().hex[:12]}",
-                "customer_id": str(payload.customer_id),
-                "action": "orchestrate",
-                "telemetry": payload.telemetry.model_dump(mode="json"),
-            },
-        )(),
-        session=session,
-    )
-    if isinstance(sec, SecurityResult) and not sec.allowed:
-        raise HTTPException(status_code=403, detail=f"Security blocked request: {sec.reason}")
 
-    # 5) Booking
-    booking = await select_and_reserve_slot(
-        payload=BookingSelectIn(customer_id=payload.customer_id, alert_id=alert.id, preferred_center_id="CENTER-001"),
-        session=session,
+async def _features(ctx: dict[str, Any]):
+    return await build_rolling_features(ctx["payload"].telemetry, ctx["session"])
+
+
+async def _customer(ctx: dict[str, Any]) -> dict:
+    # Contact + preferences from the profile cache (one joined query on a miss)
+    profile = await get_customer_profile(ctx["payload"].customer_id, sessions=ctx["sessions"])
+    return {
+        "destination": (profile["phone"] or profile["email"]) if profile else None,
+        "language": preference(profile, "language", "en"),
+        "channel": preference(profile, "channel", "sms"),
+    }
+
+
+async def check_security(ctx: dict[str, Any]):
+    payload: TelemetryIn = ctx["payload"]
+    result, audit = evaluate_security(
+        SecurityCheckIn(
+            request_id=f"req-{uuid.uuid4().hex[:12]}",
+            customer_id=str(payload.customer_id),
+            action="orchestrate",
+            telemetry=payload.telemetry.model_dump(mode="json"),
+        )
     )
+    if not result.allowed:
+        raise SecurityBlocked(result.reason, audit)
+    return audit
 
-    # 6) Customer preferences (read for personalization)
-    from app.db.models import CustomerPreference
 
-    pref_res = await session.execute(select(CustomerPreference).where(CustomerPreference.customer_id == payload.customer_id))
-    prefs = pref_res.scalar_one_or_none()
-    language = getattr(prefs, "language", "en") if prefs else "en"
-    channel = getattr(prefs, "channel", "sms") if prefs else "sms"
+async def _predict(ctx: dict[str, Any]) -> PredictionOut:
+    # XGBoost inference, micro-batched across concurrent requests
+    from app.ml.scheduler import score_risk
 
-    # Also load customer contact for notification stub
-    from app.db.models import Customer
+    features = ctx["features"].values
+    risk_score, model_version = await score_risk(features)
+    return PredictionOut(
+        risk_score=risk_score,
+        risk_level=_risk_level(risk_score),
+        predicted_component=_predict_component(features),
+        model_version=model_version,
+    )
 
-    cust_res = await session.execute(select(Customer).where(Customer.id == payload.customer_id))
-    customer = cust_res.scalar_one_or_none()
-    destination = (customer.phone or customer.email) if customer else None
 
-    # 7) Voice script stub
-    voice_payload = type(
-        "VoicePayload",
-        (),
+async def _persist(ctx: dict[str, Any]) -> asyncio.Future | None:
+    # Append-only rows go to the write-behind buffer. The synchronous workflow doesn't wait for
+    # the flush here but hands its future to the commit stage; async mode sets ctx["durable"]
+    # since its response promises a persisted alert.
+    payload: TelemetryIn = ctx["payload"]
+    feature_set = ctx["features"]
+    prediction: PredictionOut = ctx["predict"]
+    return await write_rows(
+        ctx["session"],
         {
-            "customer_id": payload.customer_id,
-            "risk_level": risk_level,
-            "predicted_component": predicted_component,
-            "booking_center_id": booking.center_id,
-            "booking_starts_at": booking.starts_at.isoformat(),
-            "language": language,
-            "channel": channel,
+            TelemetryEvent: [
+                {
+                    "id": ctx["event_id"],
+                    "customer_id": payload.customer_id,
+                    "vehicle_id": payload.telemetry.vehicle_id,
+                    "timestamp": payload.telemetry.timestamp or ctx["now"],
+                    "payload": payload.telemetry.model_dump(mode="json"),
+                }
+            ],
+            FeatureRow: [
+                {
+                    "telemetry_event_id": ctx["event_id"],
+                    "version": feature_set.version,
+                    "vector": get_schema(feature_set.version).pack(feature_set.values),
+                    "created_at": ctx["now"],
+                }
+            ],
+            Alert: [
+                {
+                    "id": ctx["alert_id"],
+                    "telemetry_event_id": ctx["event_id"],
+                    "risk_score": prediction.risk_score,
+                    "risk_level": prediction.risk_level,
+                    "predicted_component": prediction.predicted_component,
+                    "model_version": prediction.model_version,
+                    "created_at": ctx["now"],
+                }
+            ],
         },
-    )()
-    voice_script = generate_call_script(voice_payload)
+        durable=ctx.get("durable", False),
+        # Without a writer the rows join the workflow's transaction (WORKFLOW's commit stage,
+        # or the job row's commit in async mode)
+        commit=False,
+    )
 
-    # Async notification + optional retraining
-    try:
-        from app.tasks.tasks import send_notification, retrain_model
-        from app.core.config import settings
 
-        if destination:
-            send_notification.delay(channel=channel, destination=destination, message=voice_script)
-        if risk_level in {"high", "critical"}:
-            retrain_model.delay(model_path=settings.model_path, encoder_path=settings.encoder_path)
-    except Exception:
-        # Celery worker may be down in dev; don't fail the request
-        pass
+async def _booking(ctx: dict[str, Any]):
+    return await select_and_reserve_slot(
+        payload=BookingSelectIn(
+            customer_id=ctx["payload"].customer_id, alert_id=ctx["alert_id"], preferred_center_id="CENTER-001"
+        ),
+        session=ctx["session"],
+        commit=False,
+    )
 
-    # 8) RCA stub
-    rca = await analyze_rca(
-        payload=RCAIn(alert_id=alert.id, predicted_component=predicted_component, features=feature_set.values),
-        session=session,
+
+async def _rca(ctx: dict[str, Any]):
+    prediction: PredictionOut = ctx["predict"]
+    # Similar-case outcomes are read on a session of its own (runs alongside booking)
+    return await build_rca_case(
+        RCAIn(
+            alert_id=ctx["alert_id"],
+            predicted_component=prediction.predicted_component,
+            features=ctx["features"].values,
+        ),
+        sessions=ctx["sessions"],
     )
 
-    # 9) Feedback (closed loop) — create a placeholder feedback row for prototype completeness
+
+async def _voice(ctx: dict[str, Any]) -> str:
+    prediction: PredictionOut = ctx["predict"]
+    booking = ctx["booking"]
+    return generate_call_script(
+        VoiceCallIn(
+            customer_id=ctx["payload"].customer_id,
+            risk_level=prediction.risk_level,
+            predicted_component=prediction.predicted_component,
+            booking_center_id=booking.center_id,
+            booking_starts_at=booking.starts_at.isoformat(),
+            language=ctx["customer"]["language"],
+            channel=ctx["customer"]["channel"],
+        )
+    )
+
+
+async def _notify(ctx: dict[str, Any]) -> None:
+    customer = ctx["customer"]
+    if not customer["destination"]:
+        return
     try:
-        await create_feedback(
-            payload=FeedbackIn(booking_id=booking.booking_id, csat=5, technician_notes="auto-generated placeholder"),
-            session=session,
+        await enqueue_notification(
+            channel=customer["channel"],
+            destination=customer["destination"],
+            message=ctx["voice"],
+            vehicle_id=ctx["payload"].telemetry.vehicle_id,
+            component=ctx["predict"].predicted_component,
         )
     except Exception:
-        pass
+        # Redis may be down in dev; don't fail the request
+        logger.warning("notification not queued", exc_info=True)
+
+
+async def _commit(ctx: dict[str, Any]) -> None:
+    # Single transaction for the slot reservation + booking, the RCA case and the placeholder
+    # feedback row (closed loop, kept for prototype completeness). The audit row goes to the
+    # audit writer, or joins this transaction where none runs (Celery).
+    session: AsyncSession = ctx["session"]
+    # None in async mode, where the intake already recorded it
+    if ctx["security"] is not None:
+        await record_audit(ctx["security"], session=session, commit=False)
+    session.add(ctx["rca"])
+    await create_feedback(
+        payload=FeedbackIn(booking_id=ctx["booking"].booking_id, csat=5, technician_notes="auto-generated placeholder"),
+        session=session,
+        commit=False,
+    )
+    # Async mode records the job's outcome in this same transaction
+    finalize = ctx.get("finalize")
+    if finalize is not None:
+        await finalize(ctx)
+    # The booking, RCA case and feedback reference the alert: nothing commits unless it was written
+    flushed = ctx.get("persist")
+    if flushed is not None:
+        await flushed
+    await session.commit()
+    get_availability_index().record_reservation(ctx["booking"].slot_id)
+
+
+# Synchronous /telemetry and /orchestrate
+WORKFLOW = StageGraph(
+    "orchestrate",
+    [
+        Stage("features", _features),
+        Stage("customer", _customer),
+        Stage("security", check_security),
+        Stage("predict", _predict, after=("features",)),
+        Stage("persist", _persist, after=("predict", "security")),
+        Stage("booking", _booking, after=("persist",)),
+        Stage("rca", _rca, after=("predict", "security")),
+        Stage("voice", _voice, after=("booking", "customer")),
+        Stage("commit", _commit, after=("booking", "rca")),
+        # Only once the booking it announces is committed
+        Stage("notify", _notify, after=("voice", "commit")),
+    ],
+)
 
+# Async mode, request side: everything up to the persisted alert, which (as in WORKFLOW) is
+# only written once the security check has passed
+INTAKE = StageGraph(
+    "orchestrate_intake",
+    [
+        Stage("features", _features),
+        Stage("security", check_security),
+        Stage("predict", _predict, after=("features",)),
+        Stage("persist", _persist, after=("predict", "security")),
+    ],
+)
+
+# Async mode, worker side: starts from the stored "features"/"predict" results and the intake's
+# security decision. The notification goes out after the commit so a redelivered job never
+# sends for a rolled-back run.
+FOLLOW_UP = StageGraph(
+    "orchestrate_follow_up",
+    [
+        Stage("customer", _customer),
+        Stage("booking", _booking),
+        Stage("rca", _rca),
+        Stage("voice", _voice, after=("booking", "customer")),
+        Stage("commit", _commit, after=("booking", "rca", "voice")),
+    ],
+)
+
+
+def orchestration_out(ctx: dict[str, Any]) -> OrchestrationOut:
     return OrchestrationOut(
-        telemetry_event_id=event.id,
-        alert_id=alert.id,
-        prediction={"risk_score": risk_score, "risk_level": risk_level, "predicted_component": predicted_component},
-        booking=booking,
-        rca=rca,
-        voice_script=voice_script,
+        telemetry_event_id=ctx["event_id"],
+        alert_id=ctx["alert_id"],
+        prediction=ctx["predict"],
+        booking=ctx["booking"],
+        rca=rca_out(ctx["rca"]),
+        voice_script=ctx["voice"],
         security_allowed=True,
     )
+
+
+async def run_full_workflow(payload: TelemetryIn, session: AsyncSession) -> OrchestrationOut:
+    # Logical order is unchanged (/telemetry -> /predict -> /security/check -> /booking/select ->
+    # /voice/call -> /rca/analyze -> /feedback); WORKFLOW runs the independent parts concurrently
+    # and writes everything transactional in one commit.
+    context = {
+        "payload": payload,
+        "session": session,
+        "sessions": AsyncSessionLocal,
+        "event_id": uuid.uuid4(),
+        "alert_id": uuid.uuid4(),
+        "now": dt.datetime.now(dt.timezone.utc),
+    }
+    try:
+        results, timings = await WORKFLOW.run(context)
+    except SecurityBlocked as blocked:
+        await audit_blocked(AsyncSessionLocal, blocked)
+        raise HTTPException(status_code=403, detail=f"Security blocked request: {blocked.reason}")
+
+    return orchestration_out(results).model_copy(update={"stage_timings_ms": timings})
+
+
+async def audit_blocked(sessions, blocked: SecurityBlocked) -> None:
+    # Denials never use the workflow session, which may have been mid-query
+    await record_audit(blocked.audit, sessions=sessions, sync=settings.audit_sync_denies)
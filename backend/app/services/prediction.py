@@ -1,14 +1,16 @@
 from __future__ import annotations
 
+import datetime as dt
 import uuid
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.config import settings
+from app.db.bulk_writer import write_rows
 from app.db.models import FeatureRow, TelemetryEvent
-from app.ml.inference import predict_risk
+from app.ml.scheduler import score_risk
 from app.schemas.common import PredictionOut, TelemetryIn
-from app.services.feature_engineering import build_features
+from app.services.feature_schema import get_schema
+from app.services.feature_store import build_rolling_features
 
 
 def _risk_level(score: float) -> str:
@@ -35,29 +37,35 @@ def _predict_component(features: dict) -> str:
 
 
 async def predict_from_telemetry(payload: TelemetryIn, session: AsyncSession) -> PredictionOut:
-    # Persist telemetry for audit/retraining
-    event = TelemetryEvent(
-        customer_id=payload.customer_id,
-        vehicle_id=payload.telemetry.vehicle_id,
-        timestamp=payload.telemetry.timestamp,
-        payload=payload.telemetry.model_dump(mode="json"),
-    )
-    session.add(event)
-    await session.flush()  # obtain event.id
-
-    feature_set = build_features(payload.telemetry)
-    session.add(
-        FeatureRow(
-            telemetry_event_id=event.id,
-            version=feature_set.version,
-            features=feature_set.values,
-        )
-    )
+    event_id = uuid.uuid4()
+    feature_set = await build_rolling_features(payload.telemetry, session)
 
-    score = predict_risk(feature_set.values, model_path=settings.model_path, encoder_path=settings.encoder_path)
+    score, model_version = await score_risk(feature_set.values)
     level = _risk_level(score)
     component = _predict_component(feature_set.values)
 
-    await session.commit()
+    # Persist telemetry for audit/retraining; nothing here reads it back, so don't wait for the flush
+    await write_rows(
+        session,
+        {
+            TelemetryEvent: [
+                {
+                    "id": event_id,
+                    "customer_id": payload.customer_id,
+                    "vehicle_id": payload.telemetry.vehicle_id,
+                    "timestamp": payload.telemetry.timestamp or dt.datetime.now(dt.timezone.utc),
+                    "payload": payload.telemetry.model_dump(mode="json"),
+                }
+            ],
+            FeatureRow: [
+                {
+                    "telemetry_event_id": event_id,
+                    "version": feature_set.version,
+                    "vector": get_schema(feature_set.version).pack(feature_set.values),
+                }
+            ],
+        },
+        durable=False,
+    )
 
-    return PredictionOut(risk_score=score, risk_level=level, predicted_component=component)
+    return PredictionOut(risk_score=score, risk_level=level, predicted_component=component, model_version=model_version)
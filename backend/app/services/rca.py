@@ -1,12 +1,20 @@
 from __future__ import annotations
 
+import logging
 import uuid
+from collections import Counter
+from collections.abc import Callable
 
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import RCACase
+from app.db.session import AsyncSessionLocal
 from app.schemas.common import RCAOut
+from app.services.similar_cases import find_similar_cases
+
+
+logger = logging.getLogger(__name__)
 
 
 class RCAIn(BaseModel):
@@ -15,17 +23,45 @@ class RCAIn(BaseModel):
     features: dict
 
 
-async def analyze_rca(payload: BaseModel, session: AsyncSession) -> RCAOut:
-    # RCA agent stub: returns a deterministic summary; optional FAISS later.
-    predicted_component = getattr(payload, "predicted_component", "general")
-
+def _summary(predicted_component: str, cases: list[dict]) -> str:
     summary = (
         f"RCA suggests {predicted_component} degradation pattern. "
         f"Recommend inspection of related subsystem and sensor calibration."
     )
+    if not cases:
+        return summary
+    component, hits = Counter(case["component"] for case in cases).most_common(1)[0]
+    rated = [case["csat"] for case in cases if case["csat"] is not None]
+    summary += f" {hits} of {len(cases)} most similar past cases were {component} issues"
+    if rated:
+        summary += f" (average CSAT {sum(rated) / len(rated):.1f})"
+    return summary + "."
 
-    row = RCACase(alert_id=getattr(payload, "alert_id"), summary=summary, similar_cases={"stub": True})
-    session.add(row)
-    await session.commit()
 
+async def build_rca_case(payload: BaseModel, sessions: Callable[[], AsyncSession] = AsyncSessionLocal) -> RCACase:
+    # Summary + the nearest historical cases from the similar-case index (app.services.similar_cases).
+    # Retrieval is best effort: without an index or on errors the case is built without them.
+    predicted_component = getattr(payload, "predicted_component", "general")
+    try:
+        similar = await find_similar_cases(getattr(payload, "features", {}) or {}, sessions=sessions)
+    except Exception:
+        logger.warning("similar-case lookup failed", exc_info=True)
+        similar = {"cases": []}
+
+    return RCACase(
+        id=uuid.uuid4(),
+        alert_id=getattr(payload, "alert_id"),
+        summary=_summary(predicted_component, similar["cases"]),
+        similar_cases=similar,
+    )
+
+
+def rca_out(row: RCACase) -> RCAOut:
     return RCAOut(rca_case_id=row.id, summary=row.summary, similar_cases=row.similar_cases or {})
+
+
+async def analyze_rca(payload: BaseModel, session: AsyncSession) -> RCAOut:
+    row = await build_rca_case(payload)
+    session.add(row)
+    await session.commit()
+    return rca_out(row)
@@ -1,21 +1,40 @@
 from __future__ import annotations
 
+import datetime as dt
 import re
 import uuid
 
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import SecurityAudit
+from app.core.config import settings
+from app.services.audit import record_audit
+from app.services.ueba import get_ueba
+
+
+_REQUEST_ID = re.compile(r"[a-zA-Z0-9\-_.]{6,64}")
+
+
+class SecurityCheckIn(BaseModel):
+    request_id: str
+    customer_id: str | None = None
+    action: str = "orchestrate"
+    telemetry: dict = {}
 
 
 class SecurityResult(BaseModel):
     allowed: bool
     reason: str | None = None
+    # UEBA deviation from the customer's / vehicle's baseline; 1.0 is the alarm level
+    anomaly_score: float | None = None
 
 
-async def security_check(payload: BaseModel, session: AsyncSession) -> SecurityResult:
-    # Stub UEBA: block obviously malformed request IDs or extreme values
+def evaluate_security(payload: BaseModel) -> tuple[SecurityResult, dict]:
+    # Decision + the audit row to persist, as a SecurityAudit column dict (what the audit writer
+    # queues; record_audit builds the ORM object only when writing on a session). Callers choose
+    # how the row is written.
+    # Static rules block malformed request IDs and extreme values; everything else is scored
+    # by the streaming UEBA engine (which only denies when settings.ueba_enforce is set)
     request_id = getattr(payload, "request_id", "")
     action = getattr(payload, "action", "orchestrate")
     telemetry = getattr(payload, "telemetry", {}) or {}
@@ -23,7 +42,7 @@ async def security_check(payload: BaseModel, session: AsyncSession) -> SecurityR
     allowed = True
     reason = None
 
-    if not re.fullmatch(r"[a-zA-Z0-9\-_.]{6,64}", request_id):
+    if not _REQUEST_ID.fullmatch(request_id):
         allowed = False
         reason = "invalid request_id"
 
@@ -31,6 +50,18 @@ async def security_check(payload: BaseModel, session: AsyncSession) -> SecurityR
         allowed = False
         reason = "telemetry out of bounds"
 
+    ueba = None
+    if allowed and settings.ueba_enabled:
+        ueba = get_ueba().observe(
+            customer_id=str(getattr(payload, "customer_id", None) or ""),
+            vehicle_id=str(telemetry.get("vehicle_id") or ""),
+            action=str(action),
+            telemetry=telemetry,
+        )
+        if settings.ueba_enforce and ueba.score >= settings.ueba_block_score:
+            allowed = False
+            reason = f"anomalous {ueba.signal} for {ueba.entity}"
+
     customer_id = None
     try:
         if getattr(payload, "customer_id", None):
@@ -38,16 +69,26 @@ async def security_check(payload: BaseModel, session: AsyncSession) -> SecurityR
     except Exception:
         customer_id = None
 
-    session.add(
-        SecurityAudit(
-            customer_id=customer_id,
-            request_id=str(request_id),
-            action=str(action),
-            allowed=allowed,
-            reason=reason,
-            audit_metadata={"telemetry_keys": list(telemetry.keys())},
-        )
-    )
-    await session.commit()
+    metadata = {"telemetry_keys": list(telemetry.keys())}
+    if ueba is not None:
+        metadata["ueba"] = {"score": round(ueba.score, 3), "signal": ueba.signal, "entity": ueba.entity}
 
-    return SecurityResult(allowed=allowed, reason=reason)
+    audit = {
+        "id": uuid.uuid4(),
+        "customer_id": customer_id,
+        "request_id": str(request_id),
+        "action": str(action),
+        "allowed": allowed,
+        "reason": reason,
+        "audit_metadata": metadata,
+        "created_at": dt.datetime.now(dt.timezone.utc),
+    }
+    anomaly_score = round(ueba.score, 3) if ueba is not None else None
+    return SecurityResult(allowed=allowed, reason=reason, anomaly_score=anomaly_score), audit
+
+
+async def security_check(payload: BaseModel, session: AsyncSession) -> SecurityResult:
+    # The decision doesn't wait for the audit insert unless it is a denial in sync-denies mode
+    result, audit = evaluate_security(payload)
+    await record_audit(audit, session=session, sync=not result.allowed and settings.audit_sync_denies)
+    return result
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+import threading
+import time
+import uuid
+from collections.abc import AsyncIterator, Callable
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.core.config import settings
+from app.db.models import Alert, Booking, Feedback, FeatureRow, RCACase
+from app.db.session import AsyncSessionLocal
+from app.ml.vector_index import META_FILENAME, VectorIndex, publish, read_pointer, train_centroids
+from app.services.feature_engineering import FEATURE_NAMES
+from app.services.feature_schema import decode_rows
+
+
+logger = logging.getLogger(__name__)
+
+# Similarity is over the point features every schema version carries; odometer_km says how
+# old the vehicle is, not what the failure looked like
+SIMILARITY_FEATURES: tuple[str, ...] = tuple(name for name in FEATURE_NAMES if name != "odometer_km")
+
+# k-means sample size per IVF list at build time
+_TRAIN_POINTS_PER_LIST = 64
+
+
+async def _iter_cases(engine: AsyncEngine, since: dt.datetime | None, chunk_size: int) -> AsyncIterator[tuple[np.ndarray, list]]:
+    # RCA cases joined to the feature vector of the telemetry event behind their alert
+    stmt = (
+        select(
+            RCACase.id,
+            RCACase.alert_id,
+            RCACase.created_at,
+            Alert.predicted_component,
+            FeatureRow.version,
+            FeatureRow.vector,
+            FeatureRow.features,
+        )
+        .join(Alert, Alert.id == RCACase.alert_id)
+        .join(FeatureRow, FeatureRow.telemetry_event_id == Alert.telemetry_event_id)
+        .order_by(RCACase.created_at)
+    )
+    if since is not None:
+        stmt = stmt.where(RCACase.created_at > since)
+    async with engine.connect() as conn:
+        result = await conn.stream(stmt.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions(chunk_size):
+            yield decode_rows(rows, SIMILARITY_FEATURES), rows
+
+
+def _columns(rows: list) -> dict:
+    return {
+        "case_ids": [r.id for r in rows],
+        "alert_ids": [r.alert_id for r in rows],
+        "created_at": [r.created_at for r in rows],
+        "components": [r.predicted_component for r in rows],
+    }
+
+
+async def _build(engine: AsyncEngine, root: str, chunk_size: int) -> dict:
+    # Full build into a new version: standardisation and centroids are fitted on all cases,
+    # rows are written grouped by list
+    X_chunks, rows = [], []
+    async for X, chunk in _iter_cases(engine, None, chunk_size):
+        X_chunks.append(X)
+        rows.extend(chunk)
+    if not rows:
+        return {"indexed": 0, "rebuilt": False}
+
+    X = np.vstack(X_chunks)
+    mean = X.mean(axis=0)
+    std = X.std(axis=0)
+    std[std < 1e-6] = 1.0
+    nlist = settings.rca_index_nlist or int(np.clip(np.sqrt(len(X)), 1, 4096))
+    rng = np.random.default_rng(0)
+    sample = X[rng.choice(len(X), min(len(X), nlist * _TRAIN_POINTS_PER_LIST), replace=False)]
+    centroids = train_centroids((sample - mean) / std, nlist)
+
+    version = f"{dt.datetime.now(dt.timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+    staging = os.path.join(root, f".staging-{version}")
+    index = VectorIndex.create(staging, SIMILARITY_FEATURES, mean, std, centroids, extra={"trained_count": len(X)})
+    index.add(X, order_by_list=True, **_columns(rows))
+    os.replace(staging, os.path.join(root, version))
+    publish(root, version)
+    return {"indexed": len(X), "rebuilt": True, "version": version, "nlist": int(centroids.shape[0])}
+
+
+async def _extend(engine: AsyncEngine, index: VectorIndex, chunk_size: int) -> dict:
+    # Cases newer than the watermark (minus an overlap for rows committed out of order),
+    # skipping ones already indexed
+    watermark = dt.datetime.fromisoformat(index.meta["watermark"])
+    since = watermark - dt.timedelta(seconds=settings.rca_index_overlap_s)
+    seen = index.case_ids(since=since.timestamp())
+    added = 0
+    async for X, chunk in _iter_cases(engine, since, chunk_size):
+        keep = [i for i, r in enumerate(chunk) if r.id not in seen]
+        if keep:
+            added += index.add(X[keep], **_columns([chunk[i] for i in keep]))
+    return {"indexed": added, "rebuilt": False, "version": os.path.basename(index.directory)}
+
+
+async def update_case_index(engine: AsyncEngine, root: str | None = None, rebuild: bool = False, chunk_size: int = 20_000) -> dict:
+    # Single writer. Appends new cases to the live version; rebuilds (new centroids and
+    # standardisation, new version) when there is none yet or the case count has grown
+    # rca_index_rebuild_factor-fold since the centroids were trained.
+    root = root or settings.rca_index_dir
+    os.makedirs(root, exist_ok=True)
+    version = read_pointer(root)
+    index = VectorIndex.open(os.path.join(root, version), writable=True) if version else None
+    if index is None or rebuild or not index.meta.get("watermark"):
+        return await _build(engine, root, chunk_size)
+
+    async with engine.connect() as conn:
+        total = (await conn.execute(select(func.count()).select_from(RCACase))).scalar_one()
+    if total > settings.rca_index_rebuild_factor * max(index.meta["trained_count"], 1):
+        return await _build(engine, root, chunk_size)
+    return await _extend(engine, index, chunk_size)
+
+
+class CaseIndexReader:
+    # Per-process read-only view of the live index. Like the model registry it only stats the
+    # pointer and meta.json once per check interval; a changed index is opened on a background
+    # thread (grouping rows by list is O(n log n)) and swapped in with one assignment.
+    def __init__(self, root: str, check_interval_s: float) -> None:
+        self.root = root
+        self.check_interval_s = check_interval_s
+        self._index: VectorIndex | None = None
+        self._stamp: tuple | None = None
+        self._next_check = 0.0
+        self._loading = False
+        self._lock = threading.Lock()
+
+    def _current_stamp(self) -> tuple | None:
+        version = read_pointer(self.root)
+        if version is None:
+            return None
+        try:
+            return version, os.stat(os.path.join(self.root, version, META_FILENAME)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _open(self, stamp: tuple) -> None:
+        try:
+            self._index = VectorIndex.open(os.path.join(self.root, stamp[0]))
+            self._stamp = stamp
+        except Exception:
+            logger.exception("RCA index: failed to open version %s", stamp[0])
+        finally:
+            with self._lock:
+                self._loading = False
+
+    def current(self) -> VectorIndex | None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._index
+        self._next_check = now + self.check_interval_s
+        stamp = self._current_stamp()
+        if stamp is None or stamp == self._stamp:
+            return self._index
+        with self._lock:
+            if self._loading:
+                return self._index
+            self._loading = True
+        if self._index is None:
+            # First load in this process: nothing to serve until it is open
+            self._open(stamp)
+        else:
+            threading.Thread(target=self._open, args=(stamp,), name="rca-index-reload", daemon=True).start()
+        return self._index
+
+    def stats(self) -> dict:
+        index = self.current()
+        return {"root": self.root, **(index.stats() if index is not None else {"count": 0})}
+
+
+_reader: CaseIndexReader | None = None
+
+
+def get_case_index() -> CaseIndexReader:
+    global _reader
+    if _reader is None:
+        _reader = CaseIndexReader(settings.rca_index_dir, settings.rca_index_refresh_s)
+    return _reader
+
+
+async def _outcomes(session: AsyncSession, alert_ids: list[uuid.UUID]) -> dict[uuid.UUID, dict]:
+    # Looked up at query time: bookings and technician feedback arrive after a case is indexed
+    res = await session.execute(
+        select(Booking.alert_id, Booking.status, Feedback.csat, Feedback.technician_notes)
+        .outerjoin(Feedback, Feedback.booking_id == Booking.id)
+        .where(Booking.alert_id.in_(alert_ids))
+        .order_by(Booking.created_at, Feedback.created_at)
+    )
+    # Latest booking / feedback per alert wins
+    return {
+        row.alert_id: {"booking_status": row.status, "csat": row.csat, "technician_notes": row.technician_notes}
+        for row in res.all()
+    }
+
+
+async def find_similar_cases(
+    features: dict,
+    k: int | None = None,
+    session: AsyncSession | None = None,
+    sessions: Callable[[], AsyncSession] = AsyncSessionLocal,
+) -> dict:
+    # Top-k past RCA cases nearest to `features`, with their outcomes. The index search runs
+    # inline (sub-millisecond); outcomes cost one query on `session` or a short-lived one.
+    index = get_case_index().current()
+    if index is None or index.count == 0:
+        return {"cases": [], "indexed": 0}
+
+    k = k or settings.rca_similar_k
+    x = np.array([[float(features.get(name, 0.0) or 0.0) for name in index.names]], dtype=np.float32)
+    distances, ids = index.search(x, k, settings.rca_index_nprobe)
+    hits = [(float(d), index.row(int(i))) for d, i in zip(distances[0], ids[0]) if i >= 0]
+
+    alert_ids = [row["alert_id"] for _, row in hits]
+    if session is not None:
+        outcomes = await _outcomes(session, alert_ids)
+    else:
+        async with sessions() as own:
+            outcomes = await _outcomes(own, alert_ids)
+
+    cases = [
+        {
+            "rca_case_id": str(row["case_id"]),
+            "alert_id": str(row["alert_id"]),
+            "component": row["component"],
+            "created_at": row["created_at"].isoformat(),
+            # Euclidean distance in standardised feature space
+            "distance": round(float(np.sqrt(d)), 4),
+            **outcomes.get(row["alert_id"], {"booking_status": None, "csat": None, "technician_notes": None}),
+        }
+        for d, row in hits
+    ]
+    return {"cases": cases, "indexed": index.count, "index_version": os.path.basename(index.directory)}
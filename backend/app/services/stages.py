@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from app.core.metrics import STAGE_SECONDS
+
+StageFn = Callable[[dict[str, Any]], Awaitable[Any]]
+StageHook = Callable[[str], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    fn: StageFn
+    after: tuple[str, ...] = ()
+
+
+class StageGraph:
+    # A declared DAG of async stages. Each stage starts as soon as everything in its `after`
+    # has finished and receives a dict of results so far (plus the initial context); stages
+    # with no path between them run concurrently. The first failure cancels the rest.
+    def __init__(self, name: str, stages: Iterable[Stage]) -> None:
+        self.name = name
+        self.stages = {s.name: s for s in stages}
+        for stage in self.stages.values():
+            missing = [d for d in stage.after if d not in self.stages]
+            if missing:
+                raise ValueError(f"stage {stage.name!r} depends on unknown stages {missing}")
+        self._check_acyclic()
+
+    def _check_acyclic(self) -> None:
+        state: dict[str, int] = {}
+
+        def visit(name: str) -> None:
+            if state.get(name) == 1:
+                raise ValueError(f"stage graph {self.name!r} has a cycle through {name!r}")
+            if state.get(name) == 2:
+                return
+            state[name] = 1
+            for dep in self.stages[name].after:
+                visit(dep)
+            state[name] = 2
+
+        for name in self.stages:
+            visit(name)
+
+    async def run(
+        self, context: dict[str, Any], on_stage: StageHook | None = None
+    ) -> tuple[dict[str, Any], dict[str, float]]:
+        # on_stage(name) is awaited after each stage completes, before its dependents start
+        results: dict[str, Any] = dict(context)
+        timings: dict[str, float] = {}
+        done: dict[str, asyncio.Event] = {name: asyncio.Event() for name in self.stages}
+
+        async def run_stage(stage: Stage) -> None:
+            for dep in stage.after:
+                await done[dep].wait()
+            start = time.perf_counter()
+            results[stage.name] = await stage.fn(results)
+            # Only completed stages are recorded; cancelled siblings of a failure would skew the stats
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            timings[stage.name] = round(elapsed_ms, 3)
+            record_stage(self.name, stage.name, elapsed_ms)
+            if on_stage is not None:
+                await on_stage(stage.name)
+            done[stage.name].set()
+
+        start = time.perf_counter()
+        try:
+            async with asyncio.TaskGroup() as tg:
+                for stage in self.stages.values():
+                    tg.create_task(run_stage(stage))
+        except BaseExceptionGroup as group:
+            # Surface the stage's own exception (e.g. HTTPException) rather than the group
+            raise group.exceptions[0] from None
+        record_stage(self.name, "total", (time.perf_counter() - start) * 1000)
+        return results, timings
+
+
+# Process-wide per-stage latency, keyed by (graph, stage)
+_stage_stats: dict[tuple[str, str], dict[str, float]] = {}
+
+
+def record_stage(graph: str, stage: str, elapsed_ms: float) -> None:
+    entry = _stage_stats.setdefault((graph, stage), {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+    entry["count"] += 1
+    entry["total_ms"] += elapsed_ms
+    entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+    STAGE_SECONDS.observe(elapsed_ms / 1000, graph, stage)
+
+
+def stage_stats() -> dict[str, dict[str, dict[str, float]]]:
+    out: dict[str, dict[str, dict[str, float]]] = {}
+    for (graph, stage), entry in _stage_stats.items():
+        out.setdefault(graph, {})[stage] = {
+            "count": entry["count"],
+            "avg_ms": round(entry["total_ms"] / entry["count"], 3),
+            "max_ms": round(entry["max_ms"], 3),
+        }
+    return out
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import uuid
+from collections.abc import AsyncIterator
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.schemas.common import TelemetryIn, TelemetryPayload
+from app.services.ingestion import ingest_batch
+
+
+_END = object()
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # Re-frames an arbitrary byte stream into complete newline-delimited records
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+def _ack(seq: int, record) -> dict:
+    prediction = record.prediction
+    return {
+        "type": "alert" if prediction.risk_level in {"high", "critical"} else "ack",
+        "seq": seq,
+        "telemetry_event_id": str(record.telemetry_event_id),
+        "alert_id": str(record.alert_id) if record.alert_id else None,
+        "risk_score": prediction.risk_score,
+        "risk_level": prediction.risk_level,
+        "predicted_component": prediction.predicted_component,
+    }
+
+
+async def ingest_stream(customer_id: uuid.UUID, frames: AsyncIterator[str | bytes]) -> AsyncIterator[dict]:
+    # Long-lived ingest: frames are parsed as they arrive, grouped into micro-batches for
+    # ingest_batch and answered with one ack (or alert) per frame, tagged with its 1-based seq.
+    #
+    # Flow control: parsed frames wait in a bounded queue and acks in another. When the
+    # pipeline or the client's ack consumption falls behind, the reader stops pulling frames
+    # and the transport's own window pushes back on the sender. Nothing buffers unboundedly.
+    pending: asyncio.Queue = asyncio.Queue(maxsize=settings.stream_max_pending)
+    acks: asyncio.Queue = asyncio.Queue(maxsize=settings.stream_max_pending)
+    flush_s = settings.stream_flush_ms / 1000
+
+    async def read() -> None:
+        seq = 0
+        async for raw in frames:
+            seq += 1
+            try:
+                telemetry = TelemetryPayload.model_validate_json(raw)
+            except ValidationError as exc:
+                await acks.put({"type": "error", "seq": seq, "detail": exc.errors(include_url=False)})
+                continue
+            await pending.put((seq, telemetry))
+        await pending.put(_END)
+
+    async def collect() -> tuple[list, bool]:
+        first = await pending.get()
+        if first is _END:
+            return [], True
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + flush_s
+        while len(batch) < settings.stream_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(pending.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _END:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def process() -> None:
+        done = False
+        while not done:
+            batch, done = await collect()
+            if not batch:
+                continue
+            records = [TelemetryIn(customer_id=customer_id, telemetry=t) for _, t in batch]
+            try:
+                async with AsyncSessionLocal() as session:
+                    result = await ingest_batch(records=records, session=session, create_alerts=True)
+            except Exception as exc:
+                for seq, _ in batch:
+                    await acks.put({"type": "error", "seq": seq, "detail": str(exc) or type(exc).__name__})
+                continue
+            for (seq, _), record in zip(batch, result.results):
+                await acks.put(_ack(seq, record))
+        await acks.put(_END)
+
+    async def run() -> None:
+        # A failure on either side cancels the other and surfaces through runner.result()
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(read())
+            tg.create_task(process())
+
+    runner = asyncio.create_task(run())
+    try:
+        while True:
+            ack_task = asyncio.ensure_future(acks.get())
+            await asyncio.wait({ack_task, runner}, return_when=asyncio.FIRST_COMPLETED)
+            if not ack_task.done():
+                # Pipeline failed (e.g. reading the client stream raised) before signalling the end
+                ack_task.cancel()
+                runner.result()
+                break
+            item = ack_task.result()
+            if item is _END:
+                break
+            yield item
+    finally:
+        runner.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await runner
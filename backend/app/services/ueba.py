@@ -0,0 +1,395 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Bump when EntityBaseline's snapshot layout changes; older snapshots are ignored
+SNAPSHOT_VERSION = 1
+
+# Actions beyond ueba_max_actions distinct ones per entity share this slot (the action name
+# comes from the caller, so it must not grow state without bound)
+_OTHER_ACTION = "__other__"
+
+
+@dataclass
+class UebaScore:
+    # Strongest deviation from the entity's own baseline, scaled so that 1.0 is that signal's
+    # alarm level (0 while the entity is still warming up), and the signal that produced it
+    score: float
+    signal: str | None = None
+    entity: str | None = None
+
+
+class EntityBaseline:
+    # Streaming statistics for one customer or vehicle, fixed-size:
+    #  - request rate: events per bucket in a ring of `buckets` (the sliding window); buckets
+    #    that leave the window feed an EWMA mean/variance of per-bucket counts (the baseline),
+    #    so a burst is never part of the baseline it is measured against
+    #  - action mix: exponentially decayed counts per action (slower decay than the others,
+    #    rare actions need a long memory)
+    #  - sensor values (vehicles only): EWMA mean/variance per field, flattened [mean, var, ...]
+    # Decayed action counts are kept unnormalised: instead of decaying every count on each
+    # event, the increment (action_gain) grows by 1/(1-alpha) and all are rescaled when large.
+
+    __slots__ = (
+        "n",
+        "bucket",
+        "ring",
+        "window",
+        "rate_mean",
+        "rate_var",
+        "rate_closed",
+        "actions",
+        "action_total",
+        "action_gain",
+        "sensors",
+    )
+
+    def __init__(self, buckets: int, sensor_fields: int = 0) -> None:
+        self.n = 0
+        self.bucket: int | None = None
+        self.ring = [0] * buckets
+        self.window = 0
+        self.rate_mean = 0.0
+        self.rate_var = 0.0
+        self.rate_closed = 0
+        self.actions: dict[str, float] = {}
+        self.action_total = 0.0
+        self.action_gain = 1.0
+        self.sensors: list[float] | None = [0.0] * (2 * sensor_fields) if sensor_fields else None
+
+    def dump(self) -> list:
+        return [
+            self.n,
+            self.bucket,
+            list(self.ring),
+            self.window,
+            self.rate_mean,
+            self.rate_var,
+            self.rate_closed,
+            dict(self.actions),
+            self.action_total,
+            self.action_gain,
+            None if self.sensors is None else list(self.sensors),
+        ]
+
+    @classmethod
+    def load(cls, data: list) -> "EntityBaseline":
+        state = cls.__new__(cls)
+        (
+            state.n,
+            state.bucket,
+            state.ring,
+            state.window,
+            state.rate_mean,
+            state.rate_var,
+            state.rate_closed,
+            state.actions,
+            state.action_total,
+            state.action_gain,
+            state.sensors,
+        ) = data
+        return state
+
+
+class UebaEngine:
+    # Per-entity behaviour baselines for security_check, keyed "customer:<id>" and
+    # "vehicle:<id>". At most max_entities baselines are kept; the least recently seen are
+    # evicted. Each request is scored against the baselines *before* it is folded in; every
+    # update is O(1). State lives in this process: snapshot()/restore() carry it across restarts.
+    def __init__(
+        self,
+        max_entities: int,
+        bucket_s: float,
+        window_buckets: int,
+        alpha: float,
+        action_alpha: float,
+        min_events: int,
+        max_actions: int,
+        sensor_fields: tuple[str, ...],
+        rate_z: float,
+        sensor_z: float,
+        action_min_p: float,
+        action_unseen_weight: float = 0.1,
+    ) -> None:
+        self.max_entities = max(1, max_entities)
+        self.bucket_s = bucket_s
+        self.window_buckets = max(1, window_buckets)
+        self.alpha = alpha
+        self.action_alpha = action_alpha
+        self.min_events = min_events
+        self.max_actions = max(1, max_actions)
+        self.sensor_fields = tuple(sensor_fields)
+        # (offset of [mean, var] in EntityBaseline.sensors, field)
+        self._sensor_slots = [(2 * i, name) for i, name in enumerate(self.sensor_fields)]
+        self.rate_z = rate_z
+        self.sensor_z = sensor_z
+        # An action with probability action_min_p scores 1.0: score = ln p / ln action_min_p
+        self._action_scale = 1.0 / -math.log(action_min_p)
+        self.action_unseen_weight = action_unseen_weight
+        self._entities: OrderedDict[str, EntityBaseline] = OrderedDict()
+        self.observed = 0
+        self.evicted = 0
+
+    def _entity(self, key: str, sensors: bool) -> EntityBaseline:
+        entities = self._entities
+        state = entities.get(key)
+        if state is None:
+            state = entities[key] = EntityBaseline(self.window_buckets, len(self.sensor_fields) if sensors else 0)
+            if len(entities) > self.max_entities:
+                entities.popitem(last=False)
+                self.evicted += 1
+        else:
+            entities.move_to_end(key)
+        return state
+
+    def _rate(self, state: EntityBaseline, bucket: int) -> float:
+        ring = state.ring
+        size = len(ring)
+        if state.bucket is None:
+            state.bucket = bucket
+        elif bucket > state.bucket:
+            gap = bucket - state.bucket
+            a = self.alpha
+            mean, var = state.rate_mean, state.rate_var
+            # Buckets leaving the window feed the baseline, oldest first. Once the ring is
+            # empty the rest are empty buckets, folded in at once in closed form (b = 1 - alpha):
+            # mean_k = b^k mean, var_k = b^k (var + mean^2 (1 - b^k))
+            b = state.bucket + 1
+            end = b + min(gap, size)
+            while b < end and state.window:
+                slot = b % size
+                count = ring[slot]
+                ring[slot] = 0
+                state.window -= count
+                delta = count - mean
+                mean += a * delta
+                var = (1 - a) * (var + a * delta * delta)
+                b += 1
+            empty = gap - (b - state.bucket - 1)
+            if empty:
+                decay = (1 - a) ** empty
+                var = decay * (var + mean * mean * (1 - decay))
+                mean *= decay
+            state.rate_mean, state.rate_var = mean, var
+            state.rate_closed += gap
+            state.bucket = bucket
+        # A late timestamp (clock skew between processes) counts towards the current bucket
+        ring[state.bucket % size] += 1
+        state.window += 1
+
+        # One-sided: only bursts above the baseline's expectation for a full window
+        if state.rate_closed < size:
+            return 0.0
+        expected = size * state.rate_mean
+        return (state.window - expected) / math.sqrt(size * state.rate_var + expected + 1.0) / self.rate_z
+
+    def _action(self, state: EntityBaseline, action: str) -> float:
+        actions = state.actions
+        if action not in actions and len(actions) >= self.max_actions:
+            action = _OTHER_ACTION
+        gain = state.action_gain
+        weight = actions.get(action, 0.0)
+        score = 0.0
+        if state.n >= self.min_events:
+            # Smoothed over the actions seen so far plus one unseen, each with a pseudo-count of
+            # action_unseen_weight events: a full event (add-one) would put a never-seen action
+            # on par with one seen once and keep it near the alarm level for hundreds of events
+            prior = self.action_unseen_weight * gain
+            p = (weight + prior) / (state.action_total + prior * (len(actions) + 1))
+            score = -math.log(p) * self._action_scale
+        actions[action] = weight + gain
+        state.action_total += gain
+        gain /= 1 - self.action_alpha
+        if gain > 1e12:
+            scale = 1.0 / gain
+            state.actions = {k: v * scale for k, v in actions.items() if v * scale > 1e-9}
+            state.action_total *= scale
+            gain = 1.0
+        state.action_gain = gain
+        return score
+
+    def _sensors(self, state: EntityBaseline, telemetry: Mapping) -> tuple[float, str | None]:
+        sensors = state.sensors
+        a = self.alpha
+        b = 1 - a
+        first = state.n == 0
+        warm = state.n >= self.min_events
+        sqrt = math.sqrt
+        get = telemetry.get
+        best, signal = 0.0, None
+        for j, name in self._sensor_slots:
+            x = get(name)
+            if x is None:
+                continue
+            if type(x) is not float:
+                try:
+                    x = float(x)
+                except (TypeError, ValueError):
+                    continue
+            if first:
+                sensors[j] = x
+                continue
+            mean = sensors[j]
+            var = sensors[j + 1]
+            delta = x - mean
+            if warm:
+                # Relative floor so near-constant signals don't turn noise into huge z
+                z = (delta if delta > 0 else -delta) / (sqrt(var) + 0.01 * (mean if mean > 0 else -mean) + 1e-6)
+                if z > best:
+                    best, signal = z, name
+            sensors[j] = mean + a * delta
+            sensors[j + 1] = b * (var + a * delta * delta)
+        return best / self.sensor_z, signal
+
+    def _observe(self, key: str, bucket: int, action: str, telemetry: Mapping | None) -> tuple[float, str | None]:
+        state = self._entity(key, telemetry is not None)
+        best, signal = self._rate(state, bucket), "rate"
+        score = self._action(state, action)
+        if score > best:
+            best, signal = score, "action"
+        if telemetry is not None and state.sensors is not None:
+            score, name = self._sensors(state, telemetry)
+            if score > best:
+                best, signal = score, name
+        state.n += 1
+        return best, signal
+
+    def observe(
+        self,
+        customer_id: str | None,
+        vehicle_id: str | None,
+        action: str,
+        telemetry: Mapping | None = None,
+        now: float | None = None,
+    ) -> UebaScore:
+        bucket = int((time.time() if now is None else now) // self.bucket_s)
+        self.observed += 1
+        result = UebaScore(0.0)
+        if customer_id:
+            key = "customer:" + customer_id
+            score, signal = self._observe(key, bucket, action, None)
+            if score > 0.0:
+                result = UebaScore(score, signal, key)
+        if vehicle_id:
+            key = "vehicle:" + vehicle_id
+            score, signal = self._observe(key, bucket, action, telemetry or {})
+            if score > result.score:
+                result = UebaScore(score, signal, key)
+        return result
+
+    def stats(self) -> dict:
+        return {"entities": len(self._entities), "observed": self.observed, "evicted": self.evicted}
+
+    def _config(self) -> dict:
+        return {
+            "version": SNAPSHOT_VERSION,
+            "bucket_s": self.bucket_s,
+            "window_buckets": self.window_buckets,
+            "sensor_fields": list(self.sensor_fields),
+        }
+
+    async def snapshot(self, path: str, chunk: int = 5000) -> int:
+        # States are copied on the event loop in chunks (so requests keep flowing), then
+        # serialised and written atomically off the loop
+        items = list(self._entities.items())
+        entities = []
+        for i in range(0, len(items), chunk):
+            entities.extend([key, state.dump()] for key, state in items[i : i + chunk])
+            await asyncio.sleep(0)
+        await asyncio.to_thread(_write_snapshot, path, {**self._config(), "entities": entities})
+        return len(entities)
+
+    def restore(self, path: str) -> int:
+        try:
+            with open(path, encoding="utf-8") as fh:
+                data = json.load(fh)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError):
+            logger.warning("ignoring unreadable UEBA snapshot %s", path, exc_info=True)
+            return 0
+        if {k: data.get(k) for k in self._config()} != self._config():
+            # Different window geometry or tracked fields: the stored baselines don't apply
+            logger.info("UEBA snapshot %s was taken with other settings; starting cold", path)
+            return 0
+        entities = data["entities"][-self.max_entities :]
+        self._entities = OrderedDict((key, EntityBaseline.load(state)) for key, state in entities)
+        return len(self._entities)
+
+
+def _write_snapshot(path: str, data: dict) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+_engine: UebaEngine | None = None
+_snapshot_task: asyncio.Task | None = None
+
+
+def get_ueba() -> UebaEngine:
+    # Built on first use in every process (API and Celery workers), from the last snapshot
+    global _engine
+    if _engine is None:
+        _engine = UebaEngine(
+            max_entities=settings.ueba_max_entities,
+            bucket_s=settings.ueba_bucket_s,
+            window_buckets=settings.ueba_window_buckets,
+            alpha=settings.ueba_alpha,
+            action_alpha=settings.ueba_action_alpha,
+            min_events=settings.ueba_min_events,
+            max_actions=settings.ueba_max_actions,
+            sensor_fields=tuple(settings.ueba_sensor_fields),
+            rate_z=settings.ueba_rate_z,
+            sensor_z=settings.ueba_sensor_z,
+            action_min_p=settings.ueba_action_min_p,
+            action_unseen_weight=settings.ueba_action_unseen_weight,
+        )
+        if settings.ueba_snapshot_path:
+            restored = _engine.restore(settings.ueba_snapshot_path)
+            if restored:
+                logger.info("restored %d UEBA baselines", restored)
+    return _engine
+
+
+async def _snapshot_loop(path: str) -> None:
+    while True:
+        await asyncio.sleep(settings.ueba_snapshot_interval_s)
+        try:
+            await get_ueba().snapshot(path)
+        except Exception:
+            logger.exception("UEBA snapshot failed")
+
+
+def start_ueba_snapshots() -> None:
+    global _snapshot_task
+    if settings.ueba_enabled and settings.ueba_snapshot_path and _snapshot_task is None:
+        get_ueba()
+        _snapshot_task = asyncio.create_task(_snapshot_loop(settings.ueba_snapshot_path))
+
+
+async def stop_ueba_snapshots() -> None:
+    global _snapshot_task
+    if _snapshot_task is None:
+        return
+    _snapshot_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await _snapshot_task
+    _snapshot_task = None
+    await get_ueba().snapshot(settings.ueba_snapshot_path)
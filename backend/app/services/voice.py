@@ -1,5 +1,19 @@
 from __future__ import annotations
 
+import uuid
+
+from pydantic import BaseModel
+
+
+class VoiceCallIn(BaseModel):
+    customer_id: uuid.UUID
+    risk_level: str
+    predicted_component: str
+    booking_center_id: str
+    booking_starts_at: str
+    language: str = "en"
+    channel: str = "sms"
+
 
 def generate_call_script(payload) -> str:
     # Voice agent stub: returns a call script; optional TTS can be added later.
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import logging
+import uuid
+from collections.abc import AsyncIterator
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.models import WorkflowJob
+from app.db.session import AsyncSessionLocal
+from app.schemas.common import OrchestrationOut, PredictionOut, TelemetryIn
+from app.services.feature_engineering import FeatureSet
+from app.services.audit import record_audit
+from app.services.orchestration import (
+    FOLLOW_UP,
+    INTAKE,
+    SecurityBlocked,
+    check_security,
+    audit_blocked,
+    orchestration_out,
+)
+
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed", "blocked")
+
+
+class WorkflowAcceptedOut(BaseModel):
+    job_id: uuid.UUID
+    status: str
+    telemetry_event_id: uuid.UUID
+    alert_id: uuid.UUID
+    prediction: PredictionOut
+    status_url: str
+
+
+class WorkflowJobOut(BaseModel):
+    job_id: uuid.UUID
+    status: str
+    stage: str | None = None
+    completed_stages: list[str] = []
+    attempts: int = 0
+    error: str | None = None
+    result: OrchestrationOut | None = None
+    updated_at: dt.datetime
+
+
+def job_out(job: WorkflowJob) -> WorkflowJobOut:
+    return WorkflowJobOut(
+        job_id=job.id,
+        status=job.status,
+        stage=job.stage,
+        completed_stages=list(job.completed_stages or []),
+        attempts=job.attempts,
+        error=job.error,
+        result=job.result,
+        updated_at=job.updated_at,
+    )
+
+
+def _enqueue(job_id: uuid.UUID) -> bool:
+    # retry=False: fail fast when the broker is down; the sweeper re-enqueues the job later
+    try:
+        from app.tasks.tasks import continue_workflow
+
+        continue_workflow.apply_async(args=[str(job_id)], retry=False)
+        return True
+    except Exception:
+        logger.warning("could not enqueue workflow job %s; left for the sweeper", job_id, exc_info=True)
+        return False
+
+
+async def start_async_workflow(payload: TelemetryIn, session: AsyncSession) -> WorkflowAcceptedOut:
+    # Request side of async mode: check, score, persist the alert (durably), record the job
+    # and hand the rest of the workflow to Celery
+    context = {
+        "payload": payload,
+        "session": session,
+        "sessions": AsyncSessionLocal,
+        "event_id": uuid.uuid4(),
+        "alert_id": uuid.uuid4(),
+        "now": dt.datetime.now(dt.timezone.utc),
+        "durable": True,
+    }
+    try:
+        results, _ = await INTAKE.run(context)
+    except SecurityBlocked as blocked:
+        await audit_blocked(AsyncSessionLocal, blocked)
+        raise HTTPException(status_code=403, detail=f"Security blocked request: {blocked.reason}")
+    prediction: PredictionOut = results["predict"]
+    feature_set: FeatureSet = results["features"]
+
+    job = WorkflowJob(
+        id=uuid.uuid4(),
+        customer_id=payload.customer_id,
+        telemetry_event_id=context["event_id"],
+        alert_id=context["alert_id"],
+        status="queued",
+        completed_stages=list(INTAKE.stages),
+        context={
+            "payload": payload.model_dump(mode="json"),
+            "features": {"version": feature_set.version, "values": feature_set.values},
+            "prediction": prediction.model_dump(mode="json"),
+            "now": context["now"].isoformat(),
+        },
+    )
+    session.add(job)
+    # The allowed decision is recorded with the job; the follow-up does not check again
+    await record_audit(results["security"], session=session, commit=False)
+    await session.commit()
+
+    await asyncio.to_thread(_enqueue, job.id)
+
+    return WorkflowAcceptedOut(
+        job_id=job.id,
+        status=job.status,
+        telemetry_event_id=job.telemetry_event_id,
+        alert_id=job.alert_id,
+        prediction=prediction,
+        status_url=f"/telemetry/jobs/{job.id}",
+    )
+
+
+async def get_job(session: AsyncSession, job_id: uuid.UUID) -> WorkflowJobOut:
+    job = await session.get(WorkflowJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job_out(job)
+
+
+async def stream_job(job_id: uuid.UUID) -> AsyncIterator[str]:
+    # Server-sent events: one `progress` event per observed change, then `done` with the final state
+    last = None
+    while True:
+        async with AsyncSessionLocal() as session:
+            job = await get_job(session, job_id)
+        snapshot = (job.status, job.stage, len(job.completed_stages), job.attempts)
+        terminal = job.status in TERMINAL_STATUSES
+        if snapshot != last or terminal:
+            event = "done" if terminal else "progress"
+            yield f"event: {event}\ndata: {job.model_dump_json()}\n\n"
+            last = snapshot
+        if terminal:
+            return
+        await asyncio.sleep(settings.workflow_poll_ms / 1000)
+
+
+async def _set_job(engine: AsyncEngine, job_id: uuid.UUID, **values) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(
+            update(WorkflowJob)
+            .where(WorkflowJob.id == job_id)
+            .values(updated_at=dt.datetime.now(dt.timezone.utc), **values)
+        )
+
+
+async def run_follow_up(engine: AsyncEngine, job_id: uuid.UUID, final_attempt: bool) -> dict:
+    # Worker side, at-least-once: the task is acked late, so a crash redelivers it. All of the
+    # job's writes (audit, booking, RCA case, feedback) commit in one transaction together with
+    # status=succeeded, under an advisory lock on the job id: a redelivered or duplicate run
+    # either finds the job finished or redoes the whole unit. Only the notification sits
+    # outside that transaction and is flagged separately once sent.
+    sessions = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+
+    async with sessions() as session:
+        await session.execute(text("SELECT pg_advisory_xact_lock(hashtextextended(:key, 0))"), {"key": str(job_id)})
+        job = await session.get(WorkflowJob, job_id, populate_existing=True)
+        if job is None:
+            return {"job_id": str(job_id), "status": "missing"}
+        if job.status in TERMINAL_STATUSES:
+            if job.status == "succeeded" and not job.notified:
+                await _notify_job(engine, job)
+            return {"job_id": str(job_id), "status": job.status}
+
+        await _set_job(engine, job_id, status="running", attempts=job.attempts + 1, error=None)
+
+        stored = job.context
+        completed = list(job.completed_stages or [])
+        progress_lock = asyncio.Lock()
+
+        async def on_stage(name: str) -> None:
+            async with progress_lock:
+                completed.append(name)
+                await _set_job(engine, job_id, stage=name, completed_stages=list(completed))
+
+        async def finalize(ctx: dict) -> None:
+            result = orchestration_out(ctx).model_dump(mode="json")
+            await session.execute(
+                update(WorkflowJob)
+                .where(WorkflowJob.id == job_id)
+                .values(
+                    status="succeeded",
+                    stage="commit",
+                    completed_stages=completed + ["commit"],
+                    result=result,
+                    updated_at=dt.datetime.now(dt.timezone.utc),
+                )
+            )
+
+        context = {
+            "payload": TelemetryIn.model_validate(stored["payload"]),
+            "session": session,
+            "sessions": sessions,
+            "event_id": job.telemetry_event_id,
+            "alert_id": job.alert_id,
+            "now": dt.datetime.fromisoformat(stored["now"]),
+            "features": FeatureSet(version=stored["features"]["version"], values=stored["features"]["values"]),
+            "predict": PredictionOut.model_validate(stored["prediction"]),
+            "security": None,
+            "finalize": finalize,
+        }
+        try:
+            if "security" not in completed:
+                # Queued before the intake ran the check
+                context["security"] = await check_security(context)
+            results, _ = await FOLLOW_UP.run(context, on_stage=on_stage)
+        except SecurityBlocked as blocked:
+            await session.rollback()
+            await audit_blocked(sessions, blocked)
+            await _set_job(engine, job_id, status="blocked", error=f"Security blocked request: {blocked.reason}")
+            return {"job_id": str(job_id), "status": "blocked"}
+        except Exception as exc:
+            await session.rollback()
+            await _set_job(
+                engine,
+                job_id,
+                status="failed" if final_attempt else "queued",
+                error=str(exc) or type(exc).__name__,
+                completed_stages=list(job.completed_stages or []),
+            )
+            raise
+
+    job = await _reload(sessions, job_id)
+    await _notify_job(engine, job, customer=results["customer"], message=results["voice"])
+    return {"job_id": str(job_id), "status": "succeeded"}
+
+
+async def _reload(sessions, job_id: uuid.UUID) -> WorkflowJob:
+    async with sessions() as session:
+        return await session.get(WorkflowJob, job_id)
+
+
+async def _notify_job(engine: AsyncEngine, job: WorkflowJob, customer: dict | None = None, message: str | None = None) -> None:
+    if customer is None:
+        # Redelivery after the commit: rebuild the notification from the stored result
+        from app.services.orchestration import _customer
+
+        customer = await _customer(
+            {
+                "payload": TelemetryIn.model_validate(job.context["payload"]),
+                "sessions": async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession),
+            }
+        )
+        message = (job.result or {}).get("voice_script")
+    if customer["destination"] and message:
+        # Deduplicated per vehicle + component, so a redelivered job doesn't notify twice
+        from app.tasks.notifications import enqueue_notification
+
+        await enqueue_notification(
+            channel=customer["channel"],
+            destination=customer["destination"],
+            message=message,
+            vehicle_id=job.context["payload"]["telemetry"]["vehicle_id"],
+            component=job.context["prediction"]["predicted_component"],
+        )
+    await _set_job(engine, job.id, notified=True)
+
+
+async def resume_stale_jobs(engine: AsyncEngine) -> list[str]:
+    # Jobs whose enqueue failed or whose worker vanished without redelivery
+    cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=settings.workflow_stale_s)
+    async with engine.connect() as conn:
+        res = await conn.execute(
+            select(WorkflowJob.id).where(
+                WorkflowJob.status.in_(("queued", "running")), WorkflowJob.updated_at < cutoff
+            )
+        )
+        stale = [row[0] for row in res.all()]
+    # Also covers finished jobs whose notification never went out
+    async with engine.connect() as conn:
+        res = await conn.execute(
+            select(WorkflowJob.id).where(
+                WorkflowJob.status == "succeeded", WorkflowJob.notified.is_(False), WorkflowJob.updated_at < cutoff
+            )
+        )
+        stale += [row[0] for row in res.all()]
+    resumed = []
+    for job_id in stale:
+        # Touch updated_at so the next sweep doesn't enqueue the same job again
+        await _set_job(engine, job_id)
+        if _enqueue(job_id):
+            resumed.append(str(job_id))
+    return resumed
@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.schedules import crontab
 
 from app.core.config import settings
 
@@ -6,6 +7,8 @@ celery_app = Celery(
     "app",
     broker=settings.rabbitmq_url,
     backend=settings.redis_url,
+    # Task modules the worker imports at startup, so beat and .delay() calls find their tasks
+    include=["app.tasks.tasks"],
 )
 
 celery_app.conf.update(
@@ -14,4 +17,22 @@ celery_app.conf.update(
     accept_content=["json"],
     timezone="UTC",
     enable_utc=True,
+    beat_schedule={
+        "maintain-partitions": {
+            "task": "tasks.maintain_partitions",
+            "schedule": crontab(minute=settings.partition_maintenance_minute),
+        },
+        "resume-workflows": {
+            "task": "tasks.resume_workflows",
+            "schedule": float(settings.workflow_stale_s),
+        },
+        "update-rca-index": {
+            "task": "tasks.update_rca_index",
+            "schedule": float(settings.rca_index_update_s),
+        },
+        "dispatch-notifications": {
+            "task": "tasks.dispatch_notifications",
+            "schedule": float(settings.notification_window_s),
+        },
+    },
 )
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "notify:queue"
+PROCESSING_KEY = "notify:processing"
+DEDUPE_PREFIX = "notify:sent"
+LOCK_KEY = "notify:lock"
+
+# Atomic "first in the dedupe window -> queue it": a repeat for the same vehicle + component
+# is dropped without ever reaching the queue. The key is renewed when the message is sent (the
+# window counts from delivery) and deleted if it is given up on, so a lost message never
+# suppresses the next alert.
+_ENQUEUE = """
+if redis.call('set', KEYS[1], '1', 'NX', 'EX', ARGV[1]) then
+    redis.call('rpush', KEYS[2], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+async def enqueue_notification(
+    channel: str,
+    destination: str,
+    message: str,
+    vehicle_id: str,
+    component: str,
+) -> bool:
+    # Called from the request path (and the async-workflow worker): one Redis round trip, no
+    # broker. Returns False when an equivalent notification already went out in the window.
+    from app.core.redis import get_async_redis
+
+    item = json.dumps(
+        {
+            "channel": channel,
+            "destination": destination,
+            "message": message,
+            "vehicle_id": vehicle_id,
+            "component": component,
+            "attempts": 0,
+        }
+    )
+    dedupe_key = _dedupe_key({"vehicle_id": vehicle_id, "component": component})
+    queued = await get_async_redis().eval(_ENQUEUE, 2, dedupe_key, QUEUE_KEY, settings.notification_dedupe_s, item)
+    return bool(queued)
+
+
+class ProviderStandIn:
+    # Stand-in for an SMS / email / push gateway's bulk API: one call per batch of
+    # (destination, text). Swap for the real client per channel.
+    def __init__(self, channel: str) -> None:
+        self.channel = channel
+        self.batches = 0
+        self.messages = 0
+
+    def send_bulk(self, messages: list[tuple[str, str]]) -> None:
+        self.batches += 1
+        self.messages += len(messages)
+        logger.info("%s provider: sent %d messages in one batch", self.channel, len(messages))
+
+
+_providers: dict[str, ProviderStandIn] = {}
+
+
+def get_provider(channel: str) -> ProviderStandIn:
+    provider = _providers.get(channel)
+    if provider is None:
+        provider = _providers[channel] = ProviderStandIn(channel)
+    return provider
+
+
+def _digest(items: list[dict]) -> str:
+    # Several alerts for one destination in a window go out as a single message
+    if len(items) == 1:
+        return items[0]["message"]
+    lines = [f"{len(items)} vehicle alerts:"]
+    lines += [f"- {item['vehicle_id']} ({item['component']}): {item['message']}" for item in items]
+    return "\n".join(lines)
+
+
+# A batch-sized LMOVE: up to ARGV[1] items from the head of the queue (KEYS[1]) onto the
+# processing list (KEYS[2]) in one step. They stay there until the dispatch acknowledges them,
+# so a dispatcher that dies mid-batch loses nothing.
+_CLAIM = """
+local items = redis.call('lrange', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items == 0 then return items end
+redis.call('ltrim', KEYS[1], #items, -1)
+for i = 1, #items, 500 do
+    redis.call('rpush', KEYS[2], unpack(items, i, math.min(i + 499, #items)))
+end
+return items
+"""
+
+# A dead dispatcher's claimed items go back to the head of the queue, order kept
+_RECOVER = """
+local items = redis.call('lrange', KEYS[2], 0, -1)
+for i = #items, 1, -1 do
+    redis.call('lpush', KEYS[1], items[i])
+end
+redis.call('del', KEYS[2])
+return #items
+"""
+
+
+def _dedupe_key(item: dict) -> str:
+    return f"{DEDUPE_PREFIX}:{item['vehicle_id']}:{item['component']}"
+
+
+def _claim(client, limit: int) -> list[dict]:
+    # Only one dispatcher runs at a time (run_dispatch), so anything still on the processing
+    # list belongs to one that died before acknowledging: it is sent again (at least once)
+    recovered = client.eval(_RECOVER, 2, QUEUE_KEY, PROCESSING_KEY)
+    if recovered:
+        logger.warning("notifications: re-queued %d messages from an interrupted dispatch", recovered)
+    return [json.loads(item) for item in client.eval(_CLAIM, 2, QUEUE_KEY, PROCESSING_KEY, limit)]
+
+
+def _acknowledge(client, pending: list[dict], delivered: list[dict], dropped: list[dict]) -> None:
+    # One transaction: pending items back to the head of the queue (original order, so they go
+    # first next window), dedupe windows renewed for what was sent or is still pending and
+    # cleared for what was given up on, and the processing list released
+    pipe = client.pipeline(transaction=True)
+    if pending:
+        pipe.lpush(QUEUE_KEY, *[json.dumps(item) for item in reversed(pending)])
+    for item in delivered + pending:
+        pipe.set(_dedupe_key(item), "1", ex=settings.notification_dedupe_s)
+    for item in dropped:
+        pipe.delete(_dedupe_key(item))
+    pipe.delete(PROCESSING_KEY)
+    pipe.execute()
+
+
+def dispatch_pending(client=None) -> dict:
+    # One dispatch window: claim a batch from the queue, group by (channel, destination), send
+    # each channel's groups to its provider in one bulk call within the channel's per-window
+    # budget. Groups over budget and failed sends are re-queued (failed ones up to
+    # notification_max_attempts), then the batch is acknowledged.
+    if client is None:
+        from app.core.redis import get_redis
+
+        client = get_redis()
+
+    items = _claim(client, settings.notification_max_batch)
+    groups: OrderedDict[tuple[str, str], list[dict]] = OrderedDict()
+    for item in items:
+        groups.setdefault((item["channel"], item["destination"]), []).append(item)
+
+    by_channel: dict[str, list[tuple[str, list[dict]]]] = {}
+    for (channel, destination), group in groups.items():
+        by_channel.setdefault(channel, []).append((destination, group))
+
+    sent, deferred, failed, delivered, dropped = 0, [], [], [], []
+    for channel, batch in by_channel.items():
+        rate = settings.notification_rate_limits.get(channel)
+        budget = len(batch) if rate is None else max(1, int(rate * settings.notification_window_s))
+        now_batch, later = batch[:budget], batch[budget:]
+        deferred += [item for _, group in later for item in group]
+        try:
+            get_provider(channel).send_bulk([(destination, _digest(group)) for destination, group in now_batch])
+            sent += len(now_batch)
+            delivered += [item for _, group in now_batch for item in group]
+        except Exception:
+            logger.exception("%s provider: bulk send of %d messages failed", channel, len(now_batch))
+            for _, group in now_batch:
+                for item in group:
+                    item["attempts"] += 1
+                    if item["attempts"] < settings.notification_max_attempts:
+                        failed.append(item)
+                    else:
+                        dropped.append(item)
+
+    if items:
+        _acknowledge(client, failed + deferred, delivered, dropped)
+    if dropped:
+        logger.warning("notifications: gave up on %d messages after %d attempts", len(dropped), settings.notification_max_attempts)
+    return {
+        "drained": len(items),
+        "sent": sent,
+        "coalesced": len(items) - len(groups),
+        "deferred": len(deferred),
+        "retrying": len(failed),
+        "dropped": len(dropped),
+    }
+
+
+def run_dispatch() -> dict:
+    # Entry point for tasks.dispatch_notifications; overlapping runs would double the
+    # per-window budget, so only one dispatches at a time
+    from app.tasks.retraining import single_flight
+
+    start = time.perf_counter()
+    with single_flight(max(1, int(settings.notification_window_s * 4)), key=LOCK_KEY) as acquired:
+        if not acquired:
+            return {"drained": 0, "reason": "dispatch already running"}
+        stats = dispatch_pending()
+    stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return stats
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "retrain:pending"
+LOCK_KEY = "retrain:lock"
+
+# Compare-and-delete so a run whose lock expired can't release the next run's lock
+_RELEASE_LOCK = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+# Fallback window when Redis is unreachable from this API process
+_local_next_allowed = 0.0
+
+# Requests started by schedule_retrain, referenced until they finish
+_background: set[asyncio.Task] = set()
+
+
+async def request_retrain(reason: str = "feedback") -> bool:
+    # Coalesces triggers: the first one in each retrain_min_interval_s window enqueues a
+    # single debounced run, every other trigger in the window is merged into it.
+    global _local_next_allowed
+    token = f"{reason}:{uuid.uuid4().hex}"
+    client = None
+    try:
+        from app.core.redis import get_async_redis
+
+        client = get_async_redis()
+        acquired = bool(await client.set(PENDING_KEY, token, nx=True, ex=settings.retrain_min_interval_s))
+    except Exception:
+        client = None
+        now = time.monotonic()
+        acquired = now >= _local_next_allowed
+        if acquired:
+            _local_next_allowed = now + settings.retrain_min_interval_s
+
+    if not acquired:
+        return False
+
+    from app.tasks.tasks import retrain_model
+
+    try:
+        # The publish blocks (and retries) while the broker is unreachable
+        await asyncio.to_thread(
+            retrain_model.apply_async,
+            kwargs={"registry_dir": settings.model_registry_dir},
+            countdown=settings.retrain_debounce_s,
+        )
+    except Exception:
+        # Nothing was enqueued: free the window so the next trigger tries again
+        if client is None:
+            _local_next_allowed = 0.0
+        else:
+            with contextlib.suppress(Exception):
+                await client.eval(_RELEASE_LOCK, 1, PENDING_KEY, token)
+        raise
+    return True
+
+
+def schedule_retrain(reason: str) -> None:
+    # For request handlers: the trigger runs as a background task, so neither Redis timeouts
+    # nor a slow broker reach the response
+    task = asyncio.get_running_loop().create_task(_request_in_background(reason))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _request_in_background(reason: str) -> None:
+    try:
+        await request_retrain(reason)
+    except Exception:
+        # Broker may be down in dev
+        logger.warning("retrain not queued (%s)", reason, exc_info=True)
+
+
+@contextmanager
+def single_flight(ttl_s: int, key: str = LOCK_KEY) -> Iterator[bool]:
+    from app.core.redis import get_redis
+
+    client = get_redis()
+    token = uuid.uuid4().hex
+    acquired = bool(client.set(key, token, nx=True, ex=ttl_s))
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            client.eval(_RELEASE_LOCK, 1, key, token)
+
+
+async def _load_training_data(feature_names: list[str], since: str):
+    from app.db.session import worker_engine
+    from app.ml.datasets import load_labeled_features
+
+    async with worker_engine() as engine:
+        return await load_labeled_features(
+            engine,
+            feature_names,
+            since=since,
+            chunk_size=settings.retrain_chunk_size,
+            max_rows=settings.retrain_incremental_max_rows,
+        )
+
+
+def run_retrain(registry_dir: str) -> dict:
+    # Warm-starts from the live model with only labels newer than its training watermark;
+    # falls back to a full retrain when there is no watermark (models trained before labels
+    # came from feedback, synthetic ones), the tree budget is spent or the delta is too big.
+    from app.ml.registry import read_current_version, read_training_meta
+    from app.ml.train import fit_and_publish_sync
+    from app.services.feature_engineering import FEATURE_NAMES
+
+    feature_names = list(FEATURE_NAMES)
+    current = read_current_version(registry_dir)
+    meta = read_training_meta(registry_dir, current) if current else {}
+
+    watermark = meta.get("label_snapshot")
+    incremental = (
+        current is not None
+        and watermark is not None
+        and int(meta.get("n_trees", 0)) + settings.retrain_incremental_trees <= settings.retrain_max_trees
+    )
+
+    started = time.perf_counter()
+    if not incremental:
+        return _run_full_retrain(registry_dir, feature_names, current, started)
+
+    data = asyncio.run(_load_training_data(feature_names, since=watermark))
+    if data is None:
+        logger.info("retrain: over %d new labeled rows, retraining in full", settings.retrain_incremental_max_rows)
+        return _run_full_retrain(registry_dir, feature_names, current, started)
+    if data.rows < settings.retrain_min_rows or np.unique(data.y).size < 2:
+        logger.info("retrain skipped: %d usable rows since snapshot %s", data.rows, watermark)
+        return {"trained": False, "reason": "not enough technician-labeled rows", "rows": data.rows}
+
+    version = fit_and_publish_sync(
+        registry_dir,
+        data,
+        feature_names,
+        n_estimators=settings.retrain_incremental_trees,
+        base_version=current,
+        meta={"mode": "incremental"},
+    )
+    elapsed = time.perf_counter() - started
+    logger.info("retrain incremental: %d rows -> %s in %.1fs", data.rows, version, elapsed)
+    return {"trained": True, "mode": "incremental", "rows": data.rows, "model_version": version, "seconds": round(elapsed, 3)}
+
+
+async def _spool_training_data(feature_names: list[str], directory: str):
+    from app.db.session import worker_engine
+    from app.ml.train_stream import spool_from_db
+
+    async with worker_engine() as engine:
+        return await spool_from_db(engine, feature_names, directory)
+
+
+def _run_full_retrain(registry_dir: str, feature_names: list[str], current: str | None, started: float) -> dict:
+    # All labeled rows, streamed through disk shards rather than loaded into one matrix. Without
+    # enough technician outcomes there is nothing to learn from: the live model stays, and only
+    # a registry with no model at all gets the synthetic bootstrap.
+    from app.ml.train import train_and_publish_sync
+    from app.ml.train_stream import publish_spool, spool_directory
+
+    with spool_directory() as directory:
+        spool = asyncio.run(_spool_training_data(feature_names, directory))
+        if spool.rows < settings.retrain_min_rows or spool.positives in (0, spool.rows):
+            if current is None:
+                version = train_and_publish_sync(registry_dir)
+                return {"trained": True, "mode": "synthetic", "model_version": version}
+            logger.info("retrain skipped: %d usable rows", spool.rows)
+            return {"trained": False, "reason": "not enough technician-labeled rows", "rows": spool.rows}
+
+        spool_s = time.perf_counter() - started
+        version, training = publish_spool(
+            registry_dir, spool, feature_names, meta={"mode": "full", "source": "database", "spool_seconds": round(spool_s, 3)}
+        )
+    elapsed = time.perf_counter() - started
+    logger.info("retrain full: %d rows -> %s in %.1fs (%d trees)", spool.rows, version, elapsed, training["n_trees"])
+    return {
+        "trained": True,
+        "mode": "full",
+        "rows": spool.rows,
+        "model_version": version,
+        "seconds": round(elapsed, 3),
+        "n_trees": training["n_trees"],
+        "peak_rss_mb": training["peak_rss_mb"],
+    }
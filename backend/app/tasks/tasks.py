@@ -1,18 +1,113 @@
 import asyncio
+import uuid
 
+from app.core.config import settings
 from app.tasks.celery_app import celery_app
 
 
-@celery_app.task(name="tasks.send_notification")
+@celery_app.task(name="tasks.send_notification", ignore_result=not settings.notification_store_results)
 def send_notification(channel: str, destination: str, message: str) -> dict:
-    # Stub: integrate SMS/email provider later
+    # One-off send, bypassing the dispatch window; workflows go through
+    # app.tasks.notifications.enqueue_notification instead
+    from app.tasks.notifications import get_provider
+
+    get_provider(channel).send_bulk([(destination, message)])
     return {"sent": True, "channel": channel, "destination": destination, "message": message}
 
 
+@celery_app.task(name="tasks.dispatch_notifications", ignore_result=True)
+def dispatch_notifications() -> dict:
+    # Scheduled by celery beat every notification_window_s: batched, rate-limited sends of
+    # the queued notifications
+    from app.tasks.notifications import run_dispatch
+
+    return run_dispatch()
+
+
+@celery_app.task(name="tasks.maintain_partitions")
+def maintain_partitions() -> dict:
+    # Scheduled by celery beat: pre-create daily partitions, roll up and drop expired ones
+    from app.db.partitions import maintain_partitions as run_maintenance
+    from app.db.session import worker_engine
+
+    async def run() -> dict:
+        async with worker_engine() as engine:
+            return await run_maintenance(engine)
+
+    return asyncio.run(run())
+
+
+@celery_app.task(
+    name="tasks.continue_workflow",
+    bind=True,
+    acks_late=True,
+    reject_on_worker_lost=True,
+    max_retries=settings.workflow_max_retries,
+)
+def continue_workflow(self, job_id: str) -> dict:
+    # Rest of an async-mode /telemetry workflow. Acked only after it returns, so a worker crash
+    # redelivers it; run_follow_up makes re-runs idempotent.
+    from app.core.redis import close_async_redis
+    from app.db.session import worker_engine
+    from app.services.workflow_jobs import run_follow_up
+
+    final_attempt = self.request.retries >= self.max_retries
+
+    async def run() -> dict:
+        try:
+            async with worker_engine() as engine:
+                return await run_follow_up(engine, uuid.UUID(job_id), final_attempt=final_attempt)
+        finally:
+            # The shared async client is bound to this task's event loop (profile cache lookups)
+            await close_async_redis()
+
+    try:
+        return asyncio.run(run())
+    except Exception as exc:
+        if final_attempt:
+            raise
+        raise self.retry(exc=exc, countdown=min(60, 2**self.request.retries))
+
+
+@celery_app.task(name="tasks.resume_workflows")
+def resume_workflows() -> dict:
+    # Scheduled by celery beat: re-enqueue async workflow jobs that stalled (enqueue failed,
+    # worker lost without redelivery, notification never sent)
+    from app.db.session import worker_engine
+    from app.services.workflow_jobs import resume_stale_jobs
+
+    async def run() -> list[str]:
+        async with worker_engine() as engine:
+            return await resume_stale_jobs(engine)
+
+    return {"resumed": asyncio.run(run())}
+
+
+@celery_app.task(name="tasks.update_rca_index")
+def update_rca_index(rebuild: bool = False) -> dict:
+    # Scheduled by celery beat: append new RCA cases to the similar-case index (or rebuild it);
+    # API processes pick the change up from disk. The lock keeps it to a single writer.
+    from app.db.session import worker_engine
+    from app.services.similar_cases import update_case_index
+    from app.tasks.retraining import single_flight
+
+    async def run() -> dict:
+        async with worker_engine() as engine:
+            return await update_case_index(engine, rebuild=rebuild)
+
+    with single_flight(settings.rca_index_lock_ttl_s, key="rca_index:lock") as acquired:
+        if not acquired:
+            return {"indexed": 0, "reason": "index update already running"}
+        return asyncio.run(run())
+
+
 @celery_app.task(name="tasks.retrain_model")
-def retrain_model(model_path: str, encoder_path: str) -> dict:
-    # Run training sync inside the worker
-    from app.ml.train import _train_and_save_sync
+def retrain_model(registry_dir: str | None = None) -> dict:
+    # Run training sync inside the worker; API workers pick the new version up from the registry.
+    # Enqueue through app.tasks.retraining.request_retrain so feedback bursts coalesce into one run.
+    from app.tasks.retraining import run_retrain, single_flight
 
-    _train_and_save_sync(model_path=model_path, encoder_path=encoder_path)
-    return {"trained": True, "model_path": model_path}
+    with single_flight(settings.retrain_lock_ttl_s) as acquired:
+        if not acquired:
+            return {"trained": False, "reason": "retrain already running"}
+        return run_retrain(registry_dir or settings.model_registry_dir)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+# Concurrency stress test for slot reservation (app.services.booking.reserve_seat) against a
+# live Postgres (settings.postgres_dsn).
+#
+#   python -m benchmarks.booking_concurrency [--slots 20] [--capacity 5] [--levels 1,4,16,64]
+#
+# For each concurrency level, a fresh set of slots is seeded at a throwaway center and more
+# reservations are attempted than there are seats. Checks that no slot ends up over capacity,
+# that every successful reservation has exactly one booking and that all seats were sold, then
+# reports reservations/s. Exits non-zero on any violation. Seeded rows are removed afterwards.
+
+import argparse
+import asyncio
+import datetime as dt
+import sys
+import time
+import uuid
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.db.models import Base, Booking, Customer, ServiceSlot
+from app.services.booking import reserve_seat
+
+
+async def _seed(sessions, center_id: str, slots: int, capacity: int) -> None:
+    start = dt.datetime.now(dt.timezone.utc).replace(minute=0, second=0, microsecond=0) + dt.timedelta(days=1)
+    async with sessions() as session:
+        session.add_all(
+            ServiceSlot(
+                center_id=center_id,
+                starts_at=start + dt.timedelta(hours=i),
+                ends_at=start + dt.timedelta(hours=i + 1),
+                capacity=capacity,
+                reserved=0,
+                is_active=True,
+            )
+            for i in range(slots)
+        )
+        await session.commit()
+
+
+async def _cleanup(sessions, center_id: str) -> None:
+    async with sessions() as session:
+        slot_ids = select(ServiceSlot.id).where(ServiceSlot.center_id == center_id)
+        await session.execute(delete(Booking).where(Booking.slot_id.in_(slot_ids)))
+        await session.execute(delete(ServiceSlot).where(ServiceSlot.center_id == center_id))
+        await session.commit()
+
+
+async def _run_level(sessions, customer_id: uuid.UUID, concurrency: int, slots: int, capacity: int) -> dict:
+    center_id = f"BENCH-{uuid.uuid4().hex[:8]}"
+    await _seed(sessions, center_id, slots, capacity)
+    seats = slots * capacity
+    attempts = seats + seats // 2
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(attempts):
+        queue.put_nowait(None)
+
+    booked = 0
+    rejected = 0
+    errors: list[str] = []
+
+    async def client() -> None:
+        # Same statements as select_and_reserve_slot, minus its fallback to other centers
+        nonlocal booked, rejected
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                async with sessions() as session:
+                    slot = await reserve_seat(session, center_id, fallback_any=False)
+                    if slot is None:
+                        rejected += 1
+                        continue
+                    session.add(Booking(customer_id=customer_id, alert_id=uuid.uuid4(), slot_id=slot.id, status="reserved"))
+                    await session.commit()
+                    booked += 1
+            except Exception as exc:
+                errors.append(repr(exc))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    async with sessions() as session:
+        rows = (
+            await session.execute(
+                select(ServiceSlot.id, ServiceSlot.reserved, ServiceSlot.capacity).where(ServiceSlot.center_id == center_id)
+            )
+        ).all()
+        booking_count = (
+            await session.execute(
+                select(func.count())
+                .select_from(Booking)
+                .join(ServiceSlot, ServiceSlot.id == Booking.slot_id)
+                .where(ServiceSlot.center_id == center_id)
+            )
+        ).scalar_one()
+    await _cleanup(sessions, center_id)
+
+    reserved_total = sum(r.reserved for r in rows)
+    overbooked = [r.id for r in rows if r.reserved > r.capacity]
+    return {
+        "concurrency": concurrency,
+        "booked": booked,
+        "rejected": rejected,
+        "errors": errors,
+        "rate": booked / elapsed if elapsed else 0.0,
+        "ok": not overbooked and not errors and reserved_total == booking_count == booked == seats,
+        "overbooked": overbooked,
+        "reserved_total": reserved_total,
+        "bookings": booking_count,
+        "seats": seats,
+    }
+
+
+async def main_async(args) -> bool:
+    engine = create_async_engine(settings.postgres_dsn, pool_size=max(args.levels), max_overflow=0)
+    sessions = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    customer_id = uuid.uuid4()
+    async with sessions() as session:
+        session.add(Customer(id=customer_id, name="booking benchmark"))
+        await session.commit()
+
+    ok = True
+    try:
+        print(f"{'concurrency':>11} {'booked':>7} {'rejected':>8} {'errors':>6} {'res/s':>9}  check")
+        for level in args.levels:
+            r = await _run_level(sessions, customer_id, level, args.slots, args.capacity)
+            ok &= r["ok"]
+            status = "ok" if r["ok"] else (
+                f"FAIL overbooked={len(r['overbooked'])} reserved={r['reserved_total']} "
+                f"bookings={r['bookings']} seats={r['seats']}"
+            )
+            print(f"{r['concurrency']:>11} {r['booked']:>7} {r['rejected']:>8} {len(r['errors']):>6} {r['rate']:>9.1f}  {status}")
+            for err in r["errors"][:3]:
+                print(f"    {err}")
+    finally:
+        async with sessions() as session:
+            await session.execute(delete(Customer).where(Customer.id == customer_id))
+            await session.commit()
+        await engine.dispose()
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.booking_concurrency",
+        description="Concurrency stress test for slot reservation against a live Postgres.",
+    )
+    parser.add_argument("--slots", type=int, default=20)
+    parser.add_argument("--capacity", type=int, default=5)
+    parser.add_argument("--levels", type=lambda s: [int(x) for x in s.split(",")], default=[1, 4, 16, 64])
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main_async(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+# Open-loop load driver: replays synthetic fleet telemetry (app.ml.fleet_sim) against a
+# running API at a target request rate.
+#
+#   python -m benchmarks.load_test --url http://localhost:8000 --endpoint predict --rate 200 --duration 60
+#
+# Requests are sent on a fixed schedule (rate/s) whatever the server's speed. At most
+# --concurrency are in flight; past that the schedule slips, and latency is measured from
+# the scheduled send time, so queueing in the driver counts against the server (no
+# coordinated omission). Service time (from actual send) is reported as well. Vehicles map
+# onto --customers synthetic customer ids; --seed-customers inserts them into
+# settings.postgres_dsn first. Run several drivers with disjoint --shard values for more load.
+# Exits non-zero when the error rate exceeds --max-error-rate.
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import sys
+import time
+import uuid
+from collections import Counter
+from collections.abc import Iterator
+
+import httpx
+import numpy as np
+
+from app.ml.fleet_sim import FleetConfig, iter_fleet, shard_range
+
+
+ENDPOINTS = {
+    "predict": "/predict",
+    "telemetry": "/telemetry",
+    "telemetry-async": "/telemetry?mode=async",
+}
+
+_CUSTOMER_NAMESPACE = uuid.UUID("6f1c1d2e-9a51-4d4f-8c53-2b0f0f7a6a10")
+
+
+def customer_id(vehicle_index: int, customers: int) -> uuid.UUID:
+    return uuid.uuid5(_CUSTOMER_NAMESPACE, str(vehicle_index % customers))
+
+
+def request_bodies(config: FleetConfig, vehicles: range, customers: int, sim_timestamps: bool) -> Iterator[dict]:
+    # TelemetryIn bodies in time order; wall-clock timestamps by default so rows land in
+    # existing partitions
+    for chunk in iter_fleet(config, vehicles):
+        for index, payload in zip(chunk.vehicle_index.tolist(), chunk.payloads()):
+            stamp = payload["timestamp"] if sim_timestamps else dt.datetime.now(dt.timezone.utc)
+            payload["timestamp"] = stamp.isoformat()
+            yield {"customer_id": str(customer_id(index, customers)), "telemetry": payload}
+
+
+async def seed_customers(customers: int) -> None:
+    from sqlalchemy.dialects.postgresql import insert
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.core.config import settings
+    from app.db.models import Customer
+
+    engine = create_async_engine(settings.postgres_dsn)
+    try:
+        rows = [
+            {"id": customer_id(i, customers), "name": f"Load test customer {i}", "email": f"load-{i}@example.invalid"}
+            for i in range(customers)
+        ]
+        async with engine.begin() as conn:
+            for start in range(0, len(rows), 1000):
+                await conn.execute(insert(Customer).on_conflict_do_nothing(index_elements=["id"]), rows[start : start + 1000])
+    finally:
+        await engine.dispose()
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    ms = np.array(values) * 1000
+    p50, p90, p95, p99 = np.percentile(ms, [50, 90, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 2),
+        "p90_ms": round(float(p90), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+async def run_load(
+    url: str,
+    path: str,
+    bodies: Iterator[dict],
+    rate: float,
+    duration_s: float,
+    concurrency: int,
+    timeout_s: float,
+) -> dict:
+    loop = asyncio.get_running_loop()
+    latencies: list[float] = []
+    service: list[float] = []
+    statuses: Counter[str] = Counter()
+    slots = asyncio.Semaphore(concurrency)
+    in_flight: set[asyncio.Task] = set()
+
+    async def send(client: httpx.AsyncClient, body: dict, scheduled: float) -> None:
+        sent = loop.time()
+        try:
+            response = await client.post(path, json=body)
+            statuses[str(response.status_code)] += 1
+        except httpx.HTTPError as exc:
+            statuses[type(exc).__name__] += 1
+        finally:
+            done = loop.time()
+            latencies.append(done - scheduled)
+            service.append(done - sent)
+            slots.release()
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout_s) as client:
+        start = loop.time()
+        for i in range(int(rate * duration_s)):
+            scheduled = start + i / rate
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            body = next(bodies, None)
+            if body is None:
+                break
+            await slots.acquire()
+            task = asyncio.create_task(send(client, body, scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        elapsed = loop.time() - start
+
+    sent = sum(statuses.values())
+    ok = sum(n for status, n in statuses.items() if status.startswith("2"))
+    return {
+        "path": path,
+        "target_rate": rate,
+        "sent": sent,
+        "ok": ok,
+        "errors": sent - ok,
+        "statuses": dict(statuses),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(ok / elapsed, 1) if elapsed > 0 else 0.0,
+        "latency": _percentiles(latencies),
+        "service_time": _percentiles(service),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.load_test",
+        description="Open-loop load driver replaying synthetic fleet telemetry against a running API.",
+    )
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="predict")
+    parser.add_argument("--rate", type=float, default=100.0, help="requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--vehicles", type=int, default=10_000)
+    parser.add_argument("--interval-s", type=float, default=60.0, help="simulated seconds between a vehicle's readings")
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--seed-customers", action="store_true")
+    parser.add_argument("--sim-timestamps", action="store_true", help="send simulated timestamps instead of now")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="per vehicle per day")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--shard", type=int, default=0)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    if args.seed_customers:
+        asyncio.run(seed_customers(args.customers))
+
+    # Simulated time covers every request the run can send
+    vehicles = shard_range(args.vehicles, args.shard, args.shards)
+    steps = int(args.rate * args.duration) // max(1, len(vehicles)) + 1
+    config = FleetConfig(
+        vehicles=args.vehicles,
+        start=dt.datetime.now(dt.timezone.utc),
+        duration_s=steps * args.interval_s,
+        interval_s=args.interval_s,
+        seed=args.seed,
+        failure_rate_per_day=args.failure_rate,
+    )
+    bodies = request_bodies(config, vehicles, args.customers, args.sim_timestamps)
+
+    t0 = time.perf_counter()
+    report = asyncio.run(
+        run_load(args.url, ENDPOINTS[args.endpoint], bodies, args.rate, args.duration, max(1, args.concurrency), args.timeout)
+    )
+    report["wall_seconds"] = round(time.perf_counter() - t0, 3)
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    error_rate = report["errors"] / report["sent"] if report["sent"] else 1.0
+    return 0 if error_rate <= args.max_error_rate else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
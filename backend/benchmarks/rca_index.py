@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+# Recall + latency benchmark for the IVF similar-case index (app.ml.vector_index).
+#
+#   python -m benchmarks.rca_index [--rows 1000000] [--nprobe 8] [--k 5]
+#
+# Builds an index over synthetic clustered feature vectors in a temp directory the way
+# tasks.update_rca_index does, then reports build/open time, single-query and batch latency,
+# recall@k against exact search, and the cost of an incremental add.
+
+import argparse
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from app.ml.vector_index import VectorIndex, train_centroids
+from app.services.similar_cases import SIMILARITY_FEATURES
+
+
+def _vectors(rows: int, dim: int, seed: int) -> np.ndarray:
+    # Mixture of Gaussians: cases cluster by failure mode
+    rng = np.random.default_rng(seed)
+    modes = rng.normal(0, 4, size=(64, dim))
+    return (modes[rng.integers(0, len(modes), rows)] + rng.normal(0, 1, size=(rows, dim))).astype(np.float32)
+
+
+def _columns(rows: int) -> dict:
+    now = dt.datetime.now(dt.timezone.utc)
+    return {
+        "case_ids": [uuid.uuid4() for _ in range(rows)],
+        "alert_ids": [uuid.uuid4() for _ in range(rows)],
+        "created_at": [now] * rows,
+        "components": ["engine", "battery", "brakes", "cooling"] * (rows // 4) + ["engine"] * (rows % 4),
+    }
+
+
+def _exact(index: VectorIndex, X: np.ndarray, k: int) -> np.ndarray:
+    Q = index.transform(X)
+    out = np.empty((len(Q), k), dtype=np.int64)
+    for i, q in enumerate(Q):
+        d = np.einsum("ij,ij->i", index.vectors - q, index.vectors - q)
+        out[i] = np.argpartition(d, k)[:k]
+    return out
+
+
+def run(rows: int, nprobe: int, k: int, nlist: int) -> None:
+    dim = len(SIMILARITY_FEATURES)
+    X = _vectors(rows, dim, seed=1)
+    queries = _vectors(1000, dim, seed=2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        mean, std = X.mean(axis=0), X.std(axis=0)
+        nlist = nlist or int(np.clip(np.sqrt(rows), 1, 4096))
+        rng = np.random.default_rng(0)
+        sample = X[rng.choice(rows, min(rows, nlist * 64), replace=False)]
+        index = VectorIndex.create(
+            os.path.join(tmp, "v1"), SIMILARITY_FEATURES, mean, std, train_centroids((sample - mean) / std, nlist)
+        )
+        t_train = time.perf_counter() - t0
+        columns = _columns(rows)
+        t0 = time.perf_counter()
+        index.add(X, order_by_list=True, **columns)
+        t_add = time.perf_counter() - t0
+        print(f"build: {rows} rows x {dim} dims, nlist={nlist}: centroids {t_train:.1f} s, write {t_add:.1f} s")
+
+        t0 = time.perf_counter()
+        index = VectorIndex.open(os.path.join(tmp, "v1"), writable=True)
+        print(f"open (memory-mapped): {(time.perf_counter() - t0) * 1e3:.0f} ms")
+
+        latencies = []
+        for q in queries[:500]:
+            t0 = time.perf_counter()
+            index.search(q, k, nprobe)
+            latencies.append(time.perf_counter() - t0)
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+        print(f"single query (nprobe={nprobe}, k={k}): p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+
+        for batch in (16, 256):
+            t0 = time.perf_counter()
+            index.search(queries[:batch], k, nprobe)
+            elapsed = time.perf_counter() - t0
+            print(f"batch of {batch}: {elapsed * 1e3:.1f} ms ({elapsed / batch * 1e3:.2f} ms/query)")
+
+        sample_q = queries[:100]
+        _, approx = index.search(sample_q, k, nprobe)
+        exact = _exact(index, sample_q, k)
+        recall = np.mean([len(set(a) & set(e)) / k for a, e in zip(approx, exact)])
+        print(f"recall@{k} vs exact: {recall:.3f}")
+
+        extra = _vectors(1000, dim, seed=3)
+        t0 = time.perf_counter()
+        index.add(extra, **_columns(len(extra)))
+        print(f"incremental add of {len(extra)}: {(time.perf_counter() - t0) * 1e3:.0f} ms (count now {index.count})")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.rca_index",
+        description="Recall and latency benchmark for the IVF similar-case index.",
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=0)
+    args = parser.parse_args(argv)
+    run(args.rows, args.nprobe, args.k, args.nlist)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+# Benchmark suite for the API hot paths, with regression tracking against a stored baseline.
+#
+#   python -m benchmarks.suite [--only micro|api] [--output results.json] [--baseline baseline.json] [--allow-skipped]
+#
+# Micro-benchmarks time build_features, predict_risk (the published model, or the fallback
+# artifacts) and _predict_component call by call. API benchmarks run the FastAPI app in-process
+# (httpx ASGITransport, startup/shutdown handlers included) against settings.postgres_dsn and
+# send --requests requests, --concurrency at a time, to /predict, /telemetry, /orchestrate,
+# /booking/select and /security/check. The schema relies on Postgres (partitions, JSONB, COPY,
+# SKIP LOCKED), so point POSTGRES_DSN at a scratch database, e.g. the docker-compose one; the
+# run inserts customers, slots at a throwaway center, telemetry, alerts and bookings. When the
+# database is unreachable the API benchmarks are recorded as skipped.
+#
+# Results (ops/s and p50/p95/p99 per benchmark) are written as JSON and compared against
+# --baseline (benchmarks/baseline.json by default; pass --baseline "" to skip). A benchmark
+# regresses when its p95 rises or its throughput falls by more than --threshold (or the
+# baseline's per-benchmark "thresholds"); one that was requested but skipped, or that the
+# baseline has and this run did not produce, is flagged too. The comparison is printed and
+# the exit code is 1 on any regression, and on skipped or missing benchmarks unless
+# --allow-skipped. A results file can be used as the next baseline as is; the committed one
+# is a micro run, so numbers from another machine want --threshold or a local baseline.
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import numpy as np
+
+from app.ml.fleet_sim import FleetConfig, iter_fleet
+
+from benchmarks.load_test import request_bodies, seed_customers
+
+
+API_ENDPOINTS = ("/predict", "/telemetry", "/orchestrate", "/booking/select", "/security/check")
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+_BENCH_CENTER = "BENCH-CENTER"
+
+
+def _stats(durations_s: list[float], elapsed_s: float, errors: int = 0) -> dict:
+    ms = np.array(durations_s) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (0.0, 0.0, 0.0)
+    ok = len(durations_s) - errors
+    return {
+        "n": len(durations_s),
+        "errors": errors,
+        "ops_per_s": round(ok / elapsed_s, 1) if elapsed_s > 0 else 0.0,
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+    }
+
+
+def _payloads(n: int, seed: int) -> list[dict]:
+    # TelemetryPayload dicts from a small synthetic fleet, some of it failing
+    config = FleetConfig(vehicles=200, duration_s=(n // 200 + 1) * 60.0, seed=seed, failure_rate_per_day=20.0, failure_ramp_s=600.0)
+    out: list[dict] = []
+    for chunk in iter_fleet(config):
+        out.extend(chunk.payloads())
+        if len(out) >= n:
+            break
+    return out[:n]
+
+
+def _time_calls(fn: Callable, args: list, warmup: int, rounds: int = 5) -> dict:
+    # Percentiles over every call; ops/s is the median of `rounds` passes, which shrugs off a
+    # pass that shared the CPU with something else
+    for arg in args[:warmup]:
+        fn(arg)
+    durations = []
+    rates = []
+    clock = time.perf_counter_ns
+    size = max(1, len(args) // rounds)
+    for i in range(0, len(args), size):
+        start = clock()
+        for arg in args[i : i + size]:
+            t0 = clock()
+            fn(arg)
+            durations.append((clock() - t0) / 1e9)
+        rates.append(len(args[i : i + size]) / max(clock() - start, 1) * 1e9)
+    result = _stats(durations, 0.0)
+    result["ops_per_s"] = round(float(np.median(rates)), 1)
+    return result
+
+
+def run_micro(iterations: int, seed: int) -> dict:
+    from app.ml.inference import predict_risk
+    from app.schemas.common import TelemetryPayload
+    from app.services.feature_engineering import build_features
+    from app.services.prediction import _predict_component
+
+    telemetry = [TelemetryPayload(**p) for p in _payloads(iterations, seed)]
+    features = [build_features(t).values for t in telemetry]
+    warmup = min(100, iterations)
+    return {
+        "micro.build_features": _time_calls(build_features, telemetry, warmup),
+        "micro.predict_risk": _time_calls(predict_risk, features, warmup),
+        "micro._predict_component": _time_calls(_predict_component, features, warmup),
+    }
+
+
+async def _database_error() -> str | None:
+    from app.db.session import engine
+
+    try:
+        async with asyncio.timeout(5):
+            async with engine.connect():
+                pass
+    except Exception as exc:  # noqa: BLE001 - any connect failure means "no database here"
+        return f"database unreachable ({type(exc).__name__}: {exc})"
+    return None
+
+
+async def _closed_loop(client, path: str, bodies: Iterator[dict], requests: int, concurrency: int) -> dict:
+    # `concurrency` workers, each sending its next request as soon as the last one returns
+    durations: list[float] = []
+    errors = 0
+    sent = 0
+    statuses: dict[str, int] = {}
+
+    async def worker() -> None:
+        nonlocal errors, sent
+        while sent < requests and (body := next(bodies, None)) is not None:
+            sent += 1
+            t0 = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                status = str(response.status_code)
+            except Exception as exc:  # noqa: BLE001 - counted, not fatal
+                status = type(exc).__name__
+            durations.append(time.perf_counter() - t0)
+            statuses[status] = statuses.get(status, 0) + 1
+            if not status.startswith("2"):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = _stats(durations, time.perf_counter() - start, errors)
+    result["statuses"] = statuses
+    return result
+
+
+def _api_bodies(path: str, requests: int, customers: int, seed: int) -> Iterator[dict]:
+    config = FleetConfig(vehicles=customers * 4, start=dt.datetime.now(dt.timezone.utc), duration_s=(requests // (customers * 4) + 2) * 60.0, seed=seed)
+    telemetry = request_bodies(config, range(config.vehicles), customers, sim_timestamps=False)
+    if path in ("/predict", "/telemetry", "/orchestrate"):
+        yield from telemetry
+    elif path == "/booking/select":
+        for body in telemetry:
+            yield {"customer_id": body["customer_id"], "alert_id": str(uuid.uuid4()), "preferred_center_id": _BENCH_CENTER}
+    elif path == "/security/check":
+        for body in telemetry:
+            yield {
+                "request_id": uuid.uuid4().hex,
+                "customer_id": body["customer_id"],
+                "action": "orchestrate",
+                "telemetry": body["telemetry"],
+            }
+
+
+async def run_api(requests: int, concurrency: int, customers: int, seed: int, endpoints: tuple[str, ...]) -> dict:
+    import httpx
+
+    reason = await _database_error()
+    if reason is not None:
+        return {f"api.{path}": {"skipped": reason} for path in endpoints}
+
+    from app.main import create_app
+
+    await seed_customers(customers)
+    app = create_app()
+    await app.router.startup()
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60.0) as client:
+            # Enough seats that booking never runs out of slots
+            response = await client.post(
+                "/booking/slots/generate",
+                json={"center_ids": [_BENCH_CENTER], "days": 2, "open_hour": 0, "close_hour": 24, "capacity": requests},
+            )
+            response.raise_for_status()
+            for path in endpoints:
+                # Warm up connections, caches and the executor before measuring
+                await _closed_loop(client, path, _api_bodies(path, concurrency * 4, customers, seed + 1), concurrency * 4, concurrency)
+                bodies = _api_bodies(path, requests, customers, seed)
+                results[f"api.{path}"] = await _closed_loop(client, path, bodies, requests, concurrency)
+    finally:
+        await app.router.shutdown()
+    return results
+
+
+def _requested(name: str, groups: set[str], endpoints: tuple[str, ...]) -> bool:
+    # Whether this run should have produced `name`: its group ran, and an API endpoint that
+    # still exists was not left out with --endpoints
+    group, _, path = name.partition(".")
+    if group not in groups:
+        return False
+    return group != "api" or path in endpoints or path not in API_ENDPOINTS
+
+
+def compare(
+    results: dict,
+    baseline: dict,
+    threshold: float,
+    groups: set[str] = frozenset({"micro", "api"}),
+    endpoints: tuple[str, ...] = API_ENDPOINTS,
+) -> tuple[list[dict], bool]:
+    # Rows for the printed comparison; p95 up or throughput down by more than the threshold regresses
+    thresholds = baseline.get("thresholds", {})
+    base_results = baseline.get("results", {})
+    rows = []
+    regressed = False
+    for name, current in results.items():
+        base = base_results.get(name)
+        row = {"name": name, "status": "new"}
+        if "skipped" in current:
+            row["status"] = "skipped"
+        elif base is not None and "skipped" not in base:
+            limit = thresholds.get(name, threshold)
+            row["ops_change"] = current["ops_per_s"] / base["ops_per_s"] - 1 if base["ops_per_s"] else 0.0
+            row["p95_change"] = current["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+            row["status"] = "REGRESSED" if row["p95_change"] > limit or row["ops_change"] < -limit else "ok"
+            regressed |= row["status"] == "REGRESSED"
+        rows.append(row)
+    for name in base_results:
+        if name not in results and _requested(name, groups, endpoints):
+            rows.append({"name": name, "status": "missing"})
+    return rows, regressed
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return out.stdout.strip() or None
+
+
+def _print_results(results: dict, rows: list[dict] | None) -> None:
+    changes = {row["name"]: row for row in rows or []}
+    print(f"{'benchmark':<28} {'ops/s':>11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err':>5}  vs baseline")
+    for name, r in results.items():
+        row = changes.get(name, {})
+        if "skipped" in r:
+            print(f"{name:<28} skipped: {r['skipped']}")
+            continue
+        change = ""
+        if "ops_change" in row:
+            change = f"{row['status']} (ops {row['ops_change']:+.1%}, p95 {row['p95_change']:+.1%})"
+        elif row:
+            change = row["status"]
+        print(
+            f"{name:<28} {r['ops_per_s']:>11,.1f} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['errors']:>5}  {change}"
+        )
+    for row in rows or []:
+        if row["status"] == "missing":
+            print(f"{row['name']:<28} MISSING: in the baseline but not produced by this run")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.suite",
+        description="Benchmark suite for the API hot paths, with regression tracking against a baseline.",
+    )
+    parser.add_argument("--only", choices=("micro", "api"), default=None)
+    parser.add_argument("--iterations", type=int, default=20_000, help="calls per micro-benchmark")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per API endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--customers", type=int, default=50)
+    parser.add_argument("--endpoints", default=",".join(API_ENDPOINTS))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="results file to compare against ('' for none)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative change")
+    parser.add_argument("--allow-skipped", action="store_true", help="exit 0 when benchmarks are skipped or missing")
+    args = parser.parse_args(argv)
+
+    endpoints = tuple(p for p in args.endpoints.split(",") if p)
+    unknown = set(endpoints) - set(API_ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    groups = {"micro", "api"} if args.only is None else {args.only}
+    results: dict[str, dict] = {}
+    if args.only in (None, "micro"):
+        results.update(run_micro(args.iterations, args.seed))
+    if args.only in (None, "api"):
+        results.update(asyncio.run(run_api(args.requests, max(1, args.concurrency), args.customers, args.seed, endpoints)))
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "allow_skipped")},
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    rows, regressed = None, False
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            rows, regressed = compare(results, json.load(f), args.threshold, groups, endpoints)
+    _print_results(results, rows)
+    print(f"results written to {args.output}")
+
+    incomplete = sorted(name for name, r in results.items() if "skipped" in r)
+    incomplete += [row["name"] for row in rows or [] if row["status"] == "missing"]
+    if incomplete:
+        verdict = "allowed by --allow-skipped" if args.allow_skipped else "failing the run (--allow-skipped to accept)"
+        print(f"{len(incomplete)} benchmark(s) skipped or missing, {verdict}: {', '.join(incomplete)}")
+    return 1 if regressed or (incomplete and not args.allow_skipped) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+# Parity check + micro-benchmark for the compiled NumPy evaluator against XGBClassifier.
+#
+#   python -m benchmarks.tree_eval [--model artifacts/xgb_model.json]
+#
+# Exits non-zero when any model's probabilities diverge beyond --tolerance. The timings compare
+# xgboost, the compiled evaluator alone, and the numpy backend as served (compiled up to
+# settings.inference_numpy_max_rows rows, xgboost above).
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.ml.synthetic_data import make_synthetic_dataset
+from app.ml.tree_eval import compile_xgb_json
+
+
+# (n_estimators, max_depth) grid for freshly trained parity models
+_PARITY_GRID = [(1, 1), (10, 3), (80, 4), (50, 6), (200, 8)]
+
+
+def _dataset(n: int, seed: int, missing_rate: float = 0.0) -> tuple[np.ndarray, np.ndarray]:
+    X_dict, y, _ = make_synthetic_dataset(n=n, seed=seed)
+    X = np.column_stack(list(X_dict.values()))
+    if missing_rate:
+        rng = np.random.default_rng(seed)
+        X[rng.random(X.shape) < missing_rate] = np.nan
+    return X, y
+
+
+def _check(model_path: str, X: np.ndarray, tolerance: float) -> tuple[float, bool]:
+    # Max |dp| over the batch and over single-row calls, and whether it is within tolerance
+    from xgboost import XGBClassifier
+
+    reference = XGBClassifier()
+    reference.load_model(model_path)
+    compiled = compile_xgb_json(model_path)
+
+    expected = reference.predict_proba(X)[:, 1]
+    actual = compiled.predict_proba(X)[:, 1]
+    single = np.array([compiled.predict_proba(row)[0, 1] for row in X[:200]])
+
+    diff = float(max(np.abs(expected - actual).max(), np.abs(expected[:200] - single).max()))
+    return diff, diff <= tolerance
+
+
+def run_parity(model_path: str, tolerance: float) -> bool:
+    from xgboost import XGBClassifier
+
+    X_eval, _ = _dataset(20_000, seed=11, missing_rate=0.05)
+    ok = True
+
+    if os.path.exists(model_path):
+        diff, within = _check(model_path, X_eval, tolerance)
+        ok &= within
+        print(f"parity {model_path}: max |dp| = {diff:.2e}{'' if within else '  FAIL'}")
+
+    X_train, y_train = _dataset(4000, seed=3, missing_rate=0.05)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_estimators, max_depth in _PARITY_GRID:
+            model = XGBClassifier(n_estimators=n_estimators, max_depth=max_depth, learning_rate=0.2, n_jobs=1, random_state=7)
+            model.fit(X_train, y_train)
+            path = os.path.join(tmp, f"model_{n_estimators}_{max_depth}.json")
+            model.save_model(path)
+
+            diff, within = _check(path, X_eval, tolerance)
+            ok &= within
+            print(f"parity n_estimators={n_estimators:<4} max_depth={max_depth}: max |dp| = {diff:.2e}{'' if within else '  FAIL'}")
+
+    return ok
+
+
+def _time_per_call(fn, x: np.ndarray, repeat: int) -> float:
+    fn(x)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(x)
+    return (time.perf_counter() - t0) / repeat
+
+
+def run_benchmark(model_path: str) -> None:
+    from xgboost import XGBClassifier
+
+    from app.ml.inference import _load_model
+
+    reference = XGBClassifier()
+    reference.load_model(model_path)
+    compiled = compile_xgb_json(model_path)
+    served = _load_model(model_path, "numpy")
+
+    X, _ = _dataset(100_000, seed=5)
+    print(f"{'rows':>8} {'xgboost us/call':>16} {'compiled us/call':>17} {'numpy backend':>14} {'speedup':>8}")
+    for rows, repeat in ((1, 2000), (16, 1000), (256, 200), (1024, 50), (4096, 20), (100_000, 3)):
+        x = X[:rows]
+        t_ref = _time_per_call(reference.predict_proba, x, repeat)
+        t_np = _time_per_call(compiled.predict_proba, x, repeat)
+        t_served = _time_per_call(served.predict_proba, x, repeat)
+        print(f"{rows:>8} {t_ref * 1e6:>16.1f} {t_np * 1e6:>17.1f} {t_served * 1e6:>14.1f} {t_ref / t_served:>7.1f}x")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.tree_eval",
+        description="Check the compiled tree evaluator against xgboost and time both.",
+    )
+    parser.add_argument("--model", default="artifacts/xgb_model.json")
+    parser.add_argument("--tolerance", type=float, default=1e-5)
+    parser.add_argument("--skip-benchmark", action="store_true")
+    args = parser.parse_args(argv)
+
+    ok = run_parity(args.model, args.tolerance)
+    if not args.skip_benchmark and os.path.exists(args.model):
+        run_benchmark(args.model)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+# Micro-benchmark + sanity check for the streaming UEBA engine (app.services.ueba).
+#
+#   python -m benchmarks.ueba [--entities 20000] [--events 200000]
+#
+# Replays synthetic traffic through UebaEngine.observe() and reports the per-call cost (cold:
+# spread over every entity; hot: one customer + vehicle pair), the cost of a full
+# evaluate_security() for comparison, snapshot/restore timings, and the scores given to
+# injected anomalies (request bursts, unusual actions, sensor jumps) and to ordinary requests.
+# Exits non-zero when an anomaly scores below --threshold x (1 + --margin) or an ordinary
+# request above --threshold x (1 - --margin).
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from app.core.config import settings
+from app.services.ueba import UebaEngine
+
+
+def _engine(max_entities: int) -> UebaEngine:
+    return UebaEngine(
+        max_entities=max_entities,
+        bucket_s=settings.ueba_bucket_s,
+        window_buckets=settings.ueba_window_buckets,
+        alpha=settings.ueba_alpha,
+        action_alpha=settings.ueba_action_alpha,
+        min_events=settings.ueba_min_events,
+        max_actions=settings.ueba_max_actions,
+        sensor_fields=tuple(settings.ueba_sensor_fields),
+        rate_z=settings.ueba_rate_z,
+        sensor_z=settings.ueba_sensor_z,
+        action_min_p=settings.ueba_action_min_p,
+        action_unseen_weight=settings.ueba_action_unseen_weight,
+    )
+
+
+def _telemetry(rng: random.Random, vehicle: int) -> dict:
+    return {
+        "vehicle_id": f"VEH-{vehicle:06d}",
+        "speed_kph": rng.gauss(60, 15),
+        "engine_temp_c": rng.gauss(90, 4),
+        "vibration_rms": abs(rng.gauss(0.2, 0.05)),
+        "oil_pressure_kpa": rng.gauss(250, 15),
+        "battery_v": rng.gauss(12.6, 0.2),
+        "odometer_km": 10_000 + vehicle,
+        "ambient_temp_c": rng.gauss(22, 5),
+    }
+
+
+def _traffic(rng: random.Random, entities: int, events: int, start: float, duration_s: float):
+    # Each customer owns one vehicle; mostly "orchestrate", a little "predict"
+    step = duration_s / events
+    for i in range(events):
+        entity = rng.randrange(entities)
+        action = "orchestrate" if rng.random() < 0.95 else "predict"
+        yield start + i * step, f"cust-{entity:06d}", action, _telemetry(rng, entity)
+
+
+def run(entities: int, events: int, threshold: float, margin: float) -> bool:
+    rng = random.Random(7)
+    engine = _engine(max(entities * 2, 1))
+    # About one request per entity every 10 minutes
+    duration_s = events * 600 / entities
+    traffic = list(_traffic(rng, entities, events, time.time() - duration_s, duration_s))
+    t_end = traffic[-1][0]
+
+    t0 = time.perf_counter()
+    for now, customer, action, telemetry in traffic:
+        engine.observe(customer, telemetry["vehicle_id"], action, telemetry, now=now)
+    per_call = (time.perf_counter() - t0) / len(traffic)
+    print(f"observe (cold): {per_call * 1e6:.2f} us/call over {len(traffic)} events, {engine.stats()['entities']} entities")
+
+    # Warm the target entity so every signal has a baseline
+    target = 0
+    now = t_end
+    for _ in range(200):
+        now += 120
+        action = "orchestrate" if rng.random() < 0.95 else "predict"
+        engine.observe(f"cust-{target:06d}", f"VEH-{target:06d}", action, _telemetry(rng, target), now=now)
+
+    # Hot path on another pair, so the target's baselines stay as trained
+    hot = _telemetry(rng, 1)
+    t0 = time.perf_counter()
+    for _ in range(20_000):
+        engine.observe("cust-000001", hot["vehicle_id"], "orchestrate", hot, now=now)
+    print(f"observe (hot):  {(time.perf_counter() - t0) / 20_000 * 1e6:.2f} us/call for one customer + vehicle")
+
+    ok = True
+    checks = []
+    burst = None
+    now += 600
+    for i in range(60):
+        burst = engine.observe(f"cust-{target:06d}", None, "orchestrate", None, now=now + i * 0.5)
+    checks.append(("request burst", burst))
+    now += 3600
+    checks.append(("unusual action", engine.observe(f"cust-{target:06d}", None, "export_all_customers", None, now=now)))
+    jump = _telemetry(rng, target) | {"oil_pressure_kpa": 40.0}
+    now += 600
+    checks.append(("sensor jump", engine.observe(None, f"VEH-{target:06d}", "orchestrate", jump, now=now)))
+    now += 600
+    ordinary = [("normal request", engine.observe(f"cust-{target:06d}", f"VEH-{target:06d}", "orchestrate", _telemetry(rng, target), now=now))]
+    now += 600
+    ordinary.append(("rare action", engine.observe(f"cust-{target:06d}", None, "predict", None, now=now)))
+
+    for name, score in checks:
+        flagged = score.score >= threshold * (1 + margin)
+        ok &= flagged
+        print(f"{name:<16} score={score.score:8.2f} signal={score.signal} {'ok' if flagged else 'MISSED'}")
+    for name, score in ordinary:
+        quiet = score.score <= threshold * (1 - margin)
+        ok &= quiet
+        print(f"{name:<16} score={score.score:8.2f} signal={score.signal} {'ok' if quiet else 'FALSE ALARM'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "baselines.json")
+        t0 = time.perf_counter()
+        written = asyncio.run(engine.snapshot(path))
+        t_snap = time.perf_counter() - t0
+        restored_engine = _engine(max(entities * 2, 1))
+        t0 = time.perf_counter()
+        restored = restored_engine.restore(path)
+        t_restore = time.perf_counter() - t0
+        size_mb = os.path.getsize(path) / 1e6
+    print(f"snapshot: {written} entities, {size_mb:.1f} MB, write {t_snap * 1e3:.0f} ms, restore {t_restore * 1e3:.0f} ms")
+    ok &= restored == written
+
+    from app.services.security import SecurityCheckIn, evaluate_security
+
+    payload = SecurityCheckIn(request_id="req-benchmark-1", customer_id=None, telemetry=_telemetry(rng, 1))
+    evaluate_security(payload)
+    t0 = time.perf_counter()
+    for _ in range(20_000):
+        evaluate_security(payload)
+    print(f"evaluate_security: {(time.perf_counter() - t0) / 20_000 * 1e6:.2f} us/call (incl. audit row construction)")
+    return ok
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.ueba",
+        description="Micro-benchmark and sanity check for the streaming UEBA engine.",
+    )
+    parser.add_argument("--entities", type=int, default=20_000)
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--threshold", type=float, default=settings.ueba_block_score)
+    parser.add_argument("--margin", type=float, default=0.15, help="required relative distance from --threshold")
+    args = parser.parse_args(argv)
+    return 0 if run(args.entities, args.events, args.threshold, args.margin) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
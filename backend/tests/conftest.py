@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+import redis
+
+
+@pytest.fixture
+def redis_url() -> str:
+    # Tests of the Redis scripts run against a real server. TEST_REDIS_URL must name a
+    # throwaway database: it is flushed before each test.
+    url = os.environ.get("TEST_REDIS_URL")
+    if not url:
+        pytest.skip("TEST_REDIS_URL not set")
+    client = redis.Redis.from_url(url, socket_connect_timeout=1)
+    try:
+        client.flushdb()
+    except redis.ConnectionError as exc:
+        pytest.skip(f"Redis at TEST_REDIS_URL unreachable: {exc}")
+    finally:
+        client.close()
+    return url
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import datetime as dt
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.services.availability import AvailabilityIndex, SlotEntry
+
+
+NOW = dt.datetime(2026, 3, 2, 6, 0, tzinfo=dt.timezone.utc)
+
+
+def _slot(center: str, day: int, hour: int, capacity: int = 2, reserved: int = 0) -> SlotEntry:
+    starts = dt.datetime(2026, 3, day, hour, tzinfo=dt.timezone.utc)
+    return SlotEntry(uuid.uuid4(), center, starts, starts + dt.timedelta(hours=1), capacity, reserved)
+
+
+def _hours(entries: list[SlotEntry]) -> list[tuple[str, int, int]]:
+    return [(e.center_id, e.starts_at.day, e.starts_at.hour) for e in entries]
+
+
+@pytest.fixture
+def index() -> AvailabilityIndex:
+    index = AvailabilityIndex(refresh_interval_s=60, horizon_days=14)
+    index.load(
+        [
+            _slot("A", 1, 10),  # already started
+            _slot("A", 2, 5),  # before NOW
+            _slot("A", 2, 8, reserved=2),  # full
+            _slot("A", 2, 9),
+            _slot("A", 2, 22),
+            _slot("A", 3, 2),
+            _slot("B", 2, 7),
+            _slot("B", 2, 12),
+            _slot("C", 2, 11),
+        ]
+    )
+    return index
+
+
+def test_preferred_center_ranks_first(index, monkeypatch):
+    monkeypatch.setattr(settings, "booking_other_center_penalty_h", 24.0)
+    monkeypatch.setattr(settings, "center_neighbors", {})
+    best = index.best("A", None, 5, now=NOW)
+    assert _hours(best) == [("A", 2, 9), ("A", 2, 22), ("A", 3, 2), ("B", 2, 7), ("C", 2, 11)]
+
+
+def test_without_preference_earliest_open_slot_wins(index):
+    assert _hours(index.best(None, None, 3, now=NOW)) == [("B", 2, 7), ("A", 2, 9), ("C", 2, 11)]
+
+
+def test_neighbours_limit_the_other_centers(index, monkeypatch):
+    monkeypatch.setattr(settings, "center_neighbors", {"A": ["C"]})
+    best = index.best("A", None, 10, now=NOW)
+    assert {e.center_id for e in best} == {"A", "C"}
+
+
+@pytest.mark.parametrize(
+    ("window", "expected"),
+    [
+        ("9-18", [("B", 2, 12), ("C", 2, 11), ("A", 2, 9)]),
+        # Wraps past midnight: 20:00 to 06:00
+        ("20-6", [("A", 2, 22), ("A", 3, 2)]),
+        # Unparsable means unrestricted
+        ("whenever", [("B", 2, 7), ("A", 2, 9), ("C", 2, 11), ("B", 2, 12), ("A", 2, 22), ("A", 3, 2)]),
+    ],
+)
+def test_time_window_filters_start_times(index, window, expected):
+    assert sorted(_hours(index.best(None, window, 10, now=NOW))) == sorted(expected)
+
+
+def test_record_reservation_fills_a_slot(index):
+    first = index.best("B", "7-8", 1, now=NOW)[0]
+    seats = index.stats()["open_seats"]
+    index.record_reservation(first.id)
+    assert index.stats()["open_seats"] == seats - 1
+    index.record_reservation(first.id)
+    assert index.best("B", "7-8", 1, now=NOW) == []
+    # Unknown ids (slots past the horizon, or from before a reload) are ignored
+    index.record_reservation(uuid.uuid4())
+    assert index.stats()["open_seats"] == seats - 2
+
+
+def test_invalidate_marks_the_index_stale(index):
+    assert not index.stale
+    index.invalidate()
+    assert index.stale
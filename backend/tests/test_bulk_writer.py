@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.db.bulk_writer import BulkWriter
+from app.db.models import TelemetryEvent
+
+
+class RecordingWriter(BulkWriter):
+    # The real buffering, backpressure and error handling over an in-memory "table"; a row
+    # with vehicle_id "bad" is rejected the way a constraint violation would be
+    def __init__(self, write_delay_s: float = 0.0, **kwargs) -> None:
+        super().__init__(None, use_copy=False, **kwargs)
+        self.write_delay_s = write_delay_s
+        self.batches: list[list[str]] = []
+        # Rows accepted by submit() and not yet written, at its highest
+        self.accepted = 0
+        self.written = 0
+        self.peak_rows = 0
+
+    async def submit(self, rows):
+        future = await super().submit(rows)
+        self.accepted += sum(len(batch) for batch in rows.values())
+        return future
+
+    async def _write(self, buffers):
+        rows = [row["vehicle_id"] for batch in buffers.values() for row in batch]
+        await asyncio.sleep(self.write_delay_s)
+        self.peak_rows = max(self.peak_rows, self.accepted - self.written)
+        if "bad" in rows:
+            raise IntegrityError("INSERT", {}, Exception("check violation"))
+        self.batches.append(rows)
+        self.written += len(rows)
+
+
+def _rows(*vehicles: str) -> dict:
+    return {TelemetryEvent: [{"vehicle_id": v, "customer_id": None, "payload": {}} for v in vehicles]}
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_data_error_fails_only_the_offending_submission():
+    async def scenario():
+        writer = RecordingWriter(flush_rows=100, flush_ms=10_000, max_buffered=1000)
+        writer.start()
+        futures = [await writer.submit(_rows(v)) for v in ("a", "bad", "c")]
+        await writer.flush()
+        await writer.stop()
+        return writer, futures
+
+    writer, (ok1, bad, ok2) = _run(scenario())
+    assert ok1.result() is None and ok2.result() is None
+    assert isinstance(bad.exception(), IntegrityError)
+    assert writer.batches[-2:] == [["a"], ["c"]]
+    assert writer.stats()["failed_rows"] == 1
+
+
+def test_flush_is_a_barrier():
+    async def scenario():
+        writer = RecordingWriter(flush_rows=1000, flush_ms=10_000, max_buffered=1000)
+        writer.start()
+        futures = [await writer.submit(_rows(str(i))) for i in range(5)]
+        assert not any(f.done() for f in futures)
+        await writer.flush()
+        done = all(f.done() for f in futures)
+        await writer.stop()
+        return writer, done
+
+    writer, done = _run(scenario())
+    assert done
+    assert writer.stats()["rows_written"] == 5
+
+
+def test_backpressure_bounds_buffered_plus_inflight_rows():
+    async def scenario():
+        writer = RecordingWriter(write_delay_s=0.01, flush_rows=10, flush_ms=1, max_buffered=20)
+        writer.start()
+        futures = [await writer.submit(_rows(*(f"v{i}-{j}" for j in range(5)))) for i in range(40)]
+        await asyncio.gather(*futures)
+        await writer.stop()
+        return writer
+
+    writer = _run(scenario())
+    assert writer.stats()["rows_written"] == 200
+    # One submission may land on top of a full buffer, never a second buffer's worth
+    assert writer.peak_rows <= 20 + 5
+
+
+def test_submit_after_stop_is_rejected():
+    async def scenario():
+        writer = RecordingWriter(flush_rows=10, flush_ms=10, max_buffered=10)
+        writer.start()
+        await writer.stop()
+        await writer.submit(_rows("a"))
+
+    with pytest.raises(RuntimeError):
+        _run(scenario())
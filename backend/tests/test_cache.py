@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+import redis.asyncio as aioredis
+
+import app.core.cache as cache_module
+import app.core.redis as redis_module
+from app.core.cache import TwoTierCache
+
+# Nothing listens here: every Redis call fails at once, as when Redis is down
+UNREACHABLE = "redis://127.0.0.1:1/0"
+
+
+def _run(url: str, scenario):
+    async def main():
+        redis_module._async_client = aioredis.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+        try:
+            return await scenario()
+        finally:
+            await redis_module.close_async_redis()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture(autouse=True)
+def _breaker(monkeypatch):
+    monkeypatch.setattr(cache_module, "_redis_retry_at", 0.0)
+
+
+class Loader:
+    # Returns the next value when released, so a test can act while a load is in flight
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return self.values.pop(0)
+
+
+def test_concurrent_misses_share_one_load():
+    async def scenario():
+        cache = TwoTierCache("test-share", ttl_s=60)
+        loader = Loader({"name": "a"})
+        first = asyncio.create_task(cache.get("k", loader))
+        second = asyncio.create_task(cache.get("k", loader))
+        await asyncio.sleep(0)
+        # A caller that goes away doesn't cancel the load for the other one
+        first.cancel()
+        loader.release.set()
+        return await second, loader.calls
+
+    assert _run(UNREACHABLE, scenario) == ({"name": "a"}, 1)
+
+
+def test_absent_values_are_cached():
+    async def scenario():
+        cache = TwoTierCache("test-absent", ttl_s=60)
+        loader = Loader(None, {"name": "late"})
+        loader.release.set()
+        results = [await cache.get("k", loader), await cache.get("k", loader)]
+        return results, loader.calls, cache.stats()["negative_hits"]
+
+    assert _run(UNREACHABLE, scenario) == ([None, None], 1, 1)
+
+
+def test_load_detached_by_invalidate_is_not_cached():
+    async def scenario():
+        cache = TwoTierCache("test-local", ttl_s=60)
+        loader = Loader("old", "new")
+        in_flight = asyncio.create_task(cache.get("k", loader))
+        await asyncio.sleep(0)
+        await cache.invalidate("k")
+        loader.release.set()
+        # The caller still gets what was read, but it is not kept
+        return await in_flight, await cache.get("k", loader), cache.stats()["stale_loads"]
+
+    assert _run(UNREACHABLE, scenario) == ("old", "new", 1)
+
+
+def test_redis_outage_opens_the_breaker():
+    async def scenario():
+        cache = TwoTierCache("test-breaker", ttl_s=60, local_ttl_s=0)
+        loader = Loader("a", "b", "c")
+        loader.release.set()
+        for _ in range(3):
+            await cache.get("k", loader)
+        return cache.stats()
+
+    stats = _run(UNREACHABLE, scenario)
+    assert stats["loads"] == 3
+    # The first miss paid for the failure; later ones skipped Redis until the retry time
+    assert stats["redis_errors"] == 1
+    assert stats["redis_skipped"] >= 2
+
+
+def test_stale_write_from_another_process_is_rejected(redis_url):
+    async def scenario():
+        # Two processes sharing Redis: one loads while the other writes and invalidates
+        reader = TwoTierCache("test-gen", ttl_s=60)
+        writer = TwoTierCache("test-gen", ttl_s=60)
+        loader = Loader("old")
+        in_flight = asyncio.create_task(reader.get("k", loader))
+        await asyncio.sleep(0.05)
+        await writer.invalidate("k")
+        loader.release.set()
+        assert await in_flight == "old"
+        shared = await redis_module.get_async_redis().get(reader._redis_key("k"))
+
+        fresh = Loader("new")
+        fresh.release.set()
+        value = await writer.get("k", fresh)
+        stored = await redis_module.get_async_redis().get(writer._redis_key("k"))
+        return shared, value, stored
+
+    assert _run(redis_url, scenario) == (None, "new", b'"new"')
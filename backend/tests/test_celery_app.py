@@ -0,0 +1,11 @@
+from __future__ import annotations
+
+from app.tasks.celery_app import celery_app
+
+
+def test_worker_registers_every_scheduled_task():
+    # What a worker does at startup; beat jobs for unregistered names are rejected
+    celery_app.loader.import_default_modules()
+    scheduled = {entry["task"] for entry in celery_app.conf.beat_schedule.values()}
+    for name in scheduled | {"tasks.continue_workflow", "tasks.retrain_model", "tasks.send_notification"}:
+        assert name in celery_app.tasks
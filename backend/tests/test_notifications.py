@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+import redis
+import redis.asyncio as aioredis
+
+import app.core.redis as redis_module
+from app.core.config import settings
+from app.tasks import notifications
+from app.tasks.notifications import (
+    PROCESSING_KEY,
+    QUEUE_KEY,
+    ProviderStandIn,
+    _claim,
+    _dedupe_key,
+    dispatch_pending,
+    enqueue_notification,
+)
+
+# Every test here runs the Lua scripts against a real server (see conftest.redis_url)
+
+
+class FailingProvider(ProviderStandIn):
+    def send_bulk(self, messages):
+        raise ConnectionError("gateway down")
+
+
+@pytest.fixture
+def client(redis_url, monkeypatch):
+    monkeypatch.setattr(notifications, "_providers", {})
+    monkeypatch.setattr(settings, "notification_rate_limits", {})
+    client = redis.Redis.from_url(redis_url)
+    yield client
+    client.close()
+
+
+def _enqueue(redis_url: str, *items: tuple[str, str]) -> list[bool]:
+    # (vehicle_id, component) alerts for one SMS destination
+    async def main():
+        redis_module._async_client = aioredis.from_url(redis_url)
+        try:
+            return [
+                await enqueue_notification("sms", "+100", f"{vehicle} {component}", vehicle, component)
+                for vehicle, component in items
+            ]
+        finally:
+            await redis_module.close_async_redis()
+
+    return asyncio.run(main())
+
+
+def _queued(client) -> list[str]:
+    return [json.loads(item)["vehicle_id"] for item in client.lrange(QUEUE_KEY, 0, -1)]
+
+
+def test_repeat_alerts_are_deduplicated(client, redis_url):
+    assert _enqueue(redis_url, ("V1", "brakes"), ("V1", "brakes"), ("V1", "battery")) == [True, False, True]
+    assert client.llen(QUEUE_KEY) == 2
+
+
+def test_claimed_batch_survives_a_crashed_dispatcher(client, redis_url):
+    _enqueue(redis_url, ("V1", "brakes"), ("V2", "brakes"), ("V3", "brakes"))
+    # A dispatcher claims two and dies before acknowledging
+    assert [item["vehicle_id"] for item in _claim(client, 2)] == ["V1", "V2"]
+    assert _queued(client) == ["V3"]
+    assert client.llen(PROCESSING_KEY) == 2
+
+    stats = dispatch_pending(client)
+    assert stats["drained"] == 3 and stats["sent"] == 1  # one destination: a single digest
+    assert client.llen(QUEUE_KEY) == 0 and not client.exists(PROCESSING_KEY)
+    assert notifications.get_provider("sms").messages == 1
+
+
+def test_failed_sends_retry_then_drop_and_clear_dedupe(client, redis_url, monkeypatch):
+    monkeypatch.setattr(settings, "notification_max_attempts", 2)
+    notifications._providers["sms"] = FailingProvider("sms")
+    _enqueue(redis_url, ("V1", "brakes"))
+
+    assert dispatch_pending(client)["retrying"] == 1
+    assert _queued(client) == ["V1"]
+    assert client.exists(_dedupe_key({"vehicle_id": "V1", "component": "brakes"}))
+
+    assert dispatch_pending(client)["dropped"] == 1
+    assert client.llen(QUEUE_KEY) == 0 and not client.exists(PROCESSING_KEY)
+    # Given up on, so the next alert for it is not suppressed
+    assert _enqueue(redis_url, ("V1", "brakes")) == [True]
+
+
+def test_over_budget_destinations_go_first_next_window(client, redis_url, monkeypatch):
+    monkeypatch.setattr(settings, "notification_rate_limits", {"sms": 1 / settings.notification_window_s})
+
+    async def main():
+        redis_module._async_client = aioredis.from_url(redis_url)
+        try:
+            for destination in ("+1", "+2", "+3"):
+                await enqueue_notification("sms", destination, "m", f"V{destination}", "brakes")
+        finally:
+            await redis_module.close_async_redis()
+
+    asyncio.run(main())
+    stats = dispatch_pending(client)
+    assert (stats["sent"], stats["deferred"]) == (1, 2)
+    assert _queued(client) == ["V+2", "V+3"]
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services.orchestration import INTAKE, WORKFLOW, SecurityBlocked
+from app.services.stages import Stage, StageGraph
+
+
+def _ancestors(graph: StageGraph, name: str) -> set[str]:
+    seen: set[str] = set()
+    stack = list(graph.stages[name].after)
+    while stack:
+        dep = stack.pop()
+        if dep not in seen:
+            seen.add(dep)
+            stack.extend(graph.stages[dep].after)
+    return seen
+
+
+def test_writes_wait_for_security():
+    for stage in ("persist", "booking", "commit"):
+        assert "security" in _ancestors(WORKFLOW, stage)
+    assert "security" in _ancestors(INTAKE, "persist")
+
+
+def test_notification_waits_for_commit():
+    assert "commit" in _ancestors(WORKFLOW, "notify")
+
+
+@pytest.mark.parametrize("graph", [WORKFLOW, INTAKE], ids=lambda g: g.name)
+@pytest.mark.parametrize("security_delay_s", [0.0, 0.01])
+def test_denied_request_persists_nothing(graph, security_delay_s):
+    # The graph's dependencies with recording stand-ins: however the stages interleave, a
+    # denial stops the run before anything is written
+    ran: list[str] = []
+
+    def stand_in(name: str):
+        async def fn(ctx):
+            if name == "security":
+                await asyncio.sleep(security_delay_s)
+                raise SecurityBlocked("denied", audit=None)
+            ran.append(name)
+
+        return fn
+
+    stand_ins = StageGraph("test", [Stage(s.name, stand_in(s.name), s.after) for s in graph.stages.values()])
+    with pytest.raises(SecurityBlocked):
+        asyncio.run(stand_ins.run({}))
+    assert "persist" not in ran
+    assert "commit" not in ran
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import numpy as np
+
+from app.ml.executor import InferenceOverloadedError
+from app.ml.scheduler import InferenceScheduler
+from app.services.feature_engineering import FEATURE_NAMES
+
+
+class BatchRecorder:
+    # Scores each row as its first feature, so every caller can check it got its own row back
+    def __init__(self, delay_s: float = 0.0, error: Exception | None = None) -> None:
+        self.delay_s = delay_s
+        self.error = error
+        self.sizes: list[int] = []
+
+    async def __call__(self, matrix: np.ndarray, feature_names) -> tuple[np.ndarray, str]:
+        self.sizes.append(len(matrix))
+        await asyncio.sleep(self.delay_s)
+        if self.error is not None:
+            raise self.error
+        return matrix[:, 0], "test"
+
+
+def _features(i: int) -> dict:
+    return {FEATURE_NAMES[0]: float(i)}
+
+
+async def _with_scheduler(batch_fn, scenario, **kwargs):
+    scheduler = InferenceScheduler(batch_fn, **kwargs)
+    await scheduler.start()
+    try:
+        return await scenario(scheduler)
+    finally:
+        await scheduler.stop()
+
+
+def test_concurrent_requests_are_batched():
+    batch_fn = BatchRecorder(delay_s=0.002)
+
+    async def scenario(scheduler):
+        return await asyncio.gather(*(scheduler.submit(_features(i)) for i in range(100))), scheduler.stats()
+
+    results, stats = asyncio.run(_with_scheduler(batch_fn, scenario, max_batch_size=8, max_wait_us=1000))
+    assert results == [(float(i), "test") for i in range(100)]
+    assert max(batch_fn.sizes) <= 8
+    assert len(batch_fn.sizes) < 100
+    assert stats["requests"] == 100 and stats["batches"] == len(batch_fn.sizes)
+    assert sum(stats["batch_size_histogram"].values()) == stats["batches"]
+    # The first batch left the other 99 rows queued
+    assert sum(stats["queue_depth_histogram"].values()) == stats["batches"]
+    assert stats["queue_depth_sum"] > 0
+
+
+def test_idle_queue_does_not_wait_for_the_deadline():
+    async def scenario(scheduler):
+        start = time.perf_counter()
+        await scheduler.submit(_features(1))
+        return time.perf_counter() - start
+
+    # Nothing suggests company is coming, so a lone request goes out at once
+    elapsed = asyncio.run(_with_scheduler(BatchRecorder(), scenario, max_batch_size=8, max_wait_us=200_000))
+    assert elapsed < 0.1
+
+
+def test_partial_batch_goes_out_at_the_deadline():
+    batch_fn = BatchRecorder()
+
+    async def scenario(scheduler):
+        # Busy traffic so far: the scheduler holds batches open for stragglers
+        await asyncio.gather(*(scheduler.submit(_features(i)) for i in range(64)))
+        scheduler._avg_batch_size = 8.0
+        start = time.perf_counter()
+        await scheduler.submit(_features(1))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(_with_scheduler(batch_fn, scenario, max_batch_size=8, max_wait_us=50_000))
+    assert 0.04 <= elapsed < 0.5
+    assert batch_fn.sizes[-1] == 1
+
+
+def test_full_queue_rejects():
+    async def main():
+        # Not started yet, so nothing drains the queue
+        scheduler = InferenceScheduler(BatchRecorder(), max_batch_size=1, max_queue=2)
+        futures = [asyncio.ensure_future(scheduler.submit(_features(i))) for i in range(3)]
+        await asyncio.sleep(0)
+        rejected = futures[2].exception()
+        await scheduler.start()
+        accepted = await asyncio.gather(*futures[:2])
+        await scheduler.stop()
+        return accepted, rejected
+
+    accepted, rejected = asyncio.run(main())
+    assert accepted == [(0.0, "test"), (1.0, "test")]
+    assert isinstance(rejected, InferenceOverloadedError)
+
+
+def test_batch_errors_reach_every_caller():
+    async def scenario(scheduler):
+        return await asyncio.gather(*(scheduler.submit(_features(i)) for i in range(5)), return_exceptions=True)
+
+    results = asyncio.run(_with_scheduler(BatchRecorder(error=ValueError("model")), scenario, max_batch_size=8))
+    assert all(isinstance(r, ValueError) for r in results)
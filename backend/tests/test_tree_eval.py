@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from xgboost import XGBClassifier
+
+from app.ml.inference import SizedModel, _load_model
+from app.ml.synthetic_data import make_synthetic_dataset
+from app.ml.tree_eval import CompiledForest, compile_xgb_json
+
+
+TOLERANCE = 1e-5
+
+
+def _dataset(n: int, seed: int, missing_rate: float = 0.05) -> tuple[np.ndarray, np.ndarray]:
+    X_dict, y, _ = make_synthetic_dataset(n=n, seed=seed)
+    X = np.column_stack(list(X_dict.values()))
+    rng = np.random.default_rng(seed)
+    X[rng.random(X.shape) < missing_rate] = np.nan
+    return X, y
+
+
+@pytest.fixture(scope="module")
+def data() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    X_train, y_train = _dataset(3000, seed=3)
+    X_eval, _ = _dataset(2000, seed=11)
+    return X_train, y_train, X_eval
+
+
+def _train(tmp_path, data, n_estimators: int, max_depth: int) -> str:
+    X_train, y_train, _ = data
+    model = XGBClassifier(n_estimators=n_estimators, max_depth=max_depth, learning_rate=0.2, n_jobs=1, random_state=7)
+    model.fit(X_train, y_train)
+    path = str(tmp_path / f"model_{n_estimators}_{max_depth}.json")
+    model.save_model(path)
+    return path
+
+
+def _reference(path: str, X: np.ndarray) -> np.ndarray:
+    model = XGBClassifier()
+    model.load_model(path)
+    return model.predict_proba(X)
+
+
+@pytest.mark.parametrize(("n_estimators", "max_depth"), [(1, 1), (10, 3), (80, 4), (50, 6)])
+def test_compiled_matches_xgboost(tmp_path, data, n_estimators, max_depth):
+    path = _train(tmp_path, data, n_estimators, max_depth)
+    X_eval = data[2]
+    expected = _reference(path, X_eval)
+    compiled = compile_xgb_json(path)
+
+    np.testing.assert_allclose(compiled.predict_proba(X_eval), expected, atol=TOLERANCE, rtol=0)
+    single = np.array([compiled.predict_proba(row)[0, 1] for row in X_eval[:50]])
+    np.testing.assert_allclose(single, expected[:50, 1], atol=TOLERANCE, rtol=0)
+
+
+def test_saved_forest_round_trips(tmp_path, data):
+    path = _train(tmp_path, data, 10, 3)
+    compiled = compile_xgb_json(path)
+    compiled.save(str(tmp_path / "forest.npz"))
+    loaded = CompiledForest.load(str(tmp_path / "forest.npz"))
+    np.testing.assert_array_equal(loaded.predict_proba(data[2]), compiled.predict_proba(data[2]))
+
+
+def test_numpy_backend_hands_large_batches_to_xgboost(tmp_path, data, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "inference_numpy_max_rows", 64)
+    path = _train(tmp_path, data, 10, 3)
+    model = _load_model(path, "numpy")
+    assert isinstance(model, SizedModel)
+    X_eval = data[2]
+
+    np.testing.assert_allclose(model.predict_proba(X_eval[:64]), _reference(path, X_eval[:64]), atol=TOLERANCE, rtol=0)
+    assert model._large is None
+    np.testing.assert_allclose(model.predict_proba(X_eval), _reference(path, X_eval), atol=TOLERANCE, rtol=0)
+    assert isinstance(model._large, XGBClassifier)
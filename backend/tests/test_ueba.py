@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from app.core.config import settings
+from app.services.security import SecurityCheckIn, evaluate_security
+from app.services.ueba import UebaEngine
+
+
+# Injected anomalies must clear the alarm level by this much, ordinary requests stay this far under
+MARGIN = 0.15
+
+# Calibration of the action signal under the default settings, after `events` requests of which
+# 5% were "predict": (events, score of a never-seen action, score of "predict"). The unseen
+# action climbs as the baseline firms up while the rare known one settles.
+ACTION_SCORES = [(60, 1.20, 0.76), (200, 1.40, 0.69), (1000, 1.58, 0.59)]
+
+
+def _engine() -> UebaEngine:
+    return UebaEngine(
+        max_entities=1000,
+        bucket_s=settings.ueba_bucket_s,
+        window_buckets=settings.ueba_window_buckets,
+        alpha=settings.ueba_alpha,
+        action_alpha=settings.ueba_action_alpha,
+        min_events=settings.ueba_min_events,
+        max_actions=settings.ueba_max_actions,
+        sensor_fields=tuple(settings.ueba_sensor_fields),
+        rate_z=settings.ueba_rate_z,
+        sensor_z=settings.ueba_sensor_z,
+        action_min_p=settings.ueba_action_min_p,
+        action_unseen_weight=settings.ueba_action_unseen_weight,
+    )
+
+
+def _telemetry(rng: random.Random) -> dict:
+    return {
+        "vehicle_id": "VEH-1",
+        "speed_kph": rng.gauss(60, 15),
+        "engine_temp_c": rng.gauss(90, 4),
+        "vibration_rms": abs(rng.gauss(0.2, 0.05)),
+        "oil_pressure_kpa": rng.gauss(250, 15),
+        "battery_v": rng.gauss(12.6, 0.2),
+        "ambient_temp_c": rng.gauss(22, 5),
+    }
+
+
+def _warm(engine: UebaEngine, rng: random.Random, events: int) -> float:
+    # One request every two minutes, 95% "orchestrate" and 5% "predict"
+    now = 0.0
+    for _ in range(events):
+        now += 120
+        action = "orchestrate" if rng.random() < 0.95 else "predict"
+        engine.observe("cust-1", "VEH-1", action, _telemetry(rng), now=now)
+    return now
+
+
+@pytest.mark.parametrize(("events", "expected", "_"), ACTION_SCORES)
+def test_unseen_action_alarms_with_margin(events, expected, _):
+    rng = random.Random(3)
+    engine = _engine()
+    now = _warm(engine, rng, events)
+    score = engine.observe("cust-1", None, "export_all_customers", None, now=now + 120)
+    assert score.signal == "action"
+    assert score.score >= 1.0 + MARGIN
+    assert score.score == pytest.approx(expected, abs=0.05)
+
+
+@pytest.mark.parametrize(("events", "_", "expected"), ACTION_SCORES)
+def test_rare_known_action_stays_quiet(events, _, expected):
+    rng = random.Random(3)
+    engine = _engine()
+    now = _warm(engine, rng, events)
+    score = engine.observe("cust-1", None, "predict", None, now=now + 120).score
+    assert score <= 1.0 - MARGIN
+    assert score == pytest.approx(expected, abs=0.05)
+
+
+def test_ordinary_traffic_stays_quiet():
+    rng = random.Random(5)
+    engine = _engine()
+    now = _warm(engine, rng, 200)
+    scores = []
+    for _ in range(500):
+        now += 120
+        action = "orchestrate" if rng.random() < 0.95 else "predict"
+        scores.append(engine.observe("cust-1", "VEH-1", action, _telemetry(rng), now=now).score)
+    assert max(scores) <= 1.0 - MARGIN
+
+
+def test_burst_and_sensor_jump_alarm():
+    rng = random.Random(7)
+    engine = _engine()
+    now = _warm(engine, rng, 200) + 600
+    burst = [engine.observe("cust-1", None, "orchestrate", None, now=now + i * 0.5) for i in range(60)]
+    assert burst[-1].signal == "rate"
+    assert burst[-1].score >= 1.0 + MARGIN
+
+    jump = _telemetry(rng) | {"oil_pressure_kpa": 40.0}
+    score = engine.observe(None, "VEH-1", "orchestrate", jump, now=now + 3600)
+    assert score.signal == "oil_pressure_kpa"
+    assert score.score >= 1.0 + MARGIN
+
+
+def test_evaluate_security_returns_audit_row():
+    result, audit = evaluate_security(SecurityCheckIn(request_id="bad", customer_id=None, telemetry={}))
+    assert not result.allowed
+    assert audit["reason"] == "invalid request_id"
+    assert audit["allowed"] is False
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import datetime as dt
+import uuid
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.ml.vector_index import VectorIndex, publish, read_pointer, train_centroids
+
+
+ROWS = 20_000
+DIM = 8
+K = 5
+NOW = dt.datetime(2026, 3, 2, tzinfo=dt.timezone.utc)
+
+
+def _vectors(rows: int, seed: int) -> np.ndarray:
+    # Overlapping Gaussian clusters (cases grouped by failure mode), so probing few lists can miss
+    rng = np.random.default_rng(seed)
+    modes = np.random.default_rng(0).normal(0, 1.5, size=(64, DIM))
+    return (modes[rng.integers(0, len(modes), rows)] + rng.normal(0, 1, size=(rows, DIM))).astype(np.float32)
+
+
+def _columns(rows: int, components=("engine", "battery")) -> dict:
+    return {
+        "case_ids": [uuid.uuid4() for _ in range(rows)],
+        "alert_ids": [uuid.uuid4() for _ in range(rows)],
+        "created_at": [NOW] * rows,
+        "components": [components[i % len(components)] for i in range(rows)],
+    }
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory) -> VectorIndex:
+    X = _vectors(ROWS, seed=1)
+    mean, std = X.mean(axis=0), X.std(axis=0)
+    nlist = int(np.sqrt(ROWS))
+    sample = X[np.random.default_rng(0).choice(ROWS, nlist * 64, replace=False)]
+    directory = str(tmp_path_factory.mktemp("rca") / "v1")
+    index = VectorIndex.create(directory, [f"f{i}" for i in range(DIM)], mean, std, train_centroids((sample - mean) / std, nlist))
+    index.add(X, order_by_list=True, **_columns(ROWS))
+    return VectorIndex.open(directory)
+
+
+def _exact(index: VectorIndex, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    Q = index.transform(X)
+    d = (Q**2).sum(axis=1)[:, None] - 2 * Q @ np.asarray(index.vectors).T + (np.asarray(index.vectors) ** 2).sum(axis=1)
+    ids = np.argsort(d, axis=1, kind="stable")[:, :K]
+    return np.take_along_axis(d, ids, axis=1), ids
+
+
+def test_recall_at_default_nprobe(index):
+    queries = _vectors(200, seed=2)
+    _, approx = index.search(queries, K, settings.rca_index_nprobe)
+    _, exact = _exact(index, queries)
+    recall = np.mean([len(set(a) & set(e)) / K for a, e in zip(approx, exact)])
+    assert recall >= 0.95
+
+
+def test_full_probe_is_exact(index):
+    queries = _vectors(50, seed=3)
+    distances, ids = index.search(queries, K, index.nlist)
+    exact_d, exact_ids = _exact(index, queries)
+    np.testing.assert_allclose(distances, exact_d, rtol=1e-4, atol=1e-3)
+    # Ids agree except where two rows tie on distance
+    assert np.mean(ids == exact_ids) > 0.99
+
+
+def test_empty_and_short_results_are_padded(tmp_path):
+    centroids = np.zeros((4, DIM), dtype=np.float32)
+    index = VectorIndex.create(str(tmp_path / "v1"), [f"f{i}" for i in range(DIM)], np.zeros(DIM), np.ones(DIM), centroids)
+    distances, ids = index.search(np.zeros(DIM), K, 1)
+    assert (ids == -1).all() and np.isinf(distances).all()
+
+    index.add(np.ones((2, DIM), dtype=np.float32), **_columns(2))
+    distances, ids = index.search(np.zeros(DIM), K, 4)
+    assert sorted(ids[0, :2]) == [0, 1]
+    assert (ids[0, 2:] == -1).all()
+
+
+def test_incremental_add_is_visible_after_reopen(tmp_path):
+    X = _vectors(500, seed=4)
+    directory = str(tmp_path / "v1")
+    index = VectorIndex.create(directory, [f"f{i}" for i in range(DIM)], X.mean(axis=0), X.std(axis=0), train_centroids(X, 8))
+    index.add(X[:400], order_by_list=True, **_columns(400))
+    extra = _columns(100, components=("brakes",))
+    index.add(X[400:], **extra)
+
+    reopened = VectorIndex.open(directory)
+    assert reopened.count == 500
+    _, ids = reopened.search(X[450], 1, reopened.nlist)
+    row = reopened.row(int(ids[0, 0]))
+    assert row["case_id"] == extra["case_ids"][50]
+    assert row["component"] == "brakes"
+    assert reopened.case_ids() >= set(extra["case_ids"])
+
+
+def test_publish_swaps_and_prunes_versions(tmp_path):
+    root = tmp_path / "rca"
+    for version in ("v1", "v2", "v3"):
+        (root / version).mkdir(parents=True)
+        publish(str(root), version, keep=2)
+    assert read_pointer(str(root)) == "v3"
+    assert sorted(p.name for p in root.iterdir() if p.is_dir()) == ["v2", "v3"]